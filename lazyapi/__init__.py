@@ -5,6 +5,23 @@ from . import classes
 from . import client
 from . import fast
 from . import retry
+from . import cache
+from . import flight
+from . import jsonz
+from . import streams
+from . import paginate
+from . import sse
+from . import ratelimit
+from . import shared
+from . import breaker
+from . import concurrency
+from . import hedge
+from . import balance
+from . import dns
+from . import pool
+from . import loops
+from . import bgloop
+from . import metrics
 
 from .timez import (
     timer,
@@ -22,14 +39,29 @@ from .timez import (
     dtstr,
 )
 
-from .classes import HttpResponse, RequestType, HttpRequest
-from .client import HttpClient, HttpCfg, AsyncHttpCfg, ApiClient, APIClient
-from .fast import create_fastapi, create_validator, FastAPICfg
-from .retry import retryable
+from .classes import HttpResponse, FastResponse, RequestType, HttpRequest
+from .client import HttpClient, HttpCfg, AsyncHttpCfg, ApiClient, APIClient, BalancedApiClient
+from .fast import create_fastapi, create_validator, mount_metrics, FastAPICfg
+from .retry import retryable, async_retryable, Retrying, AsyncRetrying, HttpRetrying, RetryBudget
+from .cache import DiskCache, MemoryCache
+from .flight import SingleFlight
+from .paginate import Paginator, CursorPaginator, OffsetPaginator, LinkPaginator
+from .sse import ServerSentEvent
+from .ratelimit import RateLimiter
+from .shared import SharedBackend, DiskBackend, RedisBackend
+from .breaker import CircuitBreaker, CircuitOpenError
+from .concurrency import AdaptiveLimiter
+from .hedge import HedgePolicy
+from .balance import LoadBalancer
+from .dns import DNSCache
+from .pool import PoolRegistry, pool_registry
+from .bgloop import BackgroundLoop
+from .metrics import Metrics, metrics_registry
 
 
 __all__ = [
     'HttpResponse',
+    'FastResponse',
     'RequestType',
     'HttpRequest',
     'HttpClient',
@@ -37,5 +69,34 @@ __all__ = [
     'AsyncHttpCfg',
     'ApiClient',
     'APIClient',
+    'BalancedApiClient',
     'retryable',
+    'async_retryable',
+    'Retrying',
+    'AsyncRetrying',
+    'HttpRetrying',
+    'RetryBudget',
+    'DiskCache',
+    'MemoryCache',
+    'SingleFlight',
+    'Paginator',
+    'CursorPaginator',
+    'OffsetPaginator',
+    'LinkPaginator',
+    'ServerSentEvent',
+    'RateLimiter',
+    'SharedBackend',
+    'DiskBackend',
+    'RedisBackend',
+    'CircuitBreaker',
+    'CircuitOpenError',
+    'AdaptiveLimiter',
+    'HedgePolicy',
+    'LoadBalancer',
+    'DNSCache',
+    'PoolRegistry',
+    'pool_registry',
+    'BackgroundLoop',
+    'Metrics',
+    'metrics_registry',
 ]
@@ -0,0 +1,148 @@
+import time
+import httpx
+import random
+import itertools
+import threading
+from typing import Awaitable
+from lazycls.types import *
+from .config import BalanceCfg
+from .breaker import CircuitOpenError
+
+
+class Endpoint:
+    """ A single base url of a LoadBalancer with its outstanding requests, EWMA latency and ejection state """
+    def __init__(self, url: str):
+        self.url = url.rstrip('/')
+        self.outstanding = 0
+        self.latency = None
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.ejections = 0
+
+    def is_ejected(self, now: float) -> bool: return self.ejected_until > now
+
+    def get_cost(self) -> float:
+        """ Expected latency of a new request: the EWMA latency scaled by the outstanding requests """
+        return (self.latency or 0.0) * (self.outstanding + 1)
+
+    @property
+    def stats(self) -> DictAny:
+        return {'outstanding': self.outstanding, 'latency': self.latency, 'requests': self.requests, 'errors': self.errors, 'ejections': self.ejections, 'ejected': self.is_ejected(time.monotonic())}
+
+    def __repr__(self): return f'Endpoint({self.url!r})'
+
+
+class LoadBalancer:
+    """
+    Picks one of several equivalent base urls for each request.
+    `strategy`:
+    - round_robin: in turn
+    - least_outstanding: the fewest in-flight requests
+    - p2c: the cheaper of two random endpoints, costed by EWMA latency x (outstanding + 1)
+    An endpoint with `eject_failures` consecutive failures (transport errors or `statuses` responses) is ejected
+    for `eject_time` secs, then re-admitted. An endpoint whose circuit breaker is open is ejected until the circuit
+    lets requests through again. If every endpoint is ejected, all of them are used.
+    """
+    Strategies = ['round_robin', 'least_outstanding', 'p2c']
+
+    def __init__(self, urls: List[str], strategy: str = None, eject_failures: int = None, eject_time: float = None, ewma_alpha: float = None, statuses: List[int] = None):
+        if not urls: raise ValueError('LoadBalancer requires at least one url')
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.strategy = (strategy or BalanceCfg.strategy).lower()
+        if self.strategy not in self.Strategies: raise ValueError(f'Unknown strategy {self.strategy}. Expected one of {self.Strategies}')
+        self.eject_failures = eject_failures or BalanceCfg.eject_failures
+        self.eject_time = BalanceCfg.eject_time if eject_time is None else eject_time
+        self.ewma_alpha = ewma_alpha or BalanceCfg.ewma_alpha
+        self.statuses = set(statuses or BalanceCfg.statuses)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def get_healthy(self) -> List[Endpoint]:
+        now = time.monotonic()
+        return [e for e in self.endpoints if not e.is_ejected(now)] or self.endpoints
+
+    def pick(self) -> Endpoint:
+        endpoints = self.get_healthy()
+        if len(endpoints) == 1: return endpoints[0]
+        if self.strategy == 'round_robin': return endpoints[next(self._counter) % len(endpoints)]
+        if self.strategy == 'least_outstanding':
+            least = min(e.outstanding for e in endpoints)
+            return random.choice([e for e in endpoints if e.outstanding == least])
+        a, b = random.sample(endpoints, 2)
+        return a if (a.get_cost(), a.outstanding) <= (b.get_cost(), b.outstanding) else b
+
+    @staticmethod
+    def _eject(endpoint: Endpoint, secs: float):
+        endpoint.failures = 0
+        endpoint.ejections += 1
+        endpoint.ejected_until = max(endpoint.ejected_until, time.monotonic() + secs)
+
+    def eject(self, endpoint: Endpoint, secs: float):
+        with self._lock: self._eject(endpoint, secs)
+
+    def start(self, endpoint: Endpoint):
+        with self._lock: endpoint.outstanding += 1
+
+    def finish(self, endpoint: Endpoint, latency: float = None, failed: bool = False):
+        """ Records the outcome of a request, a latency of None means it was cancelled """
+        with self._lock:
+            endpoint.outstanding -= 1
+            if latency is None: return
+            endpoint.requests += 1
+            endpoint.latency = latency if endpoint.latency is None else endpoint.latency + (latency - endpoint.latency) * self.ewma_alpha
+            if not failed:
+                endpoint.failures = 0
+                return
+            endpoint.errors += 1
+            endpoint.failures += 1
+            if endpoint.failures >= self.eject_failures: self._eject(endpoint, self.eject_time)
+
+    def call(self, endpoint: Endpoint, fn: Callable[..., httpx.Response], *args, **kwargs) -> httpx.Response:
+        """ Sends a request to the picked endpoint and records its outcome """
+        self.start(endpoint)
+        start = time.monotonic()
+        try: resp = fn(*args, **kwargs)
+        except CircuitOpenError as e:
+            # nothing was sent, so the latency is not recorded
+            self.finish(endpoint)
+            self.eject(endpoint, e.retry_after)
+            raise
+        except httpx.TransportError:
+            self.finish(endpoint, time.monotonic() - start, True)
+            raise
+        except BaseException:
+            self.finish(endpoint)
+            raise
+        self.finish(endpoint, time.monotonic() - start, resp.status_code in self.statuses)
+        return resp
+
+    async def async_call(self, endpoint: Endpoint, fn: Callable[..., Awaitable[httpx.Response]], *args, **kwargs) -> httpx.Response:
+        """ Sends an async request to the picked endpoint and records its outcome """
+        self.start(endpoint)
+        start = time.monotonic()
+        try: resp = await fn(*args, **kwargs)
+        except CircuitOpenError as e:
+            # nothing was sent, so the latency is not recorded
+            self.finish(endpoint)
+            self.eject(endpoint, e.retry_after)
+            raise
+        except httpx.TransportError:
+            self.finish(endpoint, time.monotonic() - start, True)
+            raise
+        except BaseException:
+            self.finish(endpoint)
+            raise
+        self.finish(endpoint, time.monotonic() - start, resp.status_code in self.statuses)
+        return resp
+
+    @property
+    def stats(self) -> Dict[str, DictAny]:
+        return {e.url: e.stats for e in self.endpoints}
+
+
+__all__ = [
+    'Endpoint',
+    'LoadBalancer',
+]
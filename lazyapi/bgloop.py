@@ -0,0 +1,94 @@
+import atexit
+import asyncio
+import threading
+from typing import Awaitable, Iterator, AsyncIterator
+from lazycls.types import *
+
+
+class BackgroundLoop:
+    """
+    Event loop running in a daemon thread, so sync callers can run coroutines on it and block for the result.
+    Sync ApiClient calls sent through it share the async client's pool and its concurrency features.
+    On stop (and at exit) pending tasks are cancelled and async generators shut down, closing the loop's clients.
+    """
+    def __init__(self, name: str = 'lazyapi-loop'):
+        self.name = name
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self) -> bool: return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if self.is_running: return
+        with self._lock:
+            if self.is_running: return
+            started = threading.Event()
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target = self._run, args = (self.loop, started), name = self.name, daemon = True)
+            self.thread.start()
+            started.wait()
+            atexit.register(self.stop)
+
+    @staticmethod
+    def _run(loop: asyncio.AbstractEventLoop, started: threading.Event):
+        asyncio.set_event_loop(loop)
+        loop.call_soon(started.set)
+        try: loop.run_forever()
+        finally:
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks: task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions = True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+
+    def stop(self):
+        with self._lock:
+            if not self.is_running: return
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.thread = None
+
+    def run(self, coro: Awaitable) -> Any:
+        """ Runs the coroutine on the background loop and blocks until it returns """
+        self.start()
+        if threading.current_thread() is self.thread: raise RuntimeError('Cannot block on the background loop from its own thread')
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try: return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    def iterate(self, agen: AsyncIterator) -> Iterator:
+        """ Iterates an async iterator on the background loop """
+        async def anext(): return await agen.__anext__()
+        try:
+            while True:
+                try: yield self.run(anext())
+                except StopAsyncIteration: return
+        finally:
+            if hasattr(agen, 'aclose') and self.is_running: self.run(agen.aclose())
+
+
+_loop: Optional[BackgroundLoop] = None
+_lock = threading.Lock()
+
+def get_background_loop(loop_thread: Union[bool, BackgroundLoop] = None) -> Optional[BackgroundLoop]:
+    """
+    Returns a BackgroundLoop for the ApiClient.
+    True returns the process-wide background loop shared by every client.
+    """
+    global _loop
+    if not loop_thread: return None
+    if loop_thread is not True: return loop_thread
+    if _loop is None:
+        with _lock:
+            if _loop is None: _loop = BackgroundLoop()
+    return _loop
+
+
+__all__ = [
+    'BackgroundLoop',
+    'get_background_loop',
+]
@@ -0,0 +1,217 @@
+import time
+import httpx
+import threading
+from collections import deque
+from typing import Deque, Awaitable
+from lazycls.types import *
+from .config import BreakerCfg
+
+Closed, Open, HalfOpen = 'closed', 'open', 'half_open'
+
+
+class CircuitOpenError(httpx.HTTPError):
+    """ Raised without sending the request while the circuit of the upstream is open """
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f'Circuit for {name} is open. Retry in {retry_after:.2f} secs')
+        self.name = name
+        self.retry_after = retry_after
+
+
+class Circuit:
+    """
+    Circuit breaker state machine for a single upstream.
+    - closed: requests are sent, outcomes are kept for `window` secs. Once there are at least `min_requests`,
+      an error rate >= `error_rate` or a slow call rate (>= `slow_call` secs) >= `slow_rate` opens the circuit
+    - open: requests fail fast with CircuitOpenError for `open_timeout` secs
+    - half_open: up to `probes` requests are let through. If they all succeed the circuit closes, any failure reopens it
+    Transport errors and `statuses` responses count as errors. A `slow_rate` of 0 disables the latency threshold.
+    """
+    def __init__(self, name: str, error_rate: float = None, slow_rate: float = None, slow_call: float = None, min_requests: int = None, window: float = None, open_timeout: float = None, probes: int = None, statuses: List[int] = None):
+        self.name = name
+        self.error_rate = BreakerCfg.error_rate if error_rate is None else error_rate
+        self.slow_rate = BreakerCfg.slow_rate if slow_rate is None else slow_rate
+        self.slow_call = BreakerCfg.slow_call if slow_call is None else slow_call
+        self.min_requests = min_requests or BreakerCfg.min_requests
+        self.window = window or BreakerCfg.window
+        self.open_timeout = BreakerCfg.open_timeout if open_timeout is None else open_timeout
+        self.probes = probes or BreakerCfg.probes
+        self.statuses = set(statuses or BreakerCfg.statuses)
+        self.state = Closed
+        self.opened_at = 0.0
+        self._outcomes: Deque[Tuple[float, bool, bool]] = deque()
+        self._inflight_probes = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+
+    def _set_state(self, state: str, now: float):
+        self.state = state
+        if state == Open:
+            self.opened_at = now
+            self.opened += 1
+        if state != Closed: self._outcomes.clear()
+        self._inflight_probes = 0
+        self._probe_successes = 0
+
+    def _prune(self, now: float):
+        while self._outcomes and self._outcomes[0][0] < now - self.window: self._outcomes.popleft()
+
+    def get_state(self) -> str:
+        """ Returns the current state, moving an open circuit to half_open once open_timeout has passed """
+        with self._lock:
+            if self.state == Open and time.monotonic() >= self.opened_at + self.open_timeout: self._set_state(HalfOpen, time.monotonic())
+            return self.state
+
+    def allow(self):
+        """ Raises CircuitOpenError if the request may not be sent. Every allowed request must be followed by record / release. """
+        state = self.get_state()
+        with self._lock:
+            if state == Closed: return
+            if state == HalfOpen and self._inflight_probes < self.probes:
+                self._inflight_probes += 1
+                return
+            self.rejected += 1
+            raise CircuitOpenError(self.name, max(0.0, self.opened_at + self.open_timeout - time.monotonic()))
+
+    def record(self, failed: bool, latency: float):
+        now, slow = time.monotonic(), latency >= self.slow_call
+        with self._lock:
+            self.requests += 1
+            self.failures += int(failed)
+            if self.state == HalfOpen:
+                self._inflight_probes = max(0, self._inflight_probes - 1)
+                if failed or (slow and self.slow_rate): return self._set_state(Open, now)
+                self._probe_successes += 1
+                if self._probe_successes >= self.probes: self._set_state(Closed, now)
+                return
+            if self.state == Open: return
+            self._outcomes.append((now, failed, slow))
+            self._prune(now)
+            total = len(self._outcomes)
+            if total < self.min_requests: return
+            errors = sum(1 for o in self._outcomes if o[1])
+            slows = sum(1 for o in self._outcomes if o[2])
+            if errors / total >= self.error_rate or (self.slow_rate and slows / total >= self.slow_rate): self._set_state(Open, now)
+
+    def release(self):
+        """ Releases a probe slot of a request that was cancelled before it completed """
+        with self._lock:
+            if self.state == HalfOpen: self._inflight_probes = max(0, self._inflight_probes - 1)
+
+    def is_failure(self, resp: httpx.Response) -> bool: return resp.status_code in self.statuses
+
+    def call(self, fn: Callable[..., httpx.Response], *args, **kwargs) -> httpx.Response:
+        """ Sends an allowed request and records its outcome """
+        start = time.monotonic()
+        try: resp = fn(*args, **kwargs)
+        except httpx.TransportError:
+            self.record(True, time.monotonic() - start)
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.record(self.is_failure(resp), time.monotonic() - start)
+        return resp
+
+    async def async_call(self, fn: Callable[..., Awaitable[httpx.Response]], *args, **kwargs) -> httpx.Response:
+        """ Sends an allowed async request and records its outcome """
+        start = time.monotonic()
+        try: resp = await fn(*args, **kwargs)
+        except httpx.TransportError:
+            self.record(True, time.monotonic() - start)
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.record(self.is_failure(resp), time.monotonic() - start)
+        return resp
+
+    def reset(self):
+        with self._lock: self._set_state(Closed, time.monotonic())
+
+    @property
+    def stats(self) -> DictAny:
+        state = self.get_state()
+        with self._lock:
+            self._prune(time.monotonic())
+            total = len(self._outcomes)
+            errors = sum(1 for o in self._outcomes if o[1])
+            slows = sum(1 for o in self._outcomes if o[2])
+        return {
+            'state': state,
+            'error_rate': errors / total if total else 0.0,
+            'slow_rate': slows / total if total else 0.0,
+            'window_requests': total,
+            'requests': self.requests,
+            'failures': self.failures,
+            'rejected': self.rejected,
+            'opened': self.opened,
+            'retry_after': max(0.0, self.opened_at + self.open_timeout - time.monotonic()) if state == Open else 0.0,
+        }
+
+
+class CircuitBreaker:
+    """
+    Keeps a Circuit per upstream host (or one for the whole client with `per` = client).
+    The Circuit kwargs (error_rate, slow_rate, slow_call, min_requests, window, open_timeout, probes, statuses)
+    apply to every circuit.
+    """
+    def __init__(self, per: str = 'host', **kwargs):
+        self.per = per.lower()
+        self._kwargs = kwargs
+        self._circuits: Dict[str, Circuit] = {}
+        self._lock = threading.Lock()
+
+    def get_name(self, url: str) -> str:
+        if self.per == 'client': return 'client'
+        url = httpx.URL(url)
+        return f'{url.host}:{url.port}' if url.port else url.host
+
+    def get_circuit(self, url: str) -> Circuit:
+        name = self.get_name(url)
+        circuit = self._circuits.get(name)
+        if circuit is None:
+            with self._lock: circuit = self._circuits.setdefault(name, Circuit(name, **self._kwargs))
+        return circuit
+
+    def allow(self, url: str) -> Circuit:
+        """ Returns the Circuit of the url, raising CircuitOpenError if the request may not be sent """
+        circuit = self.get_circuit(url)
+        circuit.allow()
+        return circuit
+
+    def reset(self, name: str = None):
+        for key, circuit in list(self._circuits.items()):
+            if name is None or key == name: circuit.reset()
+
+    def __bool__(self): return True
+
+    @property
+    def states(self) -> Dict[str, str]:
+        return {name: circuit.get_state() for name, circuit in list(self._circuits.items())}
+
+    @property
+    def stats(self) -> Dict[str, DictAny]:
+        return {name: circuit.stats for name, circuit in list(self._circuits.items())}
+
+
+def get_circuit_breaker(breaker: Union[bool, DictAny, CircuitBreaker] = None) -> Optional[CircuitBreaker]:
+    """
+    Returns a CircuitBreaker for the ApiClient.
+    True uses the BreakerCfg defaults, a dict is passed as kwargs to CircuitBreaker.
+    """
+    if not breaker: return None
+    if breaker is True: return CircuitBreaker()
+    if isinstance(breaker, dict): return CircuitBreaker(**breaker)
+    return breaker
+
+
+__all__ = [
+    'CircuitOpenError',
+    'Circuit',
+    'CircuitBreaker',
+    'get_circuit_breaker',
+]
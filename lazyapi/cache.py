@@ -0,0 +1,319 @@
+import time
+import httpx
+import fnmatch
+import threading
+import diskcache
+from pathlib import Path
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from httpx import Response
+from lazycls.types import *
+from .config import CacheCfg, MemoryCacheCfg, logger
+from .shared import SharedBackend, SharedNamespace
+
+
+def build_url(base_url: str, path: str) -> str:
+    """ Joins the base_url and path the same way the client does for use as a cache key """
+    if '://' in path or not base_url: return path
+    return base_url.rstrip('/') + '/' + path.lstrip('/')
+
+
+def merge_headers(client_headers: DictAny = None, headers: DictAny = None) -> httpx.Headers:
+    """ The headers a request is sent with: the client headers, overridden by the request headers """
+    merged = httpx.Headers(client_headers)
+    if headers: merged.update(headers)
+    return merged
+
+
+# stored content is already decoded, so these headers no longer describe it
+DecodedHeaders = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+
+def get_decoded_headers(headers: httpx.Headers) -> List[Tuple[str, str]]:
+    """ The response headers to store with its decoded content """
+    return [(k, v) for k, v in headers.multi_items() if k.lower() not in DecodedHeaders]
+
+
+def make_cache_key(method: str, url: str, params: Any = None, headers: DictAny = None, vary: List[str] = None) -> str:
+    """ Builds a stable key from the method, full url, sorted params and any vary headers """
+    key = f'{method.upper()} {url}'
+    if params: key += '?' + str(httpx.QueryParams(sorted(httpx.QueryParams(params).multi_items())))
+    if vary and headers:
+        headers = httpx.Headers(headers)
+        vals = [f'{h.lower()}={headers[h]}' for h in vary if h in headers]
+        if vals: key += ' ' + '&'.join(vals)
+    return key
+
+
+def parse_cache_control(headers: httpx.Headers) -> DictAny:
+    """ Parses the Cache-Control header into a dict of directive -> value (True if no value) """
+    rez = {}
+    for part in headers.get('cache-control', '').split(','):
+        part = part.strip().lower()
+        if not part: continue
+        if '=' in part:
+            k, v = part.split('=', 1)
+            rez[k.strip()] = v.strip().strip('"')
+        else: rez[part] = True
+    return rez
+
+
+def get_freshness(headers: httpx.Headers, default_ttl: float = 0.0) -> Optional[float]:
+    """
+    Returns the number of seconds the response is fresh for based on Cache-Control: max-age / Expires.
+    Returns None if the response should not be stored.
+    """
+    cc = parse_cache_control(headers)
+    if 'no-store' in cc: return None
+    if 'no-cache' in cc: return 0.0
+    for directive in ('s-maxage', 'max-age'):
+        if directive in cc:
+            try: return max(float(cc[directive]) - float(headers.get('age', 0)), 0.0)
+            except ValueError: return 0.0
+    if 'expires' in headers:
+        try: return max(parsedate_to_datetime(headers['expires']).timestamp() - time.time(), 0.0)
+        except Exception: return 0.0
+    return default_ttl
+
+
+class DiskCache:
+    """
+    Persistent response cache for GET requests built on diskcache.
+    Fresh entries (Cache-Control: max-age / Expires) are served without a network call.
+    Stale entries are revalidated with If-None-Match / If-Modified-Since and a 304 is
+    turned back into the cached response.
+    With a SharedBackend (redis) the entries are stored there instead of the local directory. As that has no size
+    bound, entries expire `revalidate_ttl` secs after going stale, and at most `max_ttl` secs after being stored.
+    """
+    def __init__(self, directory: str = None, size_limit: int = None, eviction_policy: str = None, default_ttl: float = None, vary: List[str] = None, backend: SharedBackend = None, revalidate_ttl: float = None, max_ttl: float = None, **kwargs):
+        self.directory = directory or CacheCfg.directory or Path.home().joinpath('.cache', 'lazyapi', 'http').as_posix()
+        self.size_limit = size_limit or CacheCfg.size_limit
+        self.eviction_policy = eviction_policy or CacheCfg.eviction_policy
+        self.default_ttl = CacheCfg.default_ttl if default_ttl is None else default_ttl
+        self.vary = vary or CacheCfg.vary
+        self.backend = backend
+        self.revalidate_ttl = CacheCfg.revalidate_ttl if revalidate_ttl is None else revalidate_ttl
+        self.max_ttl = max_ttl or CacheCfg.max_ttl
+        self._kwargs = kwargs
+        self._cache = None
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stores = 0
+
+    @property
+    def cache(self) -> Union[diskcache.Cache, SharedNamespace]:
+        if self._cache is None and self.backend: self._cache = self.backend.namespace('cache')
+        if self._cache is None:
+            self._cache = diskcache.Cache(self.directory, size_limit=self.size_limit, eviction_policy=self.eviction_policy, **self._kwargs)
+        return self._cache
+
+    @staticmethod
+    def is_cacheable(method: str, kwargs: DictAny) -> bool:
+        return method.lower() == 'get'
+
+    def get_key(self, method: str, url: str, kwargs: DictAny, headers: DictAny = None) -> str:
+        """ `headers` are the client headers, so the vary headers set on the client are part of the key """
+        return make_cache_key(method, url, params=kwargs.get('params'), headers=merge_headers(headers, kwargs.get('headers')), vary=self.vary)
+
+    def lookup(self, key: str) -> Optional[DictAny]:
+        try: return self.cache.get(key)
+        except Exception as e:
+            logger.error(f'Unable to read cache entry {key}: {e}')
+            return None
+
+    @staticmethod
+    def is_fresh(entry: DictAny) -> bool:
+        return entry['expires'] > time.time()
+
+    def get_expire(self, entry: DictAny) -> Optional[float]:
+        """ Secs to keep the entry in a SharedBackend. The local diskcache is bounded by size_limit instead. """
+        if not self.backend: return None
+        return min(max(entry['expires'] - time.time(), 0.0) + self.revalidate_ttl, self.max_ttl)
+
+    @staticmethod
+    def get_conditional_headers(entry: DictAny, kwargs: DictAny) -> DictAny:
+        """ Returns the request kwargs with If-None-Match / If-Modified-Since added from the entry """
+        headers = dict(kwargs.get('headers') or {})
+        if entry.get('etag'): headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'): headers['If-Modified-Since'] = entry['last_modified']
+        return {**kwargs, 'headers': headers}
+
+    def store(self, key: str, resp: Response) -> Optional[DictAny]:
+        if resp.status_code != 200: return None
+        ttl = get_freshness(resp.headers, self.default_ttl)
+        if ttl is None: return None
+        etag, last_modified = resp.headers.get('etag'), resp.headers.get('last-modified')
+        if not ttl and not etag and not last_modified: return None
+        entry = {
+            'status_code': resp.status_code,
+            'headers': get_decoded_headers(resp.headers),
+            'content': resp.content,
+            'url': str(resp.url),
+            'etag': etag,
+            'last_modified': last_modified,
+            'expires': time.time() + ttl,
+        }
+        try:
+            self.cache.set(key, entry, expire=self.get_expire(entry))
+            self.stores += 1
+        except Exception as e: logger.error(f'Unable to write cache entry {key}: {e}')
+        return entry
+
+    def refresh(self, key: str, entry: DictAny, resp: Response) -> DictAny:
+        """ Updates the freshness / validators of an entry from a 304 response """
+        ttl = get_freshness(resp.headers, self.default_ttl)
+        entry['expires'] = time.time() + (ttl or 0.0)
+        entry['etag'] = resp.headers.get('etag', entry['etag'])
+        entry['last_modified'] = resp.headers.get('last-modified', entry['last_modified'])
+        try: self.cache.set(key, entry, expire=self.get_expire(entry))
+        except Exception as e: logger.error(f'Unable to write cache entry {key}: {e}')
+        return entry
+
+    @staticmethod
+    def to_response(entry: DictAny, request: httpx.Request = None, status: str = 'hit') -> Response:
+        # entries stored before the encoding headers were dropped would be decoded twice
+        return Response(entry['status_code'], headers=get_decoded_headers(httpx.Headers(entry['headers'])), content=entry['content'], request=request or httpx.Request('GET', entry['url']), extensions={'cache': status})
+
+    def prepare(self, method: str, url: str, kwargs: DictAny, headers: DictAny = None) -> Tuple[str, Optional[DictAny], Optional[Response], DictAny]:
+        """
+        Looks up the request in the cache, keyed with the client `headers` merged with the request headers.
+        Returns (key, entry, response if fresh, request kwargs with conditional headers)
+        """
+        key = self.get_key(method, url, kwargs, headers)
+        entry = self.lookup(key)
+        if entry is None:
+            self.misses += 1
+            return key, None, None, kwargs
+        if self.is_fresh(entry):
+            self.hits += 1
+            return key, entry, self.to_response(entry), kwargs
+        return key, entry, None, self.get_conditional_headers(entry, kwargs)
+
+    def finalize(self, key: str, entry: Optional[DictAny], resp: Response) -> Response:
+        """ Handles the network response: 304 -> cached response, 200 -> stored """
+        if entry is not None and resp.status_code == 304:
+            self.revalidated += 1
+            return self.to_response(self.refresh(key, entry, resp), request=resp.request, status='revalidated')
+        if entry is not None: self.misses += 1
+        self.store(key, resp)
+        return resp
+
+    async def async_prepare(self, method: str, url: str, kwargs: DictAny, headers: DictAny = None) -> Tuple[str, Optional[DictAny], Optional[Response], DictAny]:
+        """ prepare for the async client. Shared backend round-trips run in the executor, local diskcache reads stay inline. """
+        if self.backend: return await self.backend.run(self.prepare, method, url, kwargs, headers)
+        return self.prepare(method, url, kwargs, headers)
+
+    async def async_finalize(self, key: str, entry: Optional[DictAny], resp: Response) -> Response:
+        if self.backend: return await self.backend.run(self.finalize, key, entry, resp)
+        return self.finalize(key, entry, resp)
+
+    @property
+    def stats(self) -> DictAny:
+        return {'hits': self.hits, 'misses': self.misses, 'revalidated': self.revalidated, 'stores': self.stores, 'size': self.cache.volume()}
+
+    def clear(self):
+        self.cache.clear()
+
+    def close(self):
+        if self._cache is not None: self._cache.close()
+
+
+class MemoryCache:
+    """
+    In-process TTL + LRU cache that sits in front of the client for hot endpoints.
+    Stores the final response object so repeated calls skip both the network and decoding.
+    `ttls` maps route patterns (fnmatch, matched against the path) to a TTL in secs,
+    a TTL of 0 disables caching for that route.
+    """
+    def __init__(self, ttl: float = None, ttls: Dict[str, float] = None, max_entries: int = None, max_bytes: int = None, vary: List[str] = None, methods: List[str] = ['get']):
+        self.ttl = MemoryCacheCfg.ttl if ttl is None else ttl
+        self.ttls = ttls or {}
+        self.max_entries = max_entries or MemoryCacheCfg.max_entries
+        self.max_bytes = max_bytes or MemoryCacheCfg.max_bytes
+        self.vary = vary or MemoryCacheCfg.vary
+        self.methods = {m.lower() for m in methods}
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def is_cacheable(self, method: str, kwargs: DictAny, path: str = '') -> bool:
+        return method.lower() in self.methods and bool(self.get_ttl(path))
+
+    def get_key(self, method: str, url: str, kwargs: DictAny, headers: DictAny = None) -> str:
+        """ `headers` are the client headers, so the vary headers set on the client are part of the key """
+        return make_cache_key(method, url, params=kwargs.get('params'), headers=merge_headers(headers, kwargs.get('headers')), vary=self.vary)
+
+    def get_ttl(self, path: str) -> float:
+        for pattern, ttl in self.ttls.items():
+            if fnmatch.fnmatchcase(path, pattern): return ttl
+        return self.ttl
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            if item[1] <= time.monotonic():
+                self._pop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key: str, value: Any, path: str = '', size: int = None) -> bool:
+        ttl = self.get_ttl(path)
+        if not ttl: return False
+        resp = getattr(value, 'resp', value)
+        if resp.status_code >= 300: return False
+        if size is None: size = len(resp.content)
+        if size > self.max_bytes: return False
+        with self._lock:
+            if key in self._data: self._pop(key)
+            self._data[key] = (value, time.monotonic() + ttl, size)
+            self.size += size
+            while len(self._data) > self.max_entries or self.size > self.max_bytes:
+                self._pop(next(iter(self._data)))
+                self.evictions += 1
+        return True
+
+    def _pop(self, key: str):
+        item = self._data.pop(key)
+        self.size -= item[2]
+        return item
+
+    def invalidate(self, key: str):
+        with self._lock:
+            if key in self._data: self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def __len__(self): return len(self._data)
+
+    def __bool__(self): return True
+
+    @property
+    def stats(self) -> DictAny:
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'expirations': self.expirations, 'entries': len(self._data), 'size': self.size}
+
+
+__all__ = [
+    'DiskCache',
+    'MemoryCache',
+    'build_url',
+    'merge_headers',
+    'get_decoded_headers',
+    'make_cache_key',
+    'parse_cache_control',
+    'get_freshness',
+]
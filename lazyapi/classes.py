@@ -1,13 +1,20 @@
+import time
+from datetime import datetime, timezone
 from httpx import Response
 from httpx import Request as HttpRequest
 from starlette.requests import Request as Request
+from pydantic import PrivateAttr
 from lazycls import BaseCls, Field
 from lazycls.types import *
 from lazycls.serializers import Json, Base
-from lazycls.funcs import timed_cache
 
 from .utils import convert_to_cls
 from .timez import get_timestamp_utc
+from .jsonz import decode_response, extract_response, resolve_pointer
+
+
+class NotDecoded:
+    """ Sentinel for a response body that has not been decoded yet """
 
 RequestType = TypeVar('RequestType', Dict[Any, Any], HttpRequest, Request)
 JsonResponse = TypeVar('JsonResponse', Response, Union[None, int], None, Union[Response, int], Union[Dict[Any, Any], int], Dict[Any, Any], Dict[str, Any], Json.Object)
@@ -21,11 +28,12 @@ DataType = TypeVar('DataType', Dict[str, Any], Dict[Any, Any], List[Any], str)
 DataObjType = TypeVar('DataObjType', Json.Array, Json.Object, Dict[str, Any], Dict[Any, Any], List[Any])
 
 
-class HttpResponse(BaseCls):
-    resp: Response
-    clientType: str = 'sync'
-    method: str = 'get'
-    timestamp: str = Field(default_factory=get_timestamp_utc)
+class ResponseMixin:
+    """
+    The response properties shared by HttpResponse and FastResponse.
+    Expects `resp`, `clientType`, `method`, `_decoded` and `_extracted` on the instance.
+    """
+    __slots__ = ()
 
     @property
     def status_code(self): return self.resp.status_code
@@ -34,11 +42,23 @@ class HttpResponse(BaseCls):
     @property
     def content(self) -> ContentType: return self.resp.content
     @property
-    def data(self) -> DataType: return self.resp.json()
+    def data(self) -> DataType:
+        """The decoded JSON body. The body is only decoded once and reused after."""
+        if self._decoded is NotDecoded: self._decoded = decode_response(self.resp)
+        return self._decoded
+    def extract(self, pointer: str, default: Any = None) -> Any:
+        """
+        Returns the value at the JSON pointer (e.g. `/data/items/0`).
+        Reuses the decoded body if there is one, otherwise only the requested subtree is decoded.
+        """
+        if self._decoded is not NotDecoded: return resolve_pointer(self._decoded, pointer, default)
+        if pointer not in self._extracted: self._extracted[pointer] = extract_response(self.resp, pointer, NotDecoded)
+        value = self._extracted[pointer]
+        return default if value is NotDecoded else value
     @property
-    def dataObj(self) -> DataObjType: return Json.parse(self.resp)
+    def dataObj(self) -> DataObjType: return self.data
     @property
-    def data_obj(self) -> DataObjType: return Json.parse(self.resp)
+    def data_obj(self) -> DataObjType: return self.data
     @property
     def url(self): return self.resp.url
     @property
@@ -63,10 +83,9 @@ class HttpResponse(BaseCls):
     def status(self): return self.resp.status_code
     
     @property
-    @timed_cache(10)
     def _valid_data(self):
         try: return self.data
-        except: return None
+        except Exception: return None
 
     @property
     def dataCls(self) -> Type[BaseCls]:
@@ -98,6 +117,51 @@ class HttpResponse(BaseCls):
     def data_cls(self)-> Type[BaseCls]: return self.dataCls
 
 
+class HttpResponse(ResponseMixin, BaseCls):
+    resp: Response
+    clientType: str = 'sync'
+    method: str = 'get'
+    timestamp: str = Field(default_factory=get_timestamp_utc)
+    _decoded: Any = PrivateAttr(default=NotDecoded)
+    _extracted: Dict[str, Any] = PrivateAttr(default_factory=dict)
+
+
+# offset to turn time.monotonic() into a wall clock timestamp
+_monotonic_offset = time.time() - time.monotonic()
+
+
+class FastResponse(ResponseMixin):
+    """
+    Lightweight response wrapper with the same property surface as HttpResponse.
+    No validation is done and the timestamp is stored as time.monotonic() and only
+    formatted when accessed. The pydantic HttpResponse is built on demand with `.model`.
+    """
+    __slots__ = ('resp', 'clientType', 'method', '_created', '_decoded', '_extracted')
+
+    def __init__(self, resp: Response, clientType: str = 'sync', method: str = 'get'):
+        self.resp = resp
+        self.clientType = clientType
+        self.method = method
+        self._created = time.monotonic()
+        self._decoded = NotDecoded
+        self._extracted = {}
+
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self._created + _monotonic_offset, tz=timezone.utc)
+
+    @property
+    def model(self) -> HttpResponse:
+        """ Builds the pydantic HttpResponse, carrying over any decoded data """
+        model = HttpResponse.construct(resp = self.resp, clientType = self.clientType, method = self.method, timestamp = self.timestamp)
+        model._decoded = self._decoded
+        model._extracted = self._extracted
+        return model
+
+    def dict(self, *args, **kwargs) -> DictAny: return self.model.dict(*args, **kwargs)
+
+    def __repr__(self):
+        return f'FastResponse(resp={self.resp!r}, clientType={self.clientType!r}, method={self.method!r}, timestamp={self.timestamp!r})'
 
 
 
@@ -112,6 +176,8 @@ __all__ = [
     'AnyResponse',
     'BoolResponse',
     'HttpResponse',
+    'FastResponse',
+    'ResponseMixin',
     'ContentType',
     'DataType',
     'DataObjType'
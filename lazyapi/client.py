@@ -1,3 +1,13 @@
+import time
+import queue
+import httpx
+import asyncio
+import functools
+import itertools
+import contextlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterable, Iterator, AsyncIterator, ContextManager, AsyncContextManager
 from httpx import Client as xClient
 from httpx import AsyncClient as xAsyncClient
 from lazycls import classproperty, BaseCls
@@ -5,29 +15,80 @@ from lazycls.types import *
 from .config import *
 from .classes import *
 from .utils import convert_to_cls
+from .cache import DiskCache, MemoryCache, build_url
+from .flight import SingleFlight
+from .retry import Retrying, get_retrying
+from .ratelimit import RateLimiter, get_rate_limiter
+from .shared import SharedBackend, get_shared_backend
+from .breaker import CircuitBreaker, CircuitOpenError, get_circuit_breaker
+from .concurrency import AdaptiveLimiter, get_adaptive_limiter
+from .hedge import HedgePolicy, get_hedge_policy
+from .balance import LoadBalancer
+from .pool import pool_registry, get_origin, has_env_proxies, warmup_client, async_warmup_client, TransportKwargs, UnsharedKwargs
+from .loops import LoopLocal
+from .bgloop import BackgroundLoop, get_background_loop
+from .metrics import Metrics, get_metrics
+from .jsonz import to_pointer, split_pointer, resolve_pointer, extract_response
+from .paginate import Paginator, get_paginator
+from .sse import ServerSentEvent, SSEDecoder
+from .streams import StreamSource, StreamSink, ProgressCallback, get_source_size, iter_source, aiter_source, open_sink, get_content_length, LineDecoder, decode_json_lines
+
+BatchRequest = Union[Tuple[str, str], Tuple[str, str, DictAny], DictAny]
+
+def get_batch_args(item: BatchRequest) -> Tuple[str, str, DictAny]:
+    """ Normalizes a batch item of (method, path), (method, path, kwargs) or dict(method, path, **kwargs) """
+    if isinstance(item, dict):
+        item = dict(item)
+        return (item.pop('method', 'get'), item.pop('path'), item)
+    return (item[0], item[1], (item[2] if len(item) > 2 else None) or {})
+
+def extract_data(resp: Union[Response, HttpResponse], key: Union[str, List[Union[str, int]]]) -> DataType:
+    pointer = to_pointer(key)
+    if isinstance(resp, ResponseMixin): return resp.extract(pointer)
+    return extract_response(resp, pointer)
+
+def get_base_key(key: Union[str, List[Union[str, int]]]) -> str:
+    return str((split_pointer(to_pointer(key)) or ['api'])[-1])
 
 
 class HttpClient:
     _web: xClient = None
-    _async: xAsyncClient = None 
+    _async: LoopLocal = None
+    _lock = threading.Lock()
     
+    @staticmethod
+    def is_shared(cfg: Any, kwargs: DictAny) -> bool:
+        """ Env proxies only apply without a custom transport, so clients that trust them get their own pool """
+        if not getattr(cfg, 'share_pools', True) or UnsharedKwargs.intersection(kwargs): return False
+        return not (kwargs.get('trust_env', True) and has_env_proxies())
+
+    @staticmethod
+    def get_pool_kwargs(cfg: Any, kwargs: DictAny, http2: bool) -> DictAny:
+        """ Pops the connection pool kwargs out of the client kwargs """
+        pool_kwargs = {k: kwargs.pop(k) for k in TransportKwargs.intersection(kwargs)}
+        pool_kwargs.setdefault('http2', getattr(cfg, 'http2', http2))
+        if 'trust_env' in pool_kwargs: kwargs['trust_env'] = pool_kwargs['trust_env']
+        return pool_kwargs
+
     @classmethod
     def createClient(cls, base_url: str = "", cfg: HttpClientCfg = None, **kwargs) -> xClient:
-        """Creates a Sync httpx Client"""
+        """Creates a Sync httpx Client over the shared connection pool of the base_url origin"""
         cfg = cfg or HttpClientCfg
-        if 'headers' in kwargs:
-            h = kwargs.pop('headers')
-            if h: cfg.headers = h
-        return xClient(base_url=base_url, timeout=cfg.timeout, limits=cfg.limits, headers=cfg.headers, **kwargs)
+        # client headers replace the cfg defaults for this client only
+        headers = kwargs.pop('headers', None) or cfg.headers
+        if not cls.is_shared(cfg, kwargs): return xClient(base_url=base_url, timeout=cfg.timeout, limits=cfg.limits, headers=headers, **kwargs)
+        transport = pool_registry.get_transport(get_origin(base_url), cfg.limits, **cls.get_pool_kwargs(cfg, kwargs, HttpCfg.http2))
+        return xClient(base_url=base_url, timeout=cfg.timeout, headers=headers, transport=transport, **kwargs)
     
     @classmethod
     def createAsyncClient(cls, base_url: str = "", cfg: AsyncHttpClientCfg = None, **kwargs) -> xAsyncClient:
-        """ Creates an async httpx Client"""
+        """ Creates an async httpx Client over the shared connection pool of the base_url origin"""
         cfg = cfg or AsyncHttpClientCfg
-        if 'headers' in kwargs:
-            h = kwargs.pop('headers')
-            if h: cfg.headers = h
-        return xAsyncClient(base_url=base_url, timeout=cfg.timeout, limits=cfg.limits, headers=cfg.headers, **kwargs)
+        # client headers replace the cfg defaults for this client only
+        headers = kwargs.pop('headers', None) or cfg.headers
+        if not cls.is_shared(cfg, kwargs): return xAsyncClient(base_url=base_url, timeout=cfg.timeout, limits=cfg.limits, headers=headers, **kwargs)
+        transport = pool_registry.get_async_transport(get_origin(base_url), cfg.limits, **cls.get_pool_kwargs(cfg, kwargs, AsyncHttpCfg.http2))
+        return xAsyncClient(base_url=base_url, timeout=cfg.timeout, headers=headers, transport=transport, **kwargs)
 
     @classmethod
     def create_client(cls, *args, **kwargs): return cls.createClient(*args, **kwargs)
@@ -37,123 +98,699 @@ class HttpClient:
     
     @classproperty
     def client(cls) -> xClient:
-        if not HttpClient._web: HttpClient._web = HttpClient.createClient()
+        if not HttpClient._web:
+            with HttpClient._lock:
+                if not HttpClient._web: HttpClient._web = HttpClient.createClient()
         return HttpClient._web
     
     @classproperty
     def asyncClient(cls) -> xAsyncClient:
-        if not HttpClient._async: HttpClient._async = HttpClient.createAsyncClient()
-        return HttpClient._async
+        """ The async client of the running event loop """
+        if not HttpClient._async:
+            with HttpClient._lock:
+                if not HttpClient._async: HttpClient._async = LoopLocal(HttpClient.createAsyncClient, lambda c: c.aclose())
+        return HttpClient._async.get()
 
     @classproperty
     def async_client(cls) -> xAsyncClient: return cls.asyncClient
 
+    @classproperty
+    def pool_stats(cls) -> DictAny:
+        """ Occupancy of every shared connection pool """
+        return pool_registry.stats
+
+    @classmethod
+    def warmup(cls, urls: List[str], connections: int = None, method: str = None, path: str = None) -> DictAny:
+        """ Pre-resolves and pre-opens keep-alive connections to the urls in the sync client's pool """
+        return warmup_client(cls.client, urls, connections = connections, method = method, path = path)
+
+    @classmethod
+    async def async_warmup(cls, urls: List[str], connections: int = None, method: str = None, path: str = None) -> DictAny:
+        """ Pre-resolves and pre-opens keep-alive connections to the urls in the running loop's async client pool """
+        return await async_warmup_client(cls.asyncClient, urls, connections = connections, method = method, path = path)
+
 
 class ApiClient:
-    def __init__(self, base_url: str = "", headers: DictAny = {}, cfg: HttpClientCfg = None, async_cfg: AsyncHttpClientCfg = None, module_name: str = 'lazyapi', default_resp: bool = False, **kwargs):
+    def __init__(self, base_url: str = "", headers: DictAny = {}, cfg: HttpClientCfg = None, async_cfg: AsyncHttpClientCfg = None, module_name: str = 'lazyapi', default_resp: bool = False, cache: Union[bool, DiskCache] = None, memory_cache: Union[bool, MemoryCache] = None, coalesce: Union[bool, SingleFlight] = None, retry: Union[bool, DictAny, Retrying] = None, rate_limit: Union[bool, float, DictAny, RateLimiter] = None, shared: Union[bool, str, SharedBackend] = None, breaker: Union[bool, DictAny, CircuitBreaker] = None, adaptive: Union[bool, DictAny, AdaptiveLimiter] = None, hedge: Union[bool, float, DictAny, HedgePolicy] = None, loop_thread: Union[bool, BackgroundLoop] = None, metrics: Union[bool, DictAny, Metrics] = None, fast_resp: bool = False, **kwargs):
         self.base_url = ""
         self.headers = {}
         self.cfg = None
         self.async_cfg = None
+        self.cache = None
+        self.memory_cache = None
+        self.single_flight = None
+        self.retrying = None
+        self.rate_limiter = None
+        self.backend = None
+        self.breaker = None
+        self.adaptive = None
+        self.hedging = None
+        self.loop_thread = None
+        self.metrics = None
         self._module_name = None
         self._kwargs = {}
         self._web = None
         self._async = None
+        self._lock = threading.Lock()
         self._default_mode = False
-        self.set_configs(base_url = base_url, headers = headers, cfg = cfg, async_cfg = async_cfg, module_name = module_name, default_resp = default_resp, **kwargs)
+        self._fast_mode = False
+        self.set_configs(base_url = base_url, headers = headers, cfg = cfg, async_cfg = async_cfg, module_name = module_name, default_resp = default_resp, cache = cache, memory_cache = memory_cache, coalesce = coalesce, retry = retry, rate_limit = rate_limit, shared = shared, breaker = breaker, adaptive = adaptive, hedge = hedge, loop_thread = loop_thread, metrics = metrics, fast_resp = fast_resp, **kwargs)
 
-    def set_configs(self, base_url: str = "", headers: DictAny = {}, cfg: HttpClientCfg = None, async_cfg: AsyncHttpClientCfg = None, module_name: str = 'lazyapi', default_resp: bool = False,  **kwargs):
+    def set_configs(self, base_url: str = "", headers: DictAny = {}, cfg: HttpClientCfg = None, async_cfg: AsyncHttpClientCfg = None, module_name: str = 'lazyapi', default_resp: bool = False, cache: Union[bool, DiskCache] = None, memory_cache: Union[bool, MemoryCache] = None, coalesce: Union[bool, SingleFlight] = None, retry: Union[bool, DictAny, Retrying] = None, rate_limit: Union[bool, float, DictAny, RateLimiter] = None, shared: Union[bool, str, SharedBackend] = None, breaker: Union[bool, DictAny, CircuitBreaker] = None, adaptive: Union[bool, DictAny, AdaptiveLimiter] = None, hedge: Union[bool, float, DictAny, HedgePolicy] = None, loop_thread: Union[bool, BackgroundLoop] = None, metrics: Union[bool, DictAny, Metrics] = None, fast_resp: bool = False, **kwargs):
         self.base_url = base_url or self.base_url
         self.headers = headers or self.headers
         self.cfg = cfg or self.cfg
         self.async_cfg = async_cfg or self.async_cfg
         self._module_name = module_name or self._module_name
         self._default_mode = default_resp or self._default_mode
+        self._fast_mode = fast_resp or self._fast_mode
+        if shared is not None: self.backend = get_shared_backend(shared)
+        if cache is not None: self.cache = (DiskCache(backend = self.backend) if cache is True else cache) or None
+        if memory_cache is not None: self.memory_cache = (MemoryCache() if memory_cache is True else memory_cache) or None
+        if coalesce is not None: self.single_flight = (SingleFlight(backend = self.backend) if coalesce is True else coalesce) or None
+        if retry is not None: self.retrying = get_retrying(retry)
+        if rate_limit is not None: self.rate_limiter = get_rate_limiter(rate_limit, backend = self.backend)
+        if breaker is not None: self.breaker = get_circuit_breaker(breaker)
+        if adaptive is not None: self.adaptive = get_adaptive_limiter(adaptive)
+        if hedge is not None: self.hedging = get_hedge_policy(hedge)
+        if loop_thread is not None: self.loop_thread = get_background_loop(loop_thread)
+        if metrics is not None: self.metrics = get_metrics(metrics)
         self._kwargs = kwargs or self._kwargs
 
-    def reset_clients(self, base_url: str = "", headers: DictAny = {}, cfg: HttpClientCfg = None, async_cfg: AsyncHttpClientCfg = None, module_name: str = 'lazyapi', default_resp: bool = False,  **kwargs):
-        self.set_configs(base_url = base_url, headers = headers, cfg = cfg, async_cfg = async_cfg, module_name = module_name, default_resp = default_resp, **kwargs)
+    def reset_clients(self, base_url: str = "", headers: DictAny = {}, cfg: HttpClientCfg = None, async_cfg: AsyncHttpClientCfg = None, module_name: str = 'lazyapi', default_resp: bool = False, cache: Union[bool, DiskCache] = None, memory_cache: Union[bool, MemoryCache] = None, coalesce: Union[bool, SingleFlight] = None, retry: Union[bool, DictAny, Retrying] = None, rate_limit: Union[bool, float, DictAny, RateLimiter] = None, shared: Union[bool, str, SharedBackend] = None, breaker: Union[bool, DictAny, CircuitBreaker] = None, adaptive: Union[bool, DictAny, AdaptiveLimiter] = None, hedge: Union[bool, float, DictAny, HedgePolicy] = None, loop_thread: Union[bool, BackgroundLoop] = None, metrics: Union[bool, DictAny, Metrics] = None, fast_resp: bool = False, **kwargs):
+        self.set_configs(base_url = base_url, headers = headers, cfg = cfg, async_cfg = async_cfg, module_name = module_name, default_resp = default_resp, cache = cache, memory_cache = memory_cache, coalesce = coalesce, retry = retry, rate_limit = rate_limit, shared = shared, breaker = breaker, adaptive = adaptive, hedge = hedge, loop_thread = loop_thread, metrics = metrics, fast_resp = fast_resp, **kwargs)
         self._web = None
         self._async = None
     
     @property
     def client(self):
-        if not self._web: self._web = HttpClient.createClient(base_url=self.base_url, cfg=self.cfg, headers=self.headers, **self._kwargs)
+        if not self._web:
+            with self._lock:
+                if not self._web: self._web = HttpClient.createClient(base_url=self.base_url, cfg=self.cfg, headers=self.headers, **self._kwargs)
         return self._web
     
     @property
     def aclient(self):
-        if not self._async: self._async = HttpClient.createAsyncClient(base_url=self.base_url, cfg=self.async_cfg, headers=self.headers, **self._kwargs)
-        return self._async
-    
+        """ The async client of the running event loop. It is closed when the loop shuts down. """
+        if not self._async:
+            with self._lock:
+                if not self._async: self._async = LoopLocal(lambda: HttpClient.createAsyncClient(base_url=self.base_url, cfg=self.async_cfg, headers=self.headers, **self._kwargs), lambda c: c.aclose())
+        return self._async.get()
+
+    @property
+    def warmup_urls(self) -> List[str]: return [self.base_url] if self.base_url else []
+
+    def warmup(self, connections: int = None, method: str = None, path: str = None) -> DictAny:
+        """
+        Pre-resolves the base_url host and opens `connections` keep-alive connections to it, so the first requests
+        skip DNS, TCP and TLS setup. Warmup requests bypass the caches, retries, limiters and breakers.
+        With a loop_thread the background loop's async pool is warmed instead.
+        """
+        if self.loop_thread: return self.loop_thread.run(self.async_warmup(connections = connections, method = method, path = path))
+        return warmup_client(self.client, self.warmup_urls, connections = connections, method = method, path = path)
+
+    async def async_warmup(self, connections: int = None, method: str = None, path: str = None) -> DictAny:
+        """ Async version of warmup. Async pools are per event loop, so call it from the loop that sends the requests """
+        return await async_warmup_client(self.aclient, self.warmup_urls, connections = connections, method = method, path = path)
+
 
     #############################################################################
     #                             Base REST APIs                                #
     #############################################################################
     
-    def delete(self, path: str, **kwargs) -> Union[Response, HttpResponse]:
-        resp = self.client.delete(url=path, **kwargs)
+    def _wrap_response(self, resp: Response, clientType: str, method: str) -> Union[Response, HttpResponse]:
         if self._default_mode: return resp
-        return HttpResponse(resp = resp, clientType = 'sync', method = 'delete')
+        if self._fast_mode: return FastResponse(resp, clientType, method.lower())
+        return HttpResponse(resp = resp, clientType = clientType, method = method.lower())
 
-    def get(self, path: str, **kwargs) -> Union[Response, HttpResponse]:
-        resp = self.client.get(url=path, **kwargs)
-        if self._default_mode: return resp
-        return HttpResponse(resp = resp, clientType = 'sync', method = 'get')
+    def _get_client_headers(self, is_async: bool = False) -> httpx.Headers:
+        """ The headers the client sends with every request, which the cache and coalescing keys include """
+        return self.aclient.headers if is_async else self.client.headers
 
-    def head(self, path: str, **kwargs) -> Union[Response, HttpResponse]:
-        resp = self.client.head(url=path, **kwargs)
-        if self._default_mode: return resp
-        return HttpResponse(resp = resp, clientType = 'sync', method = 'head')
+    def _get_memory_key(self, method: str, path: str, kwargs: DictAny, is_async: bool = False) -> Optional[str]:
+        if not self.memory_cache or not self.memory_cache.is_cacheable(method, kwargs, path): return None
+        return self.memory_cache.get_key(method, build_url(self.base_url, path), kwargs, self._get_client_headers(is_async))
 
-    def patch(self, path: str, **kwargs) -> Union[Response, HttpResponse]:
-        resp = self.client.patch(url=path, **kwargs)
-        if self._default_mode: return resp
-        return HttpResponse(resp = resp, clientType = 'sync', method = 'patch')
+    def _client_send(self, method: str, url: str, **kwargs) -> Response:
+        circuit = self.breaker.allow(build_url(self.base_url, url)) if self.breaker else None
+        try:
+            if self.rate_limiter: self.rate_limiter.acquire(build_url(self.base_url, url))
+        except BaseException:
+            # interrupted while waiting, so free the half-open probe slot
+            if circuit: circuit.release()
+            raise
+        request = functools.partial(self.metrics.call, build_url(self.base_url, url), self.client.request) if self.metrics else self.client.request
+        if circuit: return circuit.call(request, method=method, url=url, **kwargs)
+        return request(method=method, url=url, **kwargs)
 
-    def put(self, path: str, **kwargs) -> Union[Response, HttpResponse]:
-        resp = self.client.put(url=path, **kwargs)
-        if self._default_mode: return resp
-        return HttpResponse(resp = resp, clientType = 'sync', method = 'put')
+    def _client_request(self, method: str, path: str, **kwargs) -> Response:
+        send = self.metrics.count_retries(build_url(self.base_url, path), self._client_send) if self.metrics and self.retrying else self._client_send
+        if self.retrying: return self.retrying.call(send, method=method.upper(), url=path, **kwargs)
+        return send(method=method.upper(), url=path, **kwargs)
+
+    def _send(self, method: str, path: str, **kwargs) -> Response:
+        if self.cache and self.cache.is_cacheable(method, kwargs):
+            key, entry, resp, kwargs = self.cache.prepare(method, build_url(self.base_url, path), kwargs, self._get_client_headers())
+            if resp is not None:
+                if self.metrics: self.metrics.cache_hit(build_url(self.base_url, path), 'disk')
+                return resp
+            return self.cache.finalize(key, entry, self._client_request(method, path, **kwargs))
+        return self._client_request(method, path, **kwargs)
+
+    def _request(self, method: str, path: str, **kwargs) -> Union[Response, HttpResponse]:
+        if self.loop_thread: return self.loop_thread.run(self._async_request(method, path, **kwargs))
+        key = self._get_memory_key(method, path, kwargs)
+        if key:
+            resp = self.memory_cache.get(key)
+            if resp is not None:
+                if self.metrics: self.metrics.cache_hit(build_url(self.base_url, path), 'memory')
+                return resp
+        resp = self._wrap_response(self._send(method, path, **kwargs), 'sync', method)
+        if key: self.memory_cache.set(key, resp, path = path)
+        return resp
+
+    def delete(self, path: str, **kwargs) -> Union[Response, HttpResponse]: return self._request('delete', path, **kwargs)
+
+    def get(self, path: str, **kwargs) -> Union[Response, HttpResponse]: return self._request('get', path, **kwargs)
+
+    def head(self, path: str, **kwargs) -> Union[Response, HttpResponse]: return self._request('head', path, **kwargs)
+
+    def patch(self, path: str, **kwargs) -> Union[Response, HttpResponse]: return self._request('patch', path, **kwargs)
+
+    def put(self, path: str, **kwargs) -> Union[Response, HttpResponse]: return self._request('put', path, **kwargs)
     
-    def post(self, path: str, **kwargs) -> Union[Response, HttpResponse]:
-        resp = self.client.post(url=path, **kwargs)
-        if self._default_mode: return resp
-        return HttpResponse(resp = resp, clientType = 'sync', method = 'post')
+    def post(self, path: str, **kwargs) -> Union[Response, HttpResponse]: return self._request('post', path, **kwargs)
 
     #############################################################################
     #                          Async REST Methods                               #
     #############################################################################
     
-    async def async_delete(self, path: str, **kwargs) -> Union[Response, HttpResponse]:
-        resp = await self.aclient.delete(url=path, **kwargs)
-        if self._default_mode: return resp
-        return HttpResponse(resp = resp, clientType = 'async', method = 'delete')
+    async def _async_client_send(self, method: str, url: str, **kwargs) -> Response:
+        circuit = self.breaker.allow(build_url(self.base_url, url)) if self.breaker else None
+        limit, started = None, None
+        try:
+            if self.rate_limiter: await self.rate_limiter.async_acquire(build_url(self.base_url, url))
+            if self.adaptive:
+                limit = self.adaptive.get_limit(build_url(self.base_url, url))
+                started = await limit.acquire()
+        except BaseException:
+            # cancelled while waiting, so free the half-open probe slot
+            if circuit: circuit.release()
+            raise
+        request = functools.partial(self.metrics.async_call, build_url(self.base_url, url), self.aclient.request) if self.metrics else self.aclient.request
+        try: resp = await (circuit.async_call(request, method=method, url=url, **kwargs) if circuit else request(method=method, url=url, **kwargs))
+        except BaseException as e:
+            if limit: limit.release(started, error = e)
+            raise
+        if limit: limit.release(started, resp = resp)
+        return resp
 
-    async def async_get(self, path: str, **kwargs) -> Union[Response, HttpResponse]:
-        resp = await self.aclient.get(url=path, **kwargs)
-        if self._default_mode: return resp
-        return HttpResponse(resp = resp, clientType = 'async', method = 'get')
+    async def _async_client_request(self, method: str, path: str, **kwargs) -> Response:
+        send = self._async_client_send
+        if self.hedging and self.hedging.is_hedgeable(method, kwargs): send = functools.partial(self.hedging.call, send)
+        if self.metrics and self.retrying: send = self.metrics.count_retries(build_url(self.base_url, path), send)
+        if self.retrying: return await self.retrying.async_call(send, method=method.upper(), url=path, **kwargs)
+        return await send(method=method.upper(), url=path, **kwargs)
+
+    async def _async_send(self, method: str, path: str, **kwargs) -> Response:
+        if self.cache and self.cache.is_cacheable(method, kwargs):
+            key, entry, resp, kwargs = await self.cache.async_prepare(method, build_url(self.base_url, path), kwargs, self._get_client_headers(True))
+            if resp is not None:
+                if self.metrics: self.metrics.cache_hit(build_url(self.base_url, path), 'disk')
+                return resp
+            return await self.cache.async_finalize(key, entry, await self._async_client_request(method, path, **kwargs))
+        return await self._async_client_request(method, path, **kwargs)
+
+    async def _async_fetch(self, method: str, path: str, **kwargs) -> Union[Response, HttpResponse]:
+        return self._wrap_response(await self._async_send(method, path, **kwargs), 'async', method)
+
+    async def _async_request(self, method: str, path: str, **kwargs) -> Union[Response, HttpResponse]:
+        key = self._get_memory_key(method, path, kwargs, True)
+        if key:
+            resp = self.memory_cache.get(key)
+            if resp is not None:
+                if self.metrics: self.metrics.cache_hit(build_url(self.base_url, path), 'memory')
+                return resp
+        if self.single_flight and self.single_flight.is_coalescable(method, kwargs):
+            fkey = self.single_flight.get_key(method, build_url(self.base_url, path), kwargs, self._get_client_headers(True))
+            resp = await self.single_flight.do(fkey, self._async_fetch, method, path, **kwargs)
+            # responses shared by another process come back unwrapped
+            if isinstance(resp, Response): resp = self._wrap_response(resp, 'async', method)
+        else: resp = await self._async_fetch(method, path, **kwargs)
+        if key: self.memory_cache.set(key, resp, path = path)
+        return resp
+
+    async def async_delete(self, path: str, **kwargs) -> Union[Response, HttpResponse]: return await self._async_request('delete', path, **kwargs)
+
+    async def async_get(self, path: str, **kwargs) -> Union[Response, HttpResponse]: return await self._async_request('get', path, **kwargs)
     
-    async def async_head(self, path: str, **kwargs) -> Union[Response, HttpResponse]:
-        resp = await self.aclient.head(url=path, **kwargs)
-        if self._default_mode: return resp
-        return HttpResponse(resp = resp, clientType = 'async', method = 'head')
+    async def async_head(self, path: str, **kwargs) -> Union[Response, HttpResponse]: return await self._async_request('head', path, **kwargs)
 
-    async def async_patch(self, path: str, **kwargs) -> Union[Response, HttpResponse]:
-        resp = await self.aclient.patch(url=path, **kwargs)
-        if self._default_mode: return resp
-        return HttpResponse(resp = resp, clientType = 'async', method = 'patch')
+    async def async_patch(self, path: str, **kwargs) -> Union[Response, HttpResponse]: return await self._async_request('patch', path, **kwargs)
 
-    async def async_put(self, path: str, **kwargs) -> Union[Response, HttpResponse]:
-        resp = await self.aclient.put(url=path, **kwargs)
-        if self._default_mode: return resp
-        return HttpResponse(resp = resp, clientType = 'async', method = 'put')
+    async def async_put(self, path: str, **kwargs) -> Union[Response, HttpResponse]: return await self._async_request('put', path, **kwargs)
     
-    async def async_post(self, path: str, **kwargs) -> Union[Response, HttpResponse]:
-        resp = await self.aclient.post(url=path, **kwargs)
-        if self._default_mode: return resp
-        return HttpResponse(resp = resp, clientType = 'async', method = 'post')
+    async def async_post(self, path: str, **kwargs) -> Union[Response, HttpResponse]: return await self._async_request('post', path, **kwargs)
+
+
+    #############################################################################
+    #                           Batch REST Methods                              #
+    #############################################################################
+
+    def _batch_request(self, item: BatchRequest) -> Union[Response, HttpResponse]:
+        method, path, kwargs = get_batch_args(item)
+        return self._request(method, path, **kwargs)
+
+    async def _async_batch_request(self, item: BatchRequest) -> Union[Response, HttpResponse]:
+        method, path, kwargs = get_batch_args(item)
+        return await self._async_request(method, path, **kwargs)
+
+    def batch_iter(self, requests: Iterable[BatchRequest], concurrency: int = None, return_exceptions: bool = True) -> Iterator[Tuple[int, Union[Response, HttpResponse, Exception]]]:
+        """
+        Runs the requests over the shared sync client in a bounded thread pool
+        and yields (index, result) as each request completes.
+        If return_exceptions, a failed request yields its exception in place of the response.
+        With a loop_thread the requests run concurrently on the background loop with async_batch_iter instead.
+        """
+        if self.loop_thread:
+            yield from self.loop_thread.iterate(self.async_batch_iter(requests, concurrency=concurrency, return_exceptions=return_exceptions))
+            return
+        concurrency = concurrency or getattr(self.cfg or HttpClientCfg, 'batch_concurrency', HttpCfg.batch_concurrency)
+        items = enumerate(requests)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            pending = {}
+            for idx, item in itertools.islice(items, concurrency):
+                pending[pool.submit(self._batch_request, item)] = idx
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    idx = pending.pop(fut)
+                    for nidx, item in itertools.islice(items, 1):
+                        pending[pool.submit(self._batch_request, item)] = nidx
+                    err = fut.exception()
+                    if err is not None and not return_exceptions:
+                        for f in pending: f.cancel()
+                        raise err
+                    yield idx, (err if err is not None else fut.result())
+
+    def batch(self, requests: Iterable[BatchRequest], concurrency: int = None, ordered: bool = True, return_exceptions: bool = True) -> List[Union[Response, HttpResponse, Exception]]:
+        """
+        Runs the requests over the shared sync client in a bounded thread pool.
+        Returns the results in request order, or in completion order if not ordered.
+        """
+        results = list(self.batch_iter(requests, concurrency=concurrency, return_exceptions=return_exceptions))
+        if ordered: results.sort(key=lambda x: x[0])
+        return [r for _, r in results]
+
+    async def async_batch_iter(self, requests: Iterable[BatchRequest], concurrency: int = None, return_exceptions: bool = True) -> AsyncIterator[Tuple[int, Union[Response, HttpResponse, Exception]]]:
+        """
+        Runs the requests over the shared async client with at most `concurrency` in flight
+        and yields (index, result) as each request completes.
+        If return_exceptions, a failed request yields its exception in place of the response.
+        """
+        concurrency = concurrency or getattr(self.async_cfg or AsyncHttpClientCfg, 'batch_concurrency', AsyncHttpCfg.batch_concurrency)
+        items = enumerate(requests)
+        queue = asyncio.Queue()
+
+        async def worker():
+            try:
+                for idx, item in items:
+                    try: res = await self._async_batch_request(item)
+                    except Exception as e: res = e
+                    await queue.put((idx, res))
+            finally: queue.put_nowait(None)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        try:
+            running = len(workers)
+            while running:
+                res = await queue.get()
+                if res is None:
+                    running -= 1
+                    continue
+                if isinstance(res[1], Exception) and not return_exceptions: raise res[1]
+                yield res
+        finally:
+            for w in workers: w.cancel()
+
+    async def async_batch(self, requests: Iterable[BatchRequest], concurrency: int = None, ordered: bool = True, return_exceptions: bool = True) -> List[Union[Response, HttpResponse, Exception]]:
+        """
+        Runs the requests over the shared async client with at most `concurrency` in flight.
+        Returns the results in request order, or in completion order if not ordered.
+        """
+        results = [res async for res in self.async_batch_iter(requests, concurrency=concurrency, return_exceptions=return_exceptions)]
+        if ordered: results.sort(key=lambda x: x[0])
+        return [r for _, r in results]
+
+    map = batch
+    async_map = async_batch
+
+
+    #############################################################################
+    #                          Streaming REST Methods                           #
+    #############################################################################
+
+    @property
+    def _chunk_size(self) -> int: return getattr(self.cfg or HttpClientCfg, 'chunk_size', HttpCfg.chunk_size)
+
+    @property
+    def _async_chunk_size(self) -> int: return getattr(self.async_cfg or AsyncHttpClientCfg, 'chunk_size', AsyncHttpCfg.chunk_size)
+
+    @staticmethod
+    def _get_upload_headers(headers: DictAny, total: Optional[int]) -> DictAny:
+        headers = dict(headers or {})
+        headers.setdefault('Content-Type', 'application/octet-stream')
+        if total is not None: headers.setdefault('Content-Length', str(total))
+        return headers
+
+    def stream(self, method: str, path: str, **kwargs) -> ContextManager[Response]:
+        """ Returns the httpx streaming context manager. The body is only read as it is iterated. """
+        if self.rate_limiter: self.rate_limiter.acquire(build_url(self.base_url, path))
+        return self.client.stream(method=method.upper(), url=path, **kwargs)
+
+    def iter_download(self, path: str, method: str = 'get', chunk_size: int = None, progress: ProgressCallback = None, **kwargs) -> Iterator[bytes]:
+        """
+        Yields the response body in chunks of chunk_size bytes without loading it into memory.
+        progress(bytes_downloaded, total) is called after every chunk. Raises httpx.HTTPStatusError on error responses.
+        """
+        with self.stream(method, path, **kwargs) as resp:
+            resp.raise_for_status()
+            total, done = get_content_length(resp), 0
+            for chunk in resp.iter_bytes(chunk_size=chunk_size or self._chunk_size):
+                done += len(chunk)
+                yield chunk
+                if progress: progress(done, total)
+
+    def download(self, path: str, dest: StreamSink, method: str = 'get', chunk_size: int = None, progress: ProgressCallback = None, **kwargs) -> Union[Response, HttpResponse]:
+        """
+        Streams the response body into dest (a file path or writable buffer) in chunks of chunk_size bytes.
+        Returns the response without the body loaded. Raises httpx.HTTPStatusError on error responses.
+        """
+        with self.stream(method, path, **kwargs) as resp:
+            resp.raise_for_status()
+            total, done = get_content_length(resp), 0
+            with open_sink(dest) as f:
+                for chunk in resp.iter_bytes(chunk_size=chunk_size or self._chunk_size):
+                    f.write(chunk)
+                    done += len(chunk)
+                    if progress: progress(done, total)
+        return self._wrap_response(resp, 'sync', method)
+
+    def upload(self, path: str, src: StreamSource, method: str = 'put', chunk_size: int = None, progress: ProgressCallback = None, **kwargs) -> Union[Response, HttpResponse]:
+        """
+        Streams src (a file path, file object, mmap or buffer) as the request body in chunks of chunk_size bytes
+        without reading it into memory. progress(bytes_uploaded, total) is called after every chunk.
+        Uploads are not retried since the body can only be read once.
+        """
+        total = get_source_size(src)
+        headers = self._get_upload_headers(kwargs.pop('headers', None), total)
+        content = iter_source(src, chunk_size or self._chunk_size, progress, total)
+        resp = self._client_send(method=method.upper(), url=path, content=content, headers=headers, **kwargs)
+        return self._wrap_response(resp, 'sync', method)
+
+    @contextlib.asynccontextmanager
+    async def async_stream(self, method: str, path: str, **kwargs) -> AsyncIterator[Response]:
+        """ Async streaming context manager over the async client. The body is only read as it is iterated. """
+        if self.rate_limiter: await self.rate_limiter.async_acquire(build_url(self.base_url, path))
+        async with self.aclient.stream(method=method.upper(), url=path, **kwargs) as resp: yield resp
+
+    async def async_iter_download(self, path: str, method: str = 'get', chunk_size: int = None, progress: ProgressCallback = None, **kwargs) -> AsyncIterator[bytes]:
+        """
+        Yields the response body in chunks of chunk_size bytes without loading it into memory.
+        progress(bytes_downloaded, total) is called after every chunk. Raises httpx.HTTPStatusError on error responses.
+        """
+        async with self.async_stream(method, path, **kwargs) as resp:
+            resp.raise_for_status()
+            total, done = get_content_length(resp), 0
+            async for chunk in resp.aiter_bytes(chunk_size=chunk_size or self._async_chunk_size):
+                done += len(chunk)
+                yield chunk
+                if progress: progress(done, total)
+
+    async def async_download(self, path: str, dest: StreamSink, method: str = 'get', chunk_size: int = None, progress: ProgressCallback = None, **kwargs) -> Union[Response, HttpResponse]:
+        """
+        Streams the response body into dest (a file path or writable buffer) in chunks of chunk_size bytes.
+        Returns the response without the body loaded. Raises httpx.HTTPStatusError on error responses.
+        """
+        async with self.async_stream(method, path, **kwargs) as resp:
+            resp.raise_for_status()
+            total, done = get_content_length(resp), 0
+            with open_sink(dest) as f:
+                async for chunk in resp.aiter_bytes(chunk_size=chunk_size or self._async_chunk_size):
+                    f.write(chunk)
+                    done += len(chunk)
+                    if progress: progress(done, total)
+        return self._wrap_response(resp, 'async', method)
+
+    async def async_upload(self, path: str, src: StreamSource, method: str = 'put', chunk_size: int = None, progress: ProgressCallback = None, **kwargs) -> Union[Response, HttpResponse]:
+        """
+        Streams src (a file path, file object, mmap or buffer) as the request body in chunks of chunk_size bytes
+        without reading it into memory. progress(bytes_uploaded, total) is called after every chunk.
+        Uploads are not retried since the body can only be read once.
+        """
+        total = get_source_size(src)
+        headers = self._get_upload_headers(kwargs.pop('headers', None), total)
+        content = aiter_source(src, chunk_size or self._async_chunk_size, progress, total)
+        resp = await self._async_client_send(method=method.upper(), url=path, content=content, headers=headers, **kwargs)
+        return self._wrap_response(resp, 'async', method)
+
+
+    #############################################################################
+    #                         JSON Lines / Watch Streams                        #
+    #############################################################################
+
+    @staticmethod
+    def _get_resume_kwargs(kwargs: DictAny, resume_param: str, resume: Any) -> DictAny:
+        if resume is None or not resume_param: return kwargs
+        return Paginator.with_params(kwargs, **{resume_param: resume})
+
+    @staticmethod
+    def _get_resume(event: Any, resume_key: Optional[str], resume: Any, count: int) -> Any:
+        if resume_key is None: return count
+        return resolve_pointer(event, resume_key, resume)
+
+    def stream_json(self, path: str, method: str = 'get', resume_key: Optional[str] = '/object/metadata/resourceVersion', resume_param: Optional[str] = 'resourceVersion', max_reconnects: int = None, reconnect_delay: float = None, **kwargs) -> Iterator[Any]:
+        """
+        Yields decoded events from a newline-delimited JSON stream (e.g. kubernetes `?watch=true`) as they arrive.
+        Only the current partial line is buffered and the stream is only read as the caller consumes events.
+        On a disconnect the stream is reopened with `resume_param` set to the last value found at the
+        `resume_key` JSON pointer (a resume_key of None resumes from the number of events received).
+        Raises httpx.HTTPStatusError on error responses.
+        """
+        max_reconnects = HttpCfg.max_reconnects if max_reconnects is None else max_reconnects
+        reconnect_delay = HttpCfg.reconnect_delay if reconnect_delay is None else reconnect_delay
+        resume, count, reconnects = None, 0, 0
+        while True:
+            try:
+                with self.stream(method, path, **self._get_resume_kwargs(kwargs, resume_param, resume)) as resp:
+                    resp.raise_for_status()
+                    decoder = LineDecoder()
+                    for chunk in resp.iter_bytes():
+                        for event in decode_json_lines(decoder.decode(chunk)):
+                            count, reconnects = count + 1, 0
+                            resume = self._get_resume(event, resume_key, resume, count)
+                            yield event
+                    for event in decode_json_lines(decoder.flush()):
+                        count += 1
+                        resume = self._get_resume(event, resume_key, resume, count)
+                        yield event
+                return
+            except httpx.TransportError:
+                if reconnects >= max_reconnects: raise
+                reconnects += 1
+                time.sleep(reconnect_delay)
+
+    async def async_stream_json(self, path: str, method: str = 'get', resume_key: Optional[str] = '/object/metadata/resourceVersion', resume_param: Optional[str] = 'resourceVersion', max_reconnects: int = None, reconnect_delay: float = None, **kwargs) -> AsyncIterator[Any]:
+        """
+        Yields decoded events from a newline-delimited JSON stream (e.g. kubernetes `?watch=true`) as they arrive.
+        Only the current partial line is buffered and the stream is only read as the caller consumes events.
+        On a disconnect the stream is reopened with `resume_param` set to the last value found at the
+        `resume_key` JSON pointer (a resume_key of None resumes from the number of events received).
+        Raises httpx.HTTPStatusError on error responses.
+        """
+        max_reconnects = AsyncHttpCfg.max_reconnects if max_reconnects is None else max_reconnects
+        reconnect_delay = AsyncHttpCfg.reconnect_delay if reconnect_delay is None else reconnect_delay
+        resume, count, reconnects = None, 0, 0
+        while True:
+            try:
+                async with self.async_stream(method, path, **self._get_resume_kwargs(kwargs, resume_param, resume)) as resp:
+                    resp.raise_for_status()
+                    decoder = LineDecoder()
+                    async for chunk in resp.aiter_bytes():
+                        for event in decode_json_lines(decoder.decode(chunk)):
+                            count, reconnects = count + 1, 0
+                            resume = self._get_resume(event, resume_key, resume, count)
+                            yield event
+                    for event in decode_json_lines(decoder.flush()):
+                        count += 1
+                        resume = self._get_resume(event, resume_key, resume, count)
+                        yield event
+                return
+            except httpx.TransportError:
+                if reconnects >= max_reconnects: raise
+                reconnects += 1
+                await asyncio.sleep(reconnect_delay)
+
+
+    #############################################################################
+    #                           Server-Sent Events                              #
+    #############################################################################
+
+    @staticmethod
+    def _get_sse_kwargs(kwargs: DictAny, last_event_id: Optional[str]) -> DictAny:
+        headers = {**dict(kwargs.get('headers') or {}), 'Accept': 'text/event-stream', 'Cache-Control': 'no-cache'}
+        if last_event_id is not None: headers['Last-Event-ID'] = last_event_id
+        return {**kwargs, 'headers': headers}
+
+    async def async_sse(self, path: str, method: str = 'get', last_event_id: str = None, max_reconnects: int = None, reconnect_delay: float = None, **kwargs) -> AsyncIterator[ServerSentEvent]:
+        """
+        Yields events from a `text/event-stream` endpoint as they are parsed.
+        Each ServerSentEvent has the raw `.text` and lazily JSON decoded `.data`.
+        When the connection drops or closes, it is reopened on the pooled async client with `Last-Event-ID`
+        after the server's `retry:` delay (or reconnect_delay secs), up to max_reconnects times in a row
+        without receiving an event. A 204 response stops the stream. Raises httpx.HTTPStatusError on error responses.
+        """
+        max_reconnects = AsyncHttpCfg.max_reconnects if max_reconnects is None else max_reconnects
+        reconnect_delay = AsyncHttpCfg.reconnect_delay if reconnect_delay is None else reconnect_delay
+        decoder, reconnects = SSEDecoder(last_event_id), 0
+        while True:
+            error = None
+            try:
+                # an event cut off by the previous connection is discarded
+                decoder.reset()
+                async with self.async_stream(method, path, **self._get_sse_kwargs(kwargs, decoder.last_event_id)) as resp:
+                    if resp.status_code == 204: return
+                    resp.raise_for_status()
+                    async for line in resp.aiter_lines():
+                        event = decoder.decode(line)
+                        if event is None: continue
+                        reconnects = 0
+                        yield event
+            except httpx.TransportError as e: error = e
+            if reconnects >= max_reconnects:
+                if error is not None: raise error
+                return
+            reconnects += 1
+            await asyncio.sleep(reconnect_delay if decoder.retry is None else decoder.retry / 1000.0)
+
+    def sse(self, path: str, method: str = 'get', last_event_id: str = None, max_reconnects: int = None, reconnect_delay: float = None, **kwargs) -> Iterator[ServerSentEvent]:
+        """
+        Sync version of async_sse using the pooled sync client.
+        Yields events from a `text/event-stream` endpoint as they are parsed.
+        """
+        max_reconnects = HttpCfg.max_reconnects if max_reconnects is None else max_reconnects
+        reconnect_delay = HttpCfg.reconnect_delay if reconnect_delay is None else reconnect_delay
+        decoder, reconnects = SSEDecoder(last_event_id), 0
+        while True:
+            error = None
+            try:
+                # an event cut off by the previous connection is discarded
+                decoder.reset()
+                with self.stream(method, path, **self._get_sse_kwargs(kwargs, decoder.last_event_id)) as resp:
+                    if resp.status_code == 204: return
+                    resp.raise_for_status()
+                    for line in resp.iter_lines():
+                        event = decoder.decode(line)
+                        if event is None: continue
+                        reconnects = 0
+                        yield event
+            except httpx.TransportError as e: error = e
+            if reconnects >= max_reconnects:
+                if error is not None: raise error
+                return
+            reconnects += 1
+            time.sleep(reconnect_delay if decoder.retry is None else decoder.retry / 1000.0)
+
+
+    #############################################################################
+    #                           Pagination Methods                              #
+    #############################################################################
+
+    def iter_pages(self, path: str, paginator: Union[str, Paginator] = None, prefetch: int = None, max_pages: int = None, method: str = 'get', **kwargs) -> Iterator[Union[Response, HttpResponse]]:
+        """
+        Yields each page response. A background thread fetches up to `prefetch` pages ahead
+        of the caller, so page N+1 is in flight while page N is consumed.
+        Raises httpx.HTTPStatusError on error responses.
+        """
+        paginator = get_paginator(paginator)
+        prefetch = prefetch or HttpCfg.prefetch
+        pages, stop = queue.Queue(maxsize=prefetch), threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try: return pages.put(item, timeout=0.1)
+                except queue.Full: continue
+
+        def producer():
+            try:
+                req, num = (path, paginator.first_request(kwargs)), 0
+                while req is not None and not stop.is_set() and (not max_pages or num < max_pages):
+                    resp = self._request(method, req[0], **req[1])
+                    getattr(resp, 'resp', resp).raise_for_status()
+                    put(resp)
+                    req, num = paginator.next_request(resp, *req), num + 1
+            except Exception as e: put(e)
+            finally: put(StopIteration)
+
+        thread = threading.Thread(target=producer, daemon=True)
+        thread.start()
+        try:
+            while True:
+                page = pages.get()
+                if page is StopIteration: break
+                if isinstance(page, Exception): raise page
+                yield page
+        finally: stop.set()
+
+    def paginate(self, path: str, paginator: Union[str, Paginator] = None, prefetch: int = None, max_pages: int = None, method: str = 'get', **kwargs) -> Iterator[Any]:
+        """
+        Yields the items of every page as a stream using a cursor (default), offset or link paginator.
+        Up to `prefetch` pages are fetched ahead in a background thread.
+        """
+        paginator = get_paginator(paginator)
+        for page in self.iter_pages(path, paginator=paginator, prefetch=prefetch, max_pages=max_pages, method=method, **kwargs):
+            yield from paginator.get_items(page)
+
+    async def async_iter_pages(self, path: str, paginator: Union[str, Paginator] = None, prefetch: int = None, max_pages: int = None, method: str = 'get', **kwargs) -> AsyncIterator[Union[Response, HttpResponse]]:
+        """
+        Yields each page response. A background task fetches up to `prefetch` pages ahead
+        of the caller, so page N+1 is in flight while page N is consumed.
+        Raises httpx.HTTPStatusError on error responses.
+        """
+        paginator = get_paginator(paginator)
+        pages = asyncio.Queue(maxsize=prefetch or AsyncHttpCfg.prefetch)
+
+        async def producer():
+            # on cancellation nothing is queued, as the consumer has stopped reading
+            try:
+                req, num = (path, paginator.first_request(kwargs)), 0
+                while req is not None and (not max_pages or num < max_pages):
+                    resp = await self._async_request(method, req[0], **req[1])
+                    getattr(resp, 'resp', resp).raise_for_status()
+                    await pages.put(resp)
+                    req, num = paginator.next_request(resp, *req), num + 1
+            except Exception as e: return await pages.put(e)
+            await pages.put(StopAsyncIteration)
+
+        task = asyncio.ensure_future(producer())
+        try:
+            while True:
+                page = await pages.get()
+                if page is StopAsyncIteration: break
+                if isinstance(page, Exception): raise page
+                yield page
+        finally:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError): await task
+
+    async def async_paginate(self, path: str, paginator: Union[str, Paginator] = None, prefetch: int = None, max_pages: int = None, method: str = 'get', **kwargs) -> AsyncIterator[Any]:
+        """
+        Yields the items of every page as a stream using a cursor (default), offset or link paginator.
+        Up to `prefetch` pages are fetched ahead in a background task.
+        """
+        paginator = get_paginator(paginator)
+        async for page in self.async_iter_pages(path, paginator=paginator, prefetch=prefetch, max_pages=max_pages, method=method, **kwargs):
+            for item in paginator.get_items(page): yield item
 
 
     #############################################################################
@@ -163,26 +800,30 @@ class ApiClient:
     def ping(self, path: str, max_status_code: int = 300, min_status_code: int = None, **kwargs) -> bool:
         """ Returns a bool of whether response code is great/within range/less than an int
             Can be used as a health check """
-        res = self.get(url=path, **kwargs)
+        res = self.get(path, **kwargs)
         if min_status_code and max_status_code:
             return bool(res.status_code in range(min_status_code, max_status_code))
         if min_status_code:
             return bool(res.status_code > min_status_code)
         return bool(res.status_code < max_status_code)
     
-    def get_data(self, path: str, key: str = 'data', **kwargs) -> DataType:
-        """ Expects to get data in JSON. If does not get the key, returns None. """
-        resp = self.get(url=path, **kwargs)
-        return resp.data.get(key, None)
+    def get_data(self, path: str, key: Union[str, List[Union[str, int]]] = 'data', **kwargs) -> DataType:
+        """
+        Expects to get data in JSON. If does not get the key, returns None.
+        The key can be a top-level key, a list path of keys / indexes, or a JSON pointer (`/data/items/0`).
+        Only the requested subtree is decoded.
+        """
+        resp = self.get(path, **kwargs)
+        return extract_data(resp, key)
     
-    def get_lazycls(self, path: str, key: str = 'data', **kwargs) -> Type[BaseCls]:
+    def get_lazycls(self, path: str, key: Union[str, List[Union[str, int]]] = 'data', **kwargs) -> Type[BaseCls]:
         """
         Expects to get data in JSON. If does not get the key, returns None.
         Returns the data from a GET request to Path as a LazyCls
         """
         data = self.get_data(path=path, key=key, **kwargs)
         if not data: return None
-        return convert_to_cls(resp=data, module_name=self._module_name, base_key=key)
+        return convert_to_cls(resp=data, module_name=self._module_name, base_key=get_base_key(key))
 
 
     #############################################################################
@@ -192,26 +833,30 @@ class ApiClient:
     async def async_ping(self, path: str, max_status_code: int = 300, min_status_code: int = None, **kwargs) -> bool:
         """ Returns a bool of whether response code is great/within range/less than an int
             Can be used as a health check """
-        res = await self.async_get(url=path, **kwargs)
+        res = await self.async_get(path, **kwargs)
         if min_status_code and max_status_code:
             return bool(res.status_code in range(min_status_code, max_status_code))
         if min_status_code:
             return bool(res.status_code > min_status_code)
         return bool(res.status_code < max_status_code)
     
-    async def async_get_data(self, path: str, key: str = 'data', **kwargs) -> DataType:
-        """ Expects to get data in JSON. If does not get the key, returns None. """
-        resp = await self.async_get(url=path, **kwargs)
-        return resp.data.get(key, None)
+    async def async_get_data(self, path: str, key: Union[str, List[Union[str, int]]] = 'data', **kwargs) -> DataType:
+        """
+        Expects to get data in JSON. If does not get the key, returns None.
+        The key can be a top-level key, a list path of keys / indexes, or a JSON pointer (`/data/items/0`).
+        Only the requested subtree is decoded.
+        """
+        resp = await self.async_get(path, **kwargs)
+        return extract_data(resp, key)
     
-    async def async_get_lazycls(self, path: str, key: str = 'data', **kwargs) -> Type[BaseCls]:
+    async def async_get_lazycls(self, path: str, key: Union[str, List[Union[str, int]]] = 'data', **kwargs) -> Type[BaseCls]:
         """
         Expects to get data in JSON. If does not get the key, returns None.
         Returns the data from a GET request to Path as a LazyCls
         """
         data = await self.async_get_data(path=path, key=key, **kwargs)
         if not data: return None
-        return convert_to_cls(resp=data, module_name=self._module_name, base_key=key)
+        return convert_to_cls(resp=data, module_name=self._module_name, base_key=get_base_key(key))
     
     
 
@@ -219,6 +864,46 @@ class ApiClient:
 
 
         
+class BalancedApiClient(ApiClient):
+    """
+    ApiClient that balances requests across several equivalent base urls (replicas / regional endpoints)
+    with a LoadBalancer. Every request attempt (including retries and hedges) picks an endpoint, so unhealthy
+    endpoints are ejected passively. All endpoints share the same pooled httpx clients, and the first
+    url is used as the base_url for cache keys.
+    """
+    def __init__(self, base_urls: List[str], strategy: str = None, balancer: LoadBalancer = None, **kwargs):
+        self.balancer = balancer or LoadBalancer(base_urls, strategy = strategy)
+        super().__init__(base_url = self.balancer.endpoints[0].url, **kwargs)
+
+    @property
+    def warmup_urls(self) -> List[str]: return [endpoint.url for endpoint in self.balancer.endpoints]
+
+    def _client_send(self, method: str, url: str, **kwargs) -> Response:
+        if '://' in url: return super()._client_send(method, url, **kwargs)
+        # an open circuit sends nothing, so the request moves on to the next endpoint
+        for left in range(len(self.balancer.endpoints), 0, -1):
+            endpoint = self.balancer.pick()
+            try: return self.balancer.call(endpoint, super()._client_send, method, build_url(endpoint.url, url), **kwargs)
+            except CircuitOpenError:
+                if left == 1: raise
+
+    async def _async_client_send(self, method: str, url: str, **kwargs) -> Response:
+        if '://' in url: return await super()._async_client_send(method, url, **kwargs)
+        for left in range(len(self.balancer.endpoints), 0, -1):
+            endpoint = self.balancer.pick()
+            try: return await self.balancer.async_call(endpoint, super()._async_client_send, method, build_url(endpoint.url, url), **kwargs)
+            except CircuitOpenError:
+                if left == 1: raise
+
+    def stream(self, method: str, path: str, **kwargs) -> ContextManager[Response]:
+        if '://' not in path: path = build_url(self.balancer.pick().url, path)
+        return super().stream(method, path, **kwargs)
+
+    def async_stream(self, method: str, path: str, **kwargs) -> AsyncContextManager[Response]:
+        if '://' not in path: path = build_url(self.balancer.pick().url, path)
+        return super().async_stream(method, path, **kwargs)
+
+
 APIClient = ApiClient
 
 __all__ = [
@@ -226,6 +911,8 @@ __all__ = [
     'HttpResponse',
     'ApiClient',
     'APIClient',
+    'BalancedApiClient',
+    'BatchRequest',
     'Response',
     'xClient',
     'xAsyncClient'
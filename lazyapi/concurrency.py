@@ -0,0 +1,169 @@
+import time
+import httpx
+import asyncio
+import threading
+from collections import deque
+from typing import Deque, Awaitable
+from lazycls.types import *
+from .config import AdaptiveLimitCfg
+from .loops import get_running_loop
+
+
+class AIMDLimit:
+    """
+    Adaptive (AIMD) concurrency limit for a single upstream.
+    Each successful request while the limit is at least half used raises the limit by `increase`.
+    A timeout, a `statuses` response (429 / 503) or a smoothed latency above `tolerance` x the no-load latency
+    cuts it by `backoff`, once per round of requests: requests sent before the last cut do not cut it again.
+    Requests over the limit wait in FIFO order without blocking the event loop.
+    """
+    def __init__(self, name: str, initial: int = None, min_limit: int = None, max_limit: int = None, increase: float = None, backoff: float = None, tolerance: float = None, statuses: List[int] = None):
+        self.name = name
+        self.min_limit = min_limit or AdaptiveLimitCfg.min_limit
+        self.max_limit = max_limit or AdaptiveLimitCfg.max_limit
+        self.limit = float(min(max(initial or AdaptiveLimitCfg.initial, self.min_limit), self.max_limit))
+        self.increase = increase or AdaptiveLimitCfg.increase
+        self.backoff = backoff or AdaptiveLimitCfg.backoff
+        self.tolerance = tolerance or AdaptiveLimitCfg.tolerance
+        self.statuses = set(statuses or AdaptiveLimitCfg.statuses)
+        self.inflight = 0
+        self.latency = None
+        self.min_latency = None
+        self.last_cut = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.drops = 0
+        self.queued = 0
+
+    async def acquire(self) -> float:
+        """ Waits for a slot under the limit. Returns the monotonic time the slot was taken. """
+        with self._lock:
+            if self.inflight < int(self.limit) and not self._waiters:
+                self.inflight += 1
+                return time.monotonic()
+            fut = asyncio.get_running_loop().create_future()
+            self._waiters.append(fut)
+            self.queued += 1
+        try: await fut
+        except asyncio.CancelledError:
+            with self._lock:
+                if fut in self._waiters: self._waiters.remove(fut)
+            # the slot was handed over as the waiter was cancelled
+            if fut.done() and not fut.cancelled(): self._release()
+            raise
+        return time.monotonic()
+
+    def _wake(self, fut: asyncio.Future):
+        """ Hands the slot to the waiter, or on to the next one if it was cancelled while the handoff was scheduled """
+        if fut.done(): return self._release()
+        fut.set_result(None)
+
+    def _release(self):
+        woken = []
+        with self._lock:
+            self.inflight -= 1
+            while self._waiters and self.inflight < int(self.limit):
+                fut = self._waiters.popleft()
+                if fut.done(): continue
+                self.inflight += 1
+                woken.append(fut)
+        # the limit is shared by every loop, so waiters of other loops are woken from their own thread
+        loop = get_running_loop()
+        for fut in woken:
+            if fut.get_loop() is loop:
+                fut.set_result(None)
+                continue
+            try: fut.get_loop().call_soon_threadsafe(self._wake, fut)
+            except RuntimeError: self._release()
+
+    def is_dropped(self, resp: httpx.Response = None, error: BaseException = None) -> bool:
+        if error is not None: return isinstance(error, httpx.TimeoutException)
+        return resp.status_code in self.statuses
+
+    def release(self, started: float, resp: httpx.Response = None, error: BaseException = None):
+        """ Frees the slot taken at `started` and adapts the limit to the outcome of the request """
+        now = time.monotonic()
+        latency = now - started
+        with self._lock:
+            self.requests += 1
+            dropped = self.is_dropped(resp, error)
+            if not dropped and error is None:
+                self.latency = latency if self.latency is None else self.latency + (latency - self.latency) * 0.2
+                if self.min_latency is None or latency < self.min_latency: self.min_latency = latency
+                # let the no-load latency drift up slowly so a permanently slower upstream is not punished forever
+                else: self.min_latency += (latency - self.min_latency) * 0.01
+                dropped = self.latency > self.min_latency * self.tolerance
+            if dropped:
+                self.drops += 1
+                if started >= self.last_cut:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self.last_cut = now
+            elif error is None and self.inflight * 2 >= self.limit:
+                self.limit = min(self.max_limit, self.limit + self.increase)
+        self._release()
+
+    async def call(self, fn: Callable[..., Awaitable[httpx.Response]], *args, **kwargs) -> httpx.Response:
+        started = await self.acquire()
+        try: resp = await fn(*args, **kwargs)
+        except BaseException as e:
+            self.release(started, error = e)
+            raise
+        self.release(started, resp = resp)
+        return resp
+
+    @property
+    def stats(self) -> DictAny:
+        return {'limit': int(self.limit), 'inflight': self.inflight, 'waiting': len(self._waiters), 'latency': self.latency, 'min_latency': self.min_latency, 'requests': self.requests, 'drops': self.drops, 'queued': self.queued}
+
+
+class AdaptiveLimiter:
+    """
+    Keeps an AIMDLimit per upstream host (or one for the whole client with `per` = client)
+    in front of the async client. The AIMDLimit kwargs apply to every host.
+    """
+    def __init__(self, per: str = 'host', **kwargs):
+        self.per = per.lower()
+        self._kwargs = kwargs
+        self._limits: Dict[str, AIMDLimit] = {}
+        self._lock = threading.Lock()
+
+    def get_name(self, url: str) -> str:
+        if self.per == 'client': return 'client'
+        url = httpx.URL(url)
+        return f'{url.host}:{url.port}' if url.port else url.host
+
+    def get_limit(self, url: str) -> AIMDLimit:
+        name = self.get_name(url)
+        limit = self._limits.get(name)
+        if limit is None:
+            with self._lock: limit = self._limits.setdefault(name, AIMDLimit(name, **self._kwargs))
+        return limit
+
+    def __bool__(self): return True
+
+    @property
+    def limits(self) -> Dict[str, int]:
+        return {name: int(limit.limit) for name, limit in list(self._limits.items())}
+
+    @property
+    def stats(self) -> Dict[str, DictAny]:
+        return {name: limit.stats for name, limit in list(self._limits.items())}
+
+
+def get_adaptive_limiter(limiter: Union[bool, DictAny, AdaptiveLimiter] = None) -> Optional[AdaptiveLimiter]:
+    """
+    Returns an AdaptiveLimiter for the ApiClient.
+    True uses the AdaptiveLimitCfg defaults, a dict is passed as kwargs to AdaptiveLimiter.
+    """
+    if not limiter: return None
+    if limiter is True: return AdaptiveLimiter()
+    if isinstance(limiter, dict): return AdaptiveLimiter(**limiter)
+    return limiter
+
+
+__all__ = [
+    'AIMDLimit',
+    'AdaptiveLimiter',
+    'get_adaptive_limiter',
+]
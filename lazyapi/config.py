@@ -23,6 +23,14 @@ class FastAPICfg:
     allow_methods = envToList('FASTAPI_ALLOW_METHODS', default=["*"])
     allow_headers = envToList('FASTAPI_ALLOW_HEADERS', default=["*"])
     allow_credentials = envToBool('FASTAPI_ALLOW_CREDENTIALS', 'true')
+    include_metrics = envToBool('FASTAPI_METRICS', 'false')
+    metrics_path = envToStr('FASTAPI_METRICS_PATH', '/metrics')
+
+class JsonCfg:
+    backend = envToStr('LAZYAPI_JSON_BACKEND', 'auto')
+
+class LazyClsCfg:
+    cache_size = envToInt('LAZYAPI_CLS_CACHE_SIZE', 1024)
 
 
 class HttpCfg:
@@ -30,28 +38,164 @@ class HttpCfg:
     keep_alive = envToInt('HTTPX_KEEPALIVE', 50)
     max_connect = envToInt('HTTPX_MAXCONNECT', 200)
     headers = envToDict('HTTPX_HEADERS', default=DefaultHeaders)
+    batch_concurrency = envToInt('HTTPX_BATCH_CONCURRENCY', 20)
+    chunk_size = envToInt('HTTPX_CHUNK_SIZE', 64 * 1024)
+    prefetch = envToInt('HTTPX_PAGINATE_PREFETCH', 1)
+    max_reconnects = envToInt('HTTPX_STREAM_RECONNECTS', 5)
+    reconnect_delay = envToFloat('HTTPX_STREAM_RECONNECT_DELAY', 1.0)
+    http2 = envToBool('HTTPX_HTTP2', 'false')
+    share_pools = envToBool('HTTPX_SHARE_POOLS', 'true')
 
 class HttpClientCfg:
     timeout = httpx.Timeout(HttpCfg.timeout, connect=HttpCfg.timeout)
     limits = httpx.Limits(max_keepalive_connections=HttpCfg.keep_alive, max_connections=HttpCfg.max_connect)
     headers = HttpCfg.headers
+    batch_concurrency = HttpCfg.batch_concurrency
+    chunk_size = HttpCfg.chunk_size
+    http2 = HttpCfg.http2
+    share_pools = HttpCfg.share_pools
 
 class AsyncHttpCfg:
     timeout = envToFloat('HTTPX_ASYNC_TIMEOUT', 30.0)
     keep_alive = envToInt('HTTPX_ASYNC_KEEPALIVE', 50)
     max_connect = envToInt('HTTPX_ASYNC_MAXCONNECT', 200)
     headers = envToDict('HTTPX_ASYNC_HEADERS', default=DefaultHeaders)
+    batch_concurrency = envToInt('HTTPX_ASYNC_BATCH_CONCURRENCY', 100)
+    chunk_size = envToInt('HTTPX_ASYNC_CHUNK_SIZE', 64 * 1024)
+    prefetch = envToInt('HTTPX_ASYNC_PAGINATE_PREFETCH', 1)
+    max_reconnects = envToInt('HTTPX_ASYNC_STREAM_RECONNECTS', 5)
+    reconnect_delay = envToFloat('HTTPX_ASYNC_STREAM_RECONNECT_DELAY', 1.0)
+    http2 = envToBool('HTTPX_ASYNC_HTTP2', 'false')
+    share_pools = envToBool('HTTPX_ASYNC_SHARE_POOLS', 'true')
 
 class AsyncHttpClientCfg:
     timeout = httpx.Timeout(AsyncHttpCfg.timeout, connect=AsyncHttpCfg.timeout)
     limits = httpx.Limits(max_keepalive_connections=AsyncHttpCfg.keep_alive, max_connections=AsyncHttpCfg.max_connect)
     headers = AsyncHttpCfg.headers
+    batch_concurrency = AsyncHttpCfg.batch_concurrency
+    chunk_size = AsyncHttpCfg.chunk_size
+    http2 = AsyncHttpCfg.http2
+    share_pools = AsyncHttpCfg.share_pools
+
+class AdaptiveLimitCfg:
+    initial = envToInt('HTTPX_ASYNC_LIMIT_INITIAL', 20)
+    min_limit = envToInt('HTTPX_ASYNC_LIMIT_MIN', 1)
+    max_limit = envToInt('HTTPX_ASYNC_LIMIT_MAX', AsyncHttpCfg.max_connect)
+    increase = envToFloat('HTTPX_ASYNC_LIMIT_INCREASE', 1.0)
+    backoff = envToFloat('HTTPX_ASYNC_LIMIT_BACKOFF', 0.5)
+    tolerance = envToFloat('HTTPX_ASYNC_LIMIT_TOLERANCE', 2.0)
+    statuses = [int(i) for i in envToList('HTTPX_ASYNC_LIMIT_STATUSES', default=['429', '503'])]
+
+class HedgeCfg:
+    delay = envToFloat('HTTPX_ASYNC_HEDGE_DELAY', 0.0)
+    percentile = envToFloat('HTTPX_ASYNC_HEDGE_PERCENTILE', 95.0)
+    min_delay = envToFloat('HTTPX_ASYNC_HEDGE_MIN_DELAY', 0.01)
+    min_samples = envToInt('HTTPX_ASYNC_HEDGE_MIN_SAMPLES', 20)
+    window = envToInt('HTTPX_ASYNC_HEDGE_WINDOW', 1000)
+    max_rate = envToFloat('HTTPX_ASYNC_HEDGE_MAX_RATE', 0.05)
+    max_burst = envToFloat('HTTPX_ASYNC_HEDGE_MAX_BURST', 10.0)
+
+class BalanceCfg:
+    strategy = envToStr('HTTPX_LB_STRATEGY', 'p2c')
+    eject_failures = envToInt('HTTPX_LB_EJECT_FAILURES', 5)
+    eject_time = envToFloat('HTTPX_LB_EJECT_TIME', 30.0)
+    ewma_alpha = envToFloat('HTTPX_LB_EWMA_ALPHA', 0.3)
+    statuses = [int(i) for i in envToList('HTTPX_LB_STATUSES', default=['500', '502', '503', '504'])]
+
+class DNSCfg:
+    enabled = envToBool('HTTPX_DNS_CACHE', 'false')
+    ttl = envToFloat('HTTPX_DNS_TTL', 30.0)
+    stale_ttl = envToFloat('HTTPX_DNS_STALE_TTL', 300.0)
+    max_entries = envToInt('HTTPX_DNS_MAX_ENTRIES', 1024)
+
+class WarmupCfg:
+    connections = envToInt('HTTPX_WARMUP_CONNECTIONS', 4)
+    method = envToStr('HTTPX_WARMUP_METHOD', 'HEAD')
+    path = envToStr('HTTPX_WARMUP_PATH', '/')
+
+class MetricsCfg:
+    prefix = envToStr('HTTPX_METRICS_PREFIX', 'lazyapi')
+    buckets = [float(i) for i in envToList('HTTPX_METRICS_BUCKETS', default=['0.005', '0.01', '0.025', '0.05', '0.1', '0.25', '0.5', '1', '2.5', '5', '10'])]
+    phases = envToBool('HTTPX_METRICS_PHASES', 'true')
+    max_routes = envToInt('HTTPX_METRICS_MAX_ROUTES', 500)
+
+class CacheCfg:
+    directory = envToStr('HTTPX_CACHE_DIR', None)
+    size_limit = envToInt('HTTPX_CACHE_SIZE_LIMIT', 2 ** 30)
+    eviction_policy = envToStr('HTTPX_CACHE_EVICTION', 'least-recently-used')
+    default_ttl = envToFloat('HTTPX_CACHE_TTL', 0.0)
+    vary = envToList('HTTPX_CACHE_VARY', default=['Accept', 'Authorization'])
+    revalidate_ttl = envToFloat('HTTPX_CACHE_REVALIDATE_TTL', 86400.0)
+    max_ttl = envToFloat('HTTPX_CACHE_MAX_TTL', 7 * 86400.0)
+
+class MemoryCacheCfg:
+    ttl = envToFloat('HTTPX_MEMCACHE_TTL', 5.0)
+    max_entries = envToInt('HTTPX_MEMCACHE_MAX_ENTRIES', 1024)
+    max_bytes = envToInt('HTTPX_MEMCACHE_MAX_BYTES', 64 * 2 ** 20)
+    vary = envToList('HTTPX_MEMCACHE_VARY', default=['Accept', 'Authorization'])
+
+class SharedCfg:
+    backend = envToStr('HTTPX_SHARED_BACKEND', 'auto')
+    directory = envToStr('HTTPX_SHARED_DIR', None)
+    prefix = envToStr('HTTPX_SHARED_PREFIX', 'lazyapi')
+    lock_ttl = envToFloat('HTTPX_SHARED_LOCK_TTL', 30.0)
+    poll_interval = envToFloat('HTTPX_SHARED_POLL_INTERVAL', 0.05)
+    result_ttl = envToFloat('HTTPX_SHARED_RESULT_TTL', 1.0)
+
+class RateLimitCfg:
+    rate = envToFloat('HTTPX_RATE_LIMIT', 10.0)
+    burst = envToInt('HTTPX_RATE_LIMIT_BURST', 0)
+    per = envToStr('HTTPX_RATE_LIMIT_PER', 'host')
+
+class BreakerCfg:
+    error_rate = envToFloat('HTTPX_BREAKER_ERROR_RATE', 0.5)
+    slow_rate = envToFloat('HTTPX_BREAKER_SLOW_RATE', 0.0)
+    slow_call = envToFloat('HTTPX_BREAKER_SLOW_CALL', 10.0)
+    min_requests = envToInt('HTTPX_BREAKER_MIN_REQUESTS', 10)
+    window = envToFloat('HTTPX_BREAKER_WINDOW', 30.0)
+    open_timeout = envToFloat('HTTPX_BREAKER_OPEN_TIMEOUT', 30.0)
+    probes = envToInt('HTTPX_BREAKER_PROBES', 1)
+    statuses = [int(i) for i in envToList('HTTPX_BREAKER_STATUSES', default=['500', '502', '503', '504'])]
+
+class RetryCfg:
+    max_attempts = envToInt('HTTPX_RETRY_ATTEMPTS', 3)
+    wait_multiplier = envToInt('HTTPX_RETRY_WAIT_MULTIPLIER', 100)
+    wait_max = envToInt('HTTPX_RETRY_WAIT_MAX', 5000)
+    wait_jitter = envToInt('HTTPX_RETRY_WAIT_JITTER', 100)
+    retry_statuses = [int(i) for i in envToList('HTTPX_RETRY_STATUSES', default=['429', '502', '503', '504'])]
+    max_retry_after = envToFloat('HTTPX_RETRY_AFTER_MAX', 60000.0)
+    budget_ratio = envToFloat('HTTPX_RETRY_BUDGET_RATIO', 0.2)
+    budget_min_per_sec = envToFloat('HTTPX_RETRY_BUDGET_MIN', 10.0)
+
+    @classmethod
+    def get_retry_kwargs(cls):
+        return dict(
+            stop_max_attempt_number = cls.max_attempts,
+            wait_exponential_multiplier = cls.wait_multiplier,
+            wait_exponential_max = cls.wait_max,
+            wait_jitter_max = cls.wait_jitter,
+            retry_on_exception = (httpx.TransportError,)
+        )
 
 
 __all__ = [
+    'JsonCfg',
+    'LazyClsCfg',
     'HttpCfg',
     'HttpClientCfg',
     'AsyncHttpCfg',
     'AsyncHttpClientCfg',
+    'AdaptiveLimitCfg',
+    'HedgeCfg',
+    'BalanceCfg',
+    'DNSCfg',
+    'WarmupCfg',
+    'MetricsCfg',
+    'CacheCfg',
+    'MemoryCacheCfg',
+    'SharedCfg',
+    'RateLimitCfg',
+    'BreakerCfg',
+    'RetryCfg',
     'DefaultHeaders'
 ]
@@ -0,0 +1,199 @@
+import time
+import socket
+import asyncio
+import httpcore
+import ipaddress
+import threading
+import contextvars
+from lazycls.types import *
+
+# network backends are pluggable from httpcore 0.14 (setup.py pins the range this was built against)
+try:
+    from httpcore.backends.base import NetworkBackend, AsyncNetworkBackend, NetworkStream, AsyncNetworkStream
+    from httpcore.backends.sync import SyncBackend
+    from httpcore.backends.auto import AutoBackend
+except ImportError:
+    NetworkBackend = AsyncNetworkBackend = object
+    NetworkStream = AsyncNetworkStream = Any
+    SyncBackend = AutoBackend = None
+from .config import DNSCfg, logger
+
+# secs spent resolving the host of the last connect in this context, read by the request metrics
+resolve_time: contextvars.ContextVar = contextvars.ContextVar('lazyapi_resolve_time', default = None)
+
+
+def is_ip_address(host: str) -> bool:
+    try: ipaddress.ip_address(host)
+    except ValueError: return False
+    return True
+
+
+def get_addresses(infos: List[Tuple]) -> List[str]:
+    """ Unique addresses of getaddrinfo results, in resolver order """
+    addrs = []
+    for info in infos:
+        if info[4][0] not in addrs: addrs.append(info[4][0])
+    return addrs
+
+
+class DNSCache:
+    """
+    In-process cache of resolved host addresses, so new connections skip the resolver for `ttl` secs.
+    When a refresh fails the stale addresses are kept for another `stale_ttl` secs instead of failing the connect.
+    Concurrent async lookups of the same host in a loop share one resolution.
+    """
+    def __init__(self, ttl: float = None, stale_ttl: float = None, max_entries: int = None):
+        self.ttl = ttl if ttl is not None else DNSCfg.ttl
+        self.stale_ttl = stale_ttl if stale_ttl is not None else DNSCfg.stale_ttl
+        self.max_entries = max_entries or DNSCfg.max_entries
+        self._entries: Dict[Tuple[str, int], Tuple[float, List[str]]] = {}
+        self._pending: Dict[Tuple[int, str, int], asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def get(self, host: str, port: int) -> Optional[List[str]]:
+        entry = self._entries.get((host, port))
+        if entry is None or entry[0] < time.monotonic(): return None
+        self.hits += 1
+        return entry[1]
+
+    def set(self, host: str, port: int, addrs: List[str]):
+        with self._lock:
+            if len(self._entries) >= self.max_entries and (host, port) not in self._entries:
+                now = time.monotonic()
+                for key in [k for k, v in self._entries.items() if v[0] < now]: self._entries.pop(key)
+                if len(self._entries) >= self.max_entries: self._entries.pop(next(iter(self._entries)))
+            self._entries[(host, port)] = (time.monotonic() + self.ttl, addrs)
+
+    def get_stale(self, host: str, port: int, error: Exception) -> List[str]:
+        """ Returns the expired addresses while they are within stale_ttl, otherwise raises the resolver error """
+        entry = self._entries.get((host, port))
+        if entry is None or entry[0] + self.stale_ttl < time.monotonic(): raise httpcore.ConnectError(str(error)) from error
+        logger.debug(f'Unable to resolve {host}: {error}. Using cached addresses')
+        self.stale += 1
+        return entry[1]
+
+    def resolve(self, host: str, port: int) -> List[str]:
+        if is_ip_address(host): return [host]
+        addrs = self.get(host, port)
+        if addrs: return addrs
+        self.misses += 1
+        try: addrs = get_addresses(socket.getaddrinfo(host, port, type = socket.SOCK_STREAM))
+        except OSError as e: return self.get_stale(host, port, e)
+        self.set(host, port, addrs)
+        return addrs
+
+    async def async_resolve(self, host: str, port: int) -> List[str]:
+        if is_ip_address(host): return [host]
+        addrs = self.get(host, port)
+        if addrs: return addrs
+        loop = asyncio.get_running_loop()
+        key = (id(loop), host, port)
+        if key in self._pending: return await asyncio.shield(self._pending[key])
+        self.misses += 1
+        future = self._pending[key] = loop.create_future()
+        try:
+            try: addrs = get_addresses(await loop.getaddrinfo(host, port, type = socket.SOCK_STREAM))
+            except OSError as e: addrs = self.get_stale(host, port, e)
+            else: self.set(host, port, addrs)
+            future.set_result(addrs)
+            return addrs
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally: self._pending.pop(key, None)
+
+    def clear(self, host: str = None):
+        with self._lock:
+            if host is None: self._entries.clear()
+            for key in [k for k in self._entries if k[0] == host]: self._entries.pop(key)
+
+    @property
+    def stats(self) -> DictAny:
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'stale': self.stale}
+
+
+def get_attempt_timeout(deadline: Optional[float], attempts: int) -> Optional[float]:
+    """ Splits what is left of the connect timeout evenly over the remaining address attempts """
+    if deadline is None: return None
+    return max(deadline - time.monotonic(), 0.0) / attempts
+
+
+class CachingBackend(NetworkBackend):
+    """ httpcore network backend that connects to the DNSCache addresses, trying each in turn within the one connect timeout """
+    def __init__(self, dns_cache: DNSCache, backend: NetworkBackend = None):
+        self.dns_cache = dns_cache
+        self.backend = backend or SyncBackend()
+
+    def connect_tcp(self, host: str, port: int, timeout: float = None, local_address: str = None) -> NetworkStream:
+        started, deadline = time.perf_counter(), None if timeout is None else time.monotonic() + timeout
+        addrs = self.dns_cache.resolve(host, port)
+        resolve_time.set(time.perf_counter() - started)
+        for n, addr in enumerate(addrs):
+            try: return self.backend.connect_tcp(addr, port, timeout = get_attempt_timeout(deadline, len(addrs) - n), local_address = local_address)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout):
+                if n + 1 < len(addrs): continue
+                self.dns_cache.clear(host)
+                raise
+
+    def connect_unix_socket(self, path: str, timeout: float = None) -> NetworkStream: return self.backend.connect_unix_socket(path, timeout = timeout)
+
+    def sleep(self, seconds: float): return self.backend.sleep(seconds)
+
+
+class AsyncCachingBackend(AsyncNetworkBackend):
+    """ Async httpcore network backend that connects to the DNSCache addresses, trying each in turn within the one connect timeout """
+    def __init__(self, dns_cache: DNSCache, backend: AsyncNetworkBackend = None):
+        self.dns_cache = dns_cache
+        self.backend = backend or AutoBackend()
+
+    async def connect_tcp(self, host: str, port: int, timeout: float = None, local_address: str = None) -> AsyncNetworkStream:
+        started, deadline = time.perf_counter(), None if timeout is None else time.monotonic() + timeout
+        addrs = await self.dns_cache.async_resolve(host, port)
+        resolve_time.set(time.perf_counter() - started)
+        for n, addr in enumerate(addrs):
+            try: return await self.backend.connect_tcp(addr, port, timeout = get_attempt_timeout(deadline, len(addrs) - n), local_address = local_address)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout):
+                if n + 1 < len(addrs): continue
+                self.dns_cache.clear(host)
+                raise
+
+    async def connect_unix_socket(self, path: str, timeout: float = None) -> AsyncNetworkStream: return await self.backend.connect_unix_socket(path, timeout = timeout)
+
+    async def sleep(self, seconds: float): return await self.backend.sleep(seconds)
+
+
+_dns_cache: Optional[DNSCache] = None
+_dns_lock = threading.Lock()
+
+
+def get_dns_cache(dns_cache: Union[bool, float, DictAny, DNSCache] = None) -> Optional[DNSCache]:
+    """
+    Returns a DNSCache for the connection pools.
+    True returns the process-wide cache with the DNSCfg defaults, a number is the ttl in secs and a dict is passed as kwargs to DNSCache.
+    """
+    global _dns_cache
+    if not dns_cache: return None
+    if SyncBackend is None:
+        logger.warning('This httpcore version has no pluggable network backends. The DNS cache is disabled')
+        return None
+    if dns_cache is True:
+        with _dns_lock:
+            if _dns_cache is None: _dns_cache = DNSCache()
+        return _dns_cache
+    if isinstance(dns_cache, (int, float)): return DNSCache(ttl = dns_cache)
+    if isinstance(dns_cache, dict): return DNSCache(**dns_cache)
+    return dns_cache
+
+
+__all__ = [
+    'resolve_time',
+    'is_ip_address',
+    'DNSCache',
+    'CachingBackend',
+    'AsyncCachingBackend',
+    'get_dns_cache',
+]
@@ -5,9 +5,18 @@ from starlette.middleware.cors import CORSMiddleware
 from starlette.requests import Request
 from lazycls.types import *
 from .config import FastAPICfg
+from .metrics import Metrics, metrics_registry
 
 
-def create_fastapi(app_name: str = None, title: str = None, desc: str = None, version: str = None, include_middleware: bool = FastAPICfg.include_middleware, allow_credentials: bool = None, allow_origins: List[str] = None, allow_methods: List[str] = None, allow_headers: List[str] = None, **kwargs) -> Type[FastAPI]:
+def mount_metrics(app: FastAPI, metrics: Metrics = None, path: str = None) -> FastAPI:
+    """ Adds a Prometheus scrape endpoint for the ApiClient metrics (the process-wide metrics_registry by default) """
+    metrics = metrics or metrics_registry
+    @app.get(path or FastAPICfg.metrics_path, include_in_schema=False)
+    async def get_metrics(): return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
+    return app
+
+
+def create_fastapi(app_name: str = None, title: str = None, desc: str = None, version: str = None, include_middleware: bool = FastAPICfg.include_middleware, allow_credentials: bool = None, allow_origins: List[str] = None, allow_methods: List[str] = None, allow_headers: List[str] = None, include_metrics: bool = FastAPICfg.include_metrics, metrics: Metrics = None, metrics_path: str = None, **kwargs) -> Type[FastAPI]:
     if not title: title = FastAPICfg.app_title + (': ' + app_name if app_name else '')
     if not desc: desc = FastAPICfg.app_desc + (' ' + app_name if app_name else '')
     if not version: version = FastAPICfg.app_version
@@ -24,6 +33,7 @@ def create_fastapi(app_name: str = None, title: str = None, desc: str = None, ve
             allow_methods=allow_methods,
             allow_headers=allow_headers,
         )
+    if include_metrics or metrics: mount_metrics(new_fastapi_app, metrics=metrics, path=metrics_path)
     return new_fastapi_app
 
 
@@ -92,6 +102,7 @@ def create_func_multi_validator_request(func: Callable, keys: List[str], alias:
 __all__ = [
     'FastAPICfg',
     'create_fastapi',
+    'mount_metrics',
     'Request',
     'PlainTextResponse',
     'JSONResponse',
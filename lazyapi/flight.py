@@ -0,0 +1,93 @@
+import time
+import asyncio
+from lazycls.types import *
+from .config import SharedCfg
+from .cache import merge_headers, make_cache_key, get_decoded_headers, DiskCache
+from .shared import SharedBackend
+
+BodyKwargs = {'content', 'data', 'json', 'files'}
+
+
+def dump_response(resp: Any) -> DictAny:
+    resp = getattr(resp, 'resp', resp)
+    return {'status_code': resp.status_code, 'headers': get_decoded_headers(resp.headers), 'content': resp.content, 'url': str(resp.url)}
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical idempotent async requests into a single in-flight call.
+    Every waiter receives the same result (or exception) of the shared call.
+    The shared call runs as its own task, so cancelling one waiter does not cancel the others.
+    With a SharedBackend the call is also shared across processes: the first process takes a lock and
+    publishes the response for `result_ttl` secs, the others wait for it and get a copy of the response
+    (as an unwrapped httpx.Response). If the holder fails, the waiters make the call themselves.
+    """
+    def __init__(self, methods: List[str] = ['get', 'head', 'options'], backend: SharedBackend = None, lock_ttl: float = None, poll_interval: float = None, result_ttl: float = None):
+        self.methods = {m.lower() for m in methods}
+        self.backend = backend
+        self.lock_ttl = lock_ttl or SharedCfg.lock_ttl
+        self.poll_interval = poll_interval or SharedCfg.poll_interval
+        self.result_ttl = result_ttl or SharedCfg.result_ttl
+        self._calls: Dict[Tuple[int, str], asyncio.Future] = {}
+        self.calls = 0
+        self.collapsed = 0
+        self.shared = 0
+
+    def is_coalescable(self, method: str, kwargs: DictAny) -> bool:
+        return method.lower() in self.methods and not BodyKwargs.intersection(kwargs)
+
+    def get_key(self, method: str, url: str, kwargs: DictAny, headers: DictAny = None) -> str:
+        """ `headers` are the client headers, so only requests sent with the same credentials are coalesced """
+        headers = merge_headers(headers, kwargs.get('headers'))
+        return make_cache_key(method, url, params=kwargs.get('params'), headers=headers, vary=list(headers))
+
+    @property
+    def inflight(self) -> int: return len(self._calls)
+
+    async def do(self, key: str, func: Callable[..., Coroutine], *args, **kwargs) -> Any:
+        """ Awaits func(*args, **kwargs), sharing the call with any identical in-flight request """
+        fkey = (id(asyncio.get_running_loop()), key)
+        task = self._calls.get(fkey)
+        if task is None:
+            task = asyncio.ensure_future(self._call(key, func, *args, **kwargs) if self.backend else func(*args, **kwargs))
+            self._calls[fkey] = task
+            task.add_done_callback(lambda t: self._release(fkey, t))
+            self.calls += 1
+        else: self.collapsed += 1
+        return await asyncio.shield(task)
+
+    async def _call(self, key: str, func: Callable[..., Coroutine], *args, **kwargs) -> Any:
+        # backend calls block on redis / sqlite, so they run in the executor
+        lock_key, result_key = f'flight:lock:{key}', f'flight:result:{key}'
+        token = await self.backend.run(self.backend.acquire_lock, lock_key, self.lock_ttl)
+        if token is not None:
+            try:
+                result = await func(*args, **kwargs)
+                await self.backend.run(self.backend.set, result_key, dump_response(result), expire=self.result_ttl)
+                return result
+            finally: await self.backend.run(self.backend.release_lock, lock_key, token)
+        deadline = time.monotonic() + self.lock_ttl
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            entry = await self.backend.run(self.backend.get, result_key)
+            if entry is not None:
+                self.shared += 1
+                return DiskCache.to_response(entry, status='shared')
+            if not await self.backend.run(self.backend.is_locked, lock_key): break
+        return await func(*args, **kwargs)
+
+    def _release(self, key: Tuple[int, str], task: asyncio.Future):
+        if self._calls.get(key) is task: self._calls.pop(key)
+        # mark the exception as retrieved if every waiter was cancelled
+        if not task.cancelled(): task.exception()
+
+    def __bool__(self): return True
+
+    @property
+    def stats(self) -> DictAny:
+        return {'calls': self.calls, 'collapsed': self.collapsed, 'shared': self.shared, 'inflight': self.inflight}
+
+
+__all__ = [
+    'SingleFlight',
+]
@@ -0,0 +1,139 @@
+import time
+import httpx
+import asyncio
+import threading
+from collections import deque
+from typing import Deque, Awaitable
+from lazycls.types import *
+from .config import HedgeCfg
+from .flight import BodyKwargs
+
+
+class LatencyTracker:
+    """ Keeps the latencies of the last `window` requests and their percentile, refreshed every 16 samples """
+    def __init__(self, window: int = None, percentile: float = None):
+        self.percentile = percentile or HedgeCfg.percentile
+        self._samples: Deque[float] = deque(maxlen = window or HedgeCfg.window)
+        self._value = None
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float):
+        with self._lock:
+            self._samples.append(latency)
+            self._count += 1
+            if self._count % 16 == 0: self._value = None
+
+    def __len__(self): return len(self._samples)
+
+    @property
+    def value(self) -> Optional[float]:
+        with self._lock:
+            if self._value is None and self._samples:
+                samples = sorted(self._samples)
+                self._value = samples[min(len(samples) - 1, int(len(samples) * self.percentile / 100.0))]
+            return self._value
+
+
+class HedgePolicy:
+    """
+    Hedges idempotent async requests: if no response arrives within the hedge delay a duplicate request
+    is sent, the first successful (non 5xx) response wins and the other request is cancelled.
+    The delay is a fixed `delay` in secs or the `percentile` of the recent latencies (at least `min_delay`),
+    with no hedging until `min_samples` requests have completed.
+    Hedges are capped to `max_rate` of the requests (with a burst of `max_burst`) so a slow upstream
+    does not get double the load.
+    """
+    def __init__(self, delay: float = None, percentile: float = None, min_delay: float = None, min_samples: int = None, window: int = None, max_rate: float = None, max_burst: float = None, methods: List[str] = ['get', 'head', 'options']):
+        self.delay = delay or HedgeCfg.delay or None
+        self.min_delay = HedgeCfg.min_delay if min_delay is None else min_delay
+        self.min_samples = HedgeCfg.min_samples if min_samples is None else min_samples
+        self.max_rate = HedgeCfg.max_rate if max_rate is None else max_rate
+        self.max_burst = max_burst or HedgeCfg.max_burst
+        self.methods = {m.lower() for m in methods}
+        self.latencies = LatencyTracker(window, percentile)
+        self.tokens = 1.0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0
+        self.won = 0
+        self.capped = 0
+
+    def is_hedgeable(self, method: str, kwargs: DictAny) -> bool:
+        return method.lower() in self.methods and not BodyKwargs.intersection(kwargs)
+
+    def get_delay(self) -> Optional[float]:
+        if self.delay: return self.delay
+        if len(self.latencies) < self.min_samples: return None
+        return max(self.min_delay, self.latencies.value)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.tokens < 1:
+                self.capped += 1
+                return False
+            self.tokens -= 1
+            self.hedged += 1
+            return True
+
+    @staticmethod
+    def is_success(task: asyncio.Future) -> bool:
+        return not task.cancelled() and task.exception() is None and task.result()[1].status_code < 500
+
+    async def _timed(self, fn: Callable[..., Awaitable[httpx.Response]], *args, **kwargs) -> Tuple[float, httpx.Response]:
+        start = time.monotonic()
+        resp = await fn(*args, **kwargs)
+        return time.monotonic() - start, resp
+
+    async def call(self, fn: Callable[..., Awaitable[httpx.Response]], *args, **kwargs) -> httpx.Response:
+        """ Awaits fn(*args, **kwargs), sending a hedged duplicate if it is slower than the hedge delay """
+        with self._lock:
+            self.requests += 1
+            self.tokens = min(self.max_burst, self.tokens + self.max_rate)
+        delay = self.get_delay()
+        primary = asyncio.ensure_future(self._timed(fn, *args, **kwargs))
+        tasks = [primary]
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout = delay)
+                if not done and self.withdraw(): tasks.append(asyncio.ensure_future(self._timed(fn, *args, **kwargs)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when = asyncio.FIRST_COMPLETED)
+                winner = next((t for t in tasks if t in done and self.is_success(t)), None)
+                if winner is not None: break
+            else: winner = primary
+            if winner is not primary: self.won += 1
+            latency, resp = winner.result()
+            self.latencies.record(latency)
+            return resp
+        finally:
+            for task in tasks:
+                if not task.done(): task.cancel()
+                # mark the exception of the losing request as retrieved
+                elif not task.cancelled(): task.exception()
+
+    def __bool__(self): return True
+
+    @property
+    def stats(self) -> DictAny:
+        return {'requests': self.requests, 'hedged': self.hedged, 'won': self.won, 'capped': self.capped, 'delay': self.get_delay(), 'hedge_rate': self.hedged / self.requests if self.requests else 0.0}
+
+
+def get_hedge_policy(hedge: Union[bool, float, DictAny, HedgePolicy] = None) -> Optional[HedgePolicy]:
+    """
+    Returns a HedgePolicy for the ApiClient.
+    True uses the HedgeCfg defaults, a number is a fixed hedge delay in secs and a dict is passed as kwargs to HedgePolicy.
+    """
+    if not hedge: return None
+    if hedge is True: return HedgePolicy()
+    if isinstance(hedge, (int, float)): return HedgePolicy(delay = hedge)
+    if isinstance(hedge, dict): return HedgePolicy(**hedge)
+    return hedge
+
+
+__all__ = [
+    'LatencyTracker',
+    'HedgePolicy',
+    'get_hedge_policy',
+]
@@ -0,0 +1,126 @@
+import json
+import threading
+from httpx import Response
+from lazycls.types import *
+from .config import JsonCfg, logger
+
+try: import orjson
+except ImportError: orjson = None
+
+try: import simdjson
+except ImportError: simdjson = None
+
+Backends = ['orjson', 'simdjson', 'json']
+
+
+def get_backend(name: str = 'auto') -> Tuple[str, Callable[[Union[str, bytes]], Any]]:
+    """
+    Returns the (name, loads) of the JSON decode backend.
+    `auto` picks the fastest installed backend in the order of orjson -> simdjson -> json.
+    """
+    name = (name or 'auto').lower()
+    if name in {'orjson', 'auto'} and orjson is not None: return 'orjson', orjson.loads
+    if name in {'simdjson', 'auto'} and simdjson is not None: return 'simdjson', simdjson.loads
+    if name not in {'json', 'auto'}: logger.warning(f'JSON backend {name} is not available. Falling back to json')
+    return 'json', json.loads
+
+
+backend, _loads = get_backend(JsonCfg.backend)
+
+
+def set_backend(name: str):
+    """ Changes the JSON decode backend used by lazyapi """
+    global backend, _loads
+    backend, _loads = get_backend(name)
+
+
+def loads(content: Union[str, bytes]) -> Any:
+    """ Decodes the content with the selected JSON backend """
+    return _loads(content)
+
+
+def decode_response(resp: Response) -> Any:
+    """
+    Decodes a JSON response body with the selected backend.
+    Bodies that declare a non utf-8 charset are decoded from the text instead.
+    """
+    encoding = resp.charset_encoding
+    if encoding and encoding.lower().replace('-', '').replace('_', '') != 'utf8': return _loads(resp.text)
+    return _loads(resp.content)
+
+
+def to_pointer(key: Union[str, List[Union[str, int]]]) -> str:
+    """
+    Converts a key to a JSON pointer (RFC 6901).
+    A str starting with `/` is already a pointer, any other str is a single top-level key
+    and a list / tuple is a path of keys / indexes.
+    """
+    if isinstance(key, str):
+        if key.startswith('/'): return key
+        key = [key]
+    return ''.join('/' + str(k).replace('~', '~0').replace('/', '~1') for k in key)
+
+
+def split_pointer(pointer: str) -> List[str]:
+    if not pointer: return []
+    return [k.replace('~1', '/').replace('~0', '~') for k in pointer[1:].split('/')]
+
+
+def resolve_pointer(data: Any, pointer: str, default: Any = None) -> Any:
+    """ Resolves a JSON pointer against already decoded data """
+    for key in split_pointer(pointer):
+        try: data = data[int(key)] if isinstance(data, list) else data[key]
+        except (KeyError, IndexError, ValueError, TypeError): return default
+    return data
+
+
+_local = threading.local()
+
+def get_parser() -> 'simdjson.Parser':
+    if getattr(_local, 'parser', None) is None: _local.parser = simdjson.Parser()
+    return _local.parser
+
+
+def _simdjson_extract(content: bytes, pointer: str, default: Any = None) -> Any:
+    try: doc = get_parser().parse(content)
+    except RuntimeError:
+        # the thread's parser still has a live document, so use a new one
+        doc = simdjson.Parser().parse(content)
+    try: value = doc.at_pointer(pointer)
+    except (KeyError, IndexError, ValueError, TypeError): return default
+    if isinstance(value, simdjson.Object): return value.as_dict()
+    if isinstance(value, simdjson.Array): return value.as_list()
+    return value
+
+
+def extract(content: Union[str, bytes], pointer: str, default: Any = None) -> Any:
+    """
+    Extracts the value at the JSON pointer without decoding the rest of the document.
+    Uses simdjson's lazy parser when installed, otherwise decodes with the selected backend.
+    Returns default if the pointer does not exist.
+    """
+    if simdjson is not None:
+        if isinstance(content, str): content = content.encode('utf-8')
+        return _simdjson_extract(content, pointer, default)
+    return resolve_pointer(_loads(content), pointer, default)
+
+
+def extract_response(resp: Response, pointer: str, default: Any = None) -> Any:
+    """ Extracts the value at the JSON pointer from the response body """
+    encoding = resp.charset_encoding
+    if encoding and encoding.lower().replace('-', '').replace('_', '') != 'utf8': return extract(resp.text, pointer, default)
+    return extract(resp.content, pointer, default)
+
+
+__all__ = [
+    'Backends',
+    'get_backend',
+    'set_backend',
+    'loads',
+    'decode_response',
+    'to_pointer',
+    'split_pointer',
+    'resolve_pointer',
+    'extract',
+    'extract_response',
+]
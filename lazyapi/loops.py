@@ -0,0 +1,78 @@
+import asyncio
+import weakref
+import threading
+from typing import Awaitable
+from lazycls.types import *
+from .config import logger
+
+
+def get_running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try: return asyncio.get_running_loop()
+    except RuntimeError: return None
+
+
+class LoopLocal:
+    """
+    Holds one value per running event loop, the way threading.local does for threads.
+    The value is created by `factory` the first time it is used in a loop. When the loop shuts down its
+    async generators (asyncio.run and pytest-asyncio do this before closing the loop) it is passed to the
+    async `cleanup`. Values of loops closed without that are dropped once the loop is garbage collected or
+    the next time a value is created.
+    Outside of a running loop a single value is shared.
+    """
+    def __init__(self, factory: Callable[[], Any], cleanup: Callable[[Any], Awaitable] = None):
+        self.factory = factory
+        self.cleanup = cleanup
+        self._items: Dict[Optional[int], Tuple[Optional[weakref.ref], Any, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        loop = get_running_loop()
+        key = id(loop) if loop else None
+        item = self._items.get(key)
+        if item is not None and (item[0] is None or item[0]() is loop): return item[1]
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and (item[0] is None or item[0]() is loop): return item[1]
+            self._prune()
+            value = self.factory()
+            if loop is None:
+                self._items[key] = (None, value, None)
+                return value
+            watcher = self._watch(key, value)
+            self._items[key] = (weakref.ref(loop), value, watcher)
+            weakref.finalize(loop, self._drop, key, value)
+        asyncio.ensure_future(watcher.__anext__())
+        return value
+
+    async def _watch(self, key: int, value: Any):
+        # closed by loop.shutdown_asyncgens() while the loop can still run the async cleanup
+        try: yield
+        finally:
+            self._drop(key, value)
+            if self.cleanup:
+                try: await self.cleanup(value)
+                except Exception as e: logger.debug(f'Unable to clean up {value}: {e}')
+
+    def _prune(self):
+        # drops the values of loops that were closed without shutting down their async generators
+        for key, item in list(self._items.items()):
+            if item[0] is None: continue
+            loop = item[0]()
+            if loop is None or loop.is_closed(): self._items.pop(key)
+
+    def _drop(self, key: int, value: Any):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[1] is value: self._items.pop(key)
+
+    def values(self) -> List[Any]:
+        return [item[1] for item in list(self._items.values())]
+
+    def __len__(self): return len(self._items)
+
+
+__all__ = [
+    'get_running_loop',
+    'LoopLocal',
+]
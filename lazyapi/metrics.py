@@ -0,0 +1,308 @@
+import re
+import time
+import httpx
+import bisect
+import threading
+from typing import Awaitable, Set
+from lazycls.types import *
+from .config import MetricsCfg, logger
+from .dns import resolve_time
+
+# trace span -> phase, timed from its .started to its .complete event
+TracePhases = {
+    'connection.connect_tcp': 'connect',
+    'connection.start_tls': 'tls',
+}
+HeaderTraces = {'http11.send_request_headers.started', 'http2.send_request_headers.started'}
+ResponseTraces = {'http11.receive_response_headers.complete', 'http2.receive_response_headers.complete'}
+
+IdSegment = re.compile(r'^(\d+|[0-9a-fA-F-]{16,}|.*\d.*[-_.].*\d.*|[A-Za-z0-9_-]{24,})$')
+TemplateSegment = re.compile(r'\{[^/]+\}')
+
+
+class Histogram:
+    """ Fixed bucket histogram with cumulative counts on export, as Prometheus expects """
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """ Estimates the q (0-1) quantile by interpolating within its bucket """
+        if not self.count: return None
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i else 0.0
+                if i == len(self.buckets): return lower
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def cumulative(self) -> List[int]:
+        counts, total = [], 0
+        for n in self.counts:
+            total += n
+            counts.append(total)
+        return counts
+
+
+class RequestRecord:
+    """
+    Timings and outcome of a single request attempt, passed to the Metrics hooks.
+    `timings` holds the secs spent in each phase: wait (for a pooled connection), dns, connect, tls, ttfb and total.
+    """
+    __slots__ = ('method', 'url', 'host', 'route', 'status', 'error', 'started', 'timings', 'bytes_in', 'bytes_out', '_marks')
+
+    def __init__(self, method: str, url: str, host: str, route: str):
+        self.method = method
+        self.url = url
+        self.host = host
+        self.route = route
+        self.status: Optional[int] = None
+        self.error: Optional[BaseException] = None
+        self.started = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._marks: Dict[str, float] = {}
+
+    def trace(self, name: str, info: DictAny):
+        """ httpcore trace extension """
+        now = time.perf_counter()
+        if 'wait' not in self.timings: self.timings['wait'] = now - self.started
+        if name in HeaderTraces: self._marks['headers'] = now
+        elif name in ResponseTraces and 'headers' in self._marks: self.timings['ttfb'] = now - self._marks['headers']
+        else:
+            span, _, event = name.rpartition('.')
+            if span not in TracePhases: return
+            if event == 'started':
+                self._marks[span] = now
+                if span == 'connection.connect_tcp': resolve_time.set(None)
+            elif event == 'complete' and span in self._marks:
+                self.timings[TracePhases[span]] = now - self._marks[span]
+                dns = resolve_time.get() if span == 'connection.connect_tcp' else None
+                if dns is not None:
+                    self.timings['dns'] = dns
+                    self.timings['connect'] -= dns
+
+    async def async_trace(self, name: str, info: DictAny): self.trace(name, info)
+
+    def finish(self, resp: httpx.Response = None, error: BaseException = None):
+        self.timings['total'] = time.perf_counter() - self.started
+        self.error = error
+        if resp is None: return
+        self.status = resp.status_code
+        self.bytes_in = resp.num_bytes_downloaded
+        self.bytes_out = int(resp.request.headers.get('content-length') or 0)
+
+    @property
+    def elapsed(self) -> float: return self.timings.get('total', time.perf_counter() - self.started)
+
+    def __repr__(self):
+        return f'RequestRecord(method={self.method!r}, host={self.host!r}, route={self.route!r}, status={self.status!r}, error={self.error!r}, timings={self.timings!r})'
+
+
+class Metrics:
+    """
+    Low overhead request instrumentation for ApiClient.
+    Every request attempt (sync and async) records its status, errors, bytes in / out and latency histograms
+    (total and per phase, from the httpcore trace events), labelled by host and route template.
+    Retries and cache hits are counted per route. `render()` exports it all in the Prometheus text format
+    and `hooks` are called with each finished RequestRecord.
+
+    Route templates come from `routes` (e.g. '/users/{id}/repos') or else by replacing id-like path segments
+    with '{id}'. Past `max_routes` templates new routes are labelled 'other', bounding the number of series.
+    """
+    def __init__(self, prefix: str = None, buckets: List[float] = None, routes: List[str] = None, phases: bool = None, max_routes: int = None, hooks: List[Callable[[RequestRecord], Any]] = None):
+        self.prefix = prefix or MetricsCfg.prefix
+        self.buckets = sorted(buckets or MetricsCfg.buckets)
+        self.phases = phases if phases is not None else MetricsCfg.phases
+        self.max_routes = max_routes or MetricsCfg.max_routes
+        self.routes = [(re.compile('^' + TemplateSegment.sub('[^/]+', re.escape(route).replace(r'\{', '{').replace(r'\}', '}')) + '/?$'), route) for route in routes or []]
+        self.hooks = list(hooks or [])
+        self._histograms: Dict[Tuple, Histogram] = {}
+        self._counters: Dict[Tuple, float] = {}
+        self._paths: Dict[str, str] = {}
+        self._templates: Set[str] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def definitions(self) -> Dict[str, Tuple[str, str]]:
+        p = self.prefix
+        return {
+            f'{p}_requests_total': ('counter', 'Request attempts by status'),
+            f'{p}_request_errors_total': ('counter', 'Request attempts that raised, by error'),
+            f'{p}_request_duration_seconds': ('histogram', 'Total request attempt latency'),
+            f'{p}_request_phase_seconds': ('histogram', 'Request attempt latency by phase (wait, dns, connect, tls, ttfb)'),
+            f'{p}_request_bytes_total': ('counter', 'Request body bytes sent'),
+            f'{p}_response_bytes_total': ('counter', 'Response body bytes received'),
+            f'{p}_retries_total': ('counter', 'Request attempts after the first'),
+            f'{p}_cache_hits_total': ('counter', 'Requests served from a cache'),
+        }
+
+    def get_route(self, path: str) -> str:
+        route = self._paths.get(path)
+        if route is not None: return route
+        route = next((template for pattern, template in self.routes if pattern.match(path)), None)
+        if route is None: route = '/'.join('{id}' if IdSegment.match(segment) else segment for segment in path.split('/')) or '/'
+        with self._lock:
+            if route not in self._templates:
+                if len(self._templates) >= self.max_routes: route = 'other'
+                else: self._templates.add(route)
+            if len(self._paths) >= self.max_routes * 4: self._paths.clear()
+            self._paths[path] = route
+        return route
+
+    def get_labels(self, url: str) -> Tuple[str, str]:
+        url = httpx.URL(url)
+        host = f'{url.host}:{url.port}' if url.port else url.host
+        return host, self.get_route(url.path)
+
+    def inc(self, name: str, labels: Tuple, value: float = 1):
+        key = (name, labels)
+        with self._lock: self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, labels: Tuple, value: float):
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock: histogram = self._histograms.setdefault(key, Histogram(self.buckets))
+        histogram.observe(value)
+
+    def start(self, method: str, url: str, kwargs: DictAny, is_async: bool = False) -> RequestRecord:
+        record = RequestRecord(method, url, *self.get_labels(url))
+        extensions = kwargs.get('extensions') or {}
+        if self.phases and 'trace' not in extensions: kwargs['extensions'] = {**extensions, 'trace': record.async_trace if is_async else record.trace}
+        return record
+
+    def finish(self, record: RequestRecord, resp: httpx.Response = None, error: BaseException = None):
+        record.finish(resp = resp, error = error)
+        p, labels = self.prefix, (('host', record.host), ('route', record.route))
+        status = str(record.status) if record.status is not None else 'error'
+        self.inc(f'{p}_requests_total', labels + (('method', record.method), ('status', status)))
+        if error is not None: self.inc(f'{p}_request_errors_total', labels + (('method', record.method), ('error', type(error).__name__)))
+        self.observe(f'{p}_request_duration_seconds', labels + (('method', record.method),), record.timings['total'])
+        for phase, secs in record.timings.items():
+            if phase != 'total': self.observe(f'{p}_request_phase_seconds', labels + (('phase', phase),), secs)
+        if record.bytes_out: self.inc(f'{p}_request_bytes_total', labels, record.bytes_out)
+        if record.bytes_in: self.inc(f'{p}_response_bytes_total', labels, record.bytes_in)
+        for hook in self.hooks:
+            try: hook(record)
+            except Exception as e: logger.debug(f'Metrics hook {hook} failed: {e}')
+
+    def call(self, full_url: str, fn: Callable[..., httpx.Response], method: str, **kwargs) -> httpx.Response:
+        """ Sends the request attempt to full_url with fn, recording it """
+        record = self.start(method, full_url, kwargs)
+        try: resp = fn(method = method, **kwargs)
+        except Exception as e:
+            self.finish(record, error = e)
+            raise
+        self.finish(record, resp = resp)
+        return resp
+
+    async def async_call(self, full_url: str, fn: Callable[..., Awaitable], method: str, **kwargs) -> httpx.Response:
+        """ Async version of call, tracing through the async httpcore hooks """
+        record = self.start(method, full_url, kwargs, is_async = True)
+        try: resp = await fn(method = method, **kwargs)
+        except Exception as e:
+            self.finish(record, error = e)
+            raise
+        self.finish(record, resp = resp)
+        return resp
+
+    def count_retries(self, url: str, fn: Callable) -> Callable:
+        """ Wraps the send function of a retried request, counting every call after the first """
+        labels, calls = self.get_labels(url), [0]
+        def send(*args, **kwargs):
+            calls[0] += 1
+            if calls[0] > 1: self.inc(f'{self.prefix}_retries_total', (('host', labels[0]), ('route', labels[1])))
+            return fn(*args, **kwargs)
+        return send
+
+    def cache_hit(self, url: str, cache: str):
+        host, route = self.get_labels(url)
+        self.inc(f'{self.prefix}_cache_hits_total', (('host', host), ('route', route), ('cache', cache)))
+
+    def add_hook(self, hook: Callable[[RequestRecord], Any]): self.hooks.append(hook)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    @staticmethod
+    def format_labels(labels: Tuple) -> str:
+        return '{' + ','.join(f'{k}="{escape_label(v)}"' for k, v in labels) + '}' if labels else ''
+
+    def render(self) -> str:
+        """ All the metrics in the Prometheus text exposition format """
+        counters, histograms = sorted(list(self._counters.items())), sorted(list(self._histograms.items()), key = lambda i: i[0])
+        lines = []
+        for name, (kind, desc) in self.definitions.items():
+            lines += [f'# HELP {name} {desc}', f'# TYPE {name} {kind}']
+            if kind == 'counter':
+                lines += [f'{name}{self.format_labels(labels)} {value}' for (n, labels), value in counters if n == name]
+                continue
+            for (n, labels), histogram in histograms:
+                if n != name: continue
+                counts = histogram.cumulative()
+                les = [f'{b:g}' for b in self.buckets] + ['+Inf']
+                lines += [f'{name}_bucket{self.format_labels(labels + (("le", le),))} {c}' for le, c in zip(les, counts)]
+                lines += [f'{name}_sum{self.format_labels(labels)} {histogram.sum}', f'{name}_count{self.format_labels(labels)} {histogram.count}']
+        return '\n'.join(lines) + '\n'
+
+    @property
+    def stats(self) -> Dict[str, DictAny]:
+        """ Requests, errors and latency quantiles by method, host and route """
+        stats = {}
+        for (name, labels), value in list(self._counters.items()):
+            if name != f'{self.prefix}_requests_total': continue
+            labels = dict(labels)
+            item = stats.setdefault(f"{labels['method']} {labels['host']}{labels['route']}", {'requests': 0, 'errors': 0})
+            item['requests'] += value
+            if labels['status'] == 'error' or labels['status'].startswith('5'): item['errors'] += value
+        for (name, labels), histogram in list(self._histograms.items()):
+            if name != f'{self.prefix}_request_duration_seconds': continue
+            labels = dict(labels)
+            item = stats.setdefault(f"{labels['method']} {labels['host']}{labels['route']}", {'requests': 0, 'errors': 0})
+            item.update({'p50': histogram.quantile(0.5), 'p95': histogram.quantile(0.95), 'p99': histogram.quantile(0.99)})
+        return stats
+
+
+def escape_label(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics_registry = Metrics()
+
+
+def get_metrics(metrics: Union[bool, DictAny, Metrics] = None) -> Optional[Metrics]:
+    """
+    Returns the Metrics an ApiClient records to.
+    True returns the process-wide `metrics_registry` and a dict is passed as kwargs to a new Metrics.
+    """
+    if not metrics: return None
+    if metrics is True: return metrics_registry
+    if isinstance(metrics, dict): return Metrics(**metrics)
+    return metrics
+
+
+__all__ = [
+    'Histogram',
+    'RequestRecord',
+    'Metrics',
+    'metrics_registry',
+    'get_metrics',
+]
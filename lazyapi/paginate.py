@@ -0,0 +1,114 @@
+from httpx import Response
+from lazycls.types import *
+from .classes import ResponseMixin
+from .jsonz import decode_response, resolve_pointer, to_pointer
+
+
+def get_page_data(resp: Union[Response, ResponseMixin]) -> Any:
+    """ Returns the decoded page, reusing the decoded data of a wrapped response """
+    if isinstance(resp, ResponseMixin): return resp.data
+    return decode_response(resp)
+
+
+class Paginator:
+    """
+    Base pagination strategy.
+    `items_key` is the key / key path / JSON pointer of the items in each page, None for the whole page.
+    `next_request` returns the (path, kwargs) of the next page, or None when there are no more pages.
+    """
+    def __init__(self, items_key: Union[str, List[Union[str, int]]] = 'items'):
+        self.items_key = '' if items_key is None else to_pointer(items_key)
+
+    def get_items(self, resp: Union[Response, ResponseMixin]) -> List[Any]:
+        return resolve_pointer(get_page_data(resp), self.items_key) or []
+
+    def first_request(self, kwargs: DictAny) -> DictAny:
+        return kwargs
+
+    def next_request(self, resp: Union[Response, ResponseMixin], path: str, kwargs: DictAny) -> Optional[Tuple[str, DictAny]]:
+        raise NotImplementedError
+
+    @staticmethod
+    def with_params(kwargs: DictAny, **params) -> DictAny:
+        return {**kwargs, 'params': {**dict(kwargs.get('params') or {}), **params}}
+
+
+class CursorPaginator(Paginator):
+    """
+    Follows a cursor / continue token in the response body, sent back as the `param` query param.
+    Defaults to Kubernetes list semantics: `/metadata/continue` -> `?continue=`.
+    """
+    def __init__(self, items_key: Union[str, List[Union[str, int]]] = 'items', cursor_key: Union[str, List[Union[str, int]]] = '/metadata/continue', param: str = 'continue', limit: int = None, limit_param: str = 'limit'):
+        super().__init__(items_key)
+        self.cursor_key = to_pointer(cursor_key)
+        self.param = param
+        self.limit = limit
+        self.limit_param = limit_param
+
+    def first_request(self, kwargs: DictAny) -> DictAny:
+        if not self.limit: return kwargs
+        return self.with_params(kwargs, **{self.limit_param: self.limit})
+
+    def next_request(self, resp: Union[Response, ResponseMixin], path: str, kwargs: DictAny) -> Optional[Tuple[str, DictAny]]:
+        cursor = resolve_pointer(get_page_data(resp), self.cursor_key)
+        if not cursor: return None
+        return path, self.with_params(kwargs, **{self.param: cursor})
+
+
+class OffsetPaginator(Paginator):
+    """
+    Requests pages with `offset_param` / `limit_param` query params.
+    Stops when a page returns fewer than `limit` items.
+    """
+    def __init__(self, items_key: Union[str, List[Union[str, int]]] = 'items', limit: int = 100, offset_param: str = 'offset', limit_param: str = 'limit', start: int = 0):
+        super().__init__(items_key)
+        self.limit = limit
+        self.offset_param = offset_param
+        self.limit_param = limit_param
+        self.start = start
+
+    def first_request(self, kwargs: DictAny) -> DictAny:
+        return self.with_params(kwargs, **{self.offset_param: self.start, self.limit_param: self.limit})
+
+    def next_request(self, resp: Union[Response, ResponseMixin], path: str, kwargs: DictAny) -> Optional[Tuple[str, DictAny]]:
+        if len(self.get_items(resp)) < self.limit: return None
+        offset = int(kwargs['params'][self.offset_param]) + self.limit
+        return path, self.with_params(kwargs, **{self.offset_param: offset})
+
+
+class LinkPaginator(Paginator):
+    """
+    Follows the `Link: <url>; rel="next"` response header.
+    The next url already carries the query params, so the params of the first request are dropped.
+    `items_key` of None means each page is a JSON array of items.
+    """
+    def __init__(self, items_key: Union[str, List[Union[str, int]]] = None, rel: str = 'next'):
+        super().__init__(items_key)
+        self.rel = rel
+
+    def next_request(self, resp: Union[Response, ResponseMixin], path: str, kwargs: DictAny) -> Optional[Tuple[str, DictAny]]:
+        url = getattr(resp, 'resp', resp).links.get(self.rel, {}).get('url')
+        if not url: return None
+        return url, {k: v for k, v in kwargs.items() if k != 'params'}
+
+
+Paginators = {
+    'cursor': CursorPaginator,
+    'offset': OffsetPaginator,
+    'link': LinkPaginator,
+}
+
+def get_paginator(paginator: Union[str, Paginator] = None) -> Paginator:
+    """ Returns the Paginator, creating it from a name (cursor | offset | link) with the default args """
+    if paginator is None: return CursorPaginator()
+    if isinstance(paginator, str): return Paginators[paginator]()
+    return paginator
+
+
+__all__ = [
+    'Paginator',
+    'CursorPaginator',
+    'OffsetPaginator',
+    'LinkPaginator',
+    'get_paginator',
+]
@@ -0,0 +1,271 @@
+import time
+import httpx
+import asyncio
+import threading
+import contextlib
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from httpx import BaseTransport, AsyncBaseTransport
+from lazycls.types import *
+from .config import DNSCfg, WarmupCfg, logger
+from .loops import LoopLocal
+from .cache import build_url
+from .dns import DNSCache, CachingBackend, AsyncCachingBackend, get_dns_cache
+
+try: import h2
+except ImportError: h2 = None
+
+# client kwargs that configure the connection pool itself
+TransportKwargs = {'verify', 'cert', 'http1', 'http2', 'trust_env', 'uds', 'local_address', 'retries'}
+# client kwargs that need their own transports
+UnsharedKwargs = {'transport', 'app', 'proxies', 'mounts'}
+
+
+def get_origin(url: str) -> str:
+    url = httpx.URL(url or '')
+    if not url.host: return ''
+    return f'{url.scheme}://{url.host}:{url.port}' if url.port else f'{url.scheme}://{url.host}'
+
+
+def has_env_proxies() -> bool:
+    """ Whether HTTP(S)_PROXY / ALL_PROXY are set, which httpx only applies to clients without a custom transport """
+    proxies = urllib.request.getproxies()
+    return any(proxies.get(scheme) for scheme in ('http', 'https', 'all'))
+
+
+def get_http2(http2: bool) -> bool:
+    if http2 and h2 is None:
+        logger.warning('HTTP/2 requires the h2 package (pip install httpx[http2]). Falling back to HTTP/1.1')
+        return False
+    return bool(http2)
+
+
+def get_pool_stats(pool: Any) -> DictAny:
+    """ Occupancy of an httpcore connection pool """
+    connections = list(getattr(pool, 'connections', []))
+    requests = list(getattr(pool, '_requests', []))
+    return {
+        'connections': len(connections),
+        'idle': sum(1 for c in connections if c.is_idle()),
+        'active': sum(1 for c in connections if not c.is_idle() and not c.is_closed()),
+        'http2': sum(1 for c in connections if 'HTTP/2' in c.info()),
+        'requests': len(requests),
+        'waiting': sum(1 for r in requests if r.connection is None),
+        'max_connections': getattr(pool, '_max_connections', None),
+    }
+
+
+class SharedTransport(BaseTransport):
+    """ Transport handed to each client over a registry pool. Closing the client leaves the shared pool open. """
+    def __init__(self, transport: httpx.HTTPTransport):
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response: return self.transport.handle_request(request)
+
+    def close(self): pass
+
+
+class AsyncSharedTransport(AsyncBaseTransport):
+    """ Async transport handed to each client over a registry pool. Closing the client leaves the shared pool open. """
+    def __init__(self, transport: httpx.AsyncHTTPTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response: return await self.transport.handle_async_request(request)
+
+    async def aclose(self): pass
+
+
+class PoolRegistry:
+    """
+    Process-wide registry of connection pools (httpx transports) keyed by the origin and the pool config,
+    so every client of the same upstream shares one pool and its keep-alive / TLS connections.
+    With `http2` many concurrent requests multiplex over a few connections.
+    Async pools are kept per event loop and closed when the loop shuts down.
+    New connections resolve their host through the `dns_cache`.
+    """
+    def __init__(self, dns_cache: Union[bool, float, DictAny, DNSCache] = None):
+        self.dns_cache = get_dns_cache(DNSCfg.enabled if dns_cache is None else dns_cache)
+        self._pools: Dict[Tuple, httpx.HTTPTransport] = {}
+        self._async_pools: Dict[Tuple, LoopLocal] = {}
+        self._lock = threading.Lock()
+
+    def set_dns_cache(self, dns_cache: Union[bool, float, DictAny, DNSCache] = True):
+        """ Resolves the hosts of pools created from now on through the DNSCache (None / False turns it off) """
+        self.dns_cache = get_dns_cache(dns_cache)
+
+    @staticmethod
+    def get_key(origin: str, limits: httpx.Limits, **kwargs) -> Tuple:
+        return (origin, limits.max_connections, limits.max_keepalive_connections, limits.keepalive_expiry, *sorted((k, repr(v)) for k, v in kwargs.items()))
+
+    def get_transport(self, origin: str, limits: httpx.Limits, **kwargs) -> SharedTransport:
+        kwargs['http2'] = get_http2(kwargs.get('http2'))
+        key = self.get_key(origin, limits, **kwargs)
+        with self._lock:
+            if key not in self._pools: self._pools[key] = self._create_transport(limits, **kwargs)
+            return SharedTransport(self._pools[key])
+
+    @staticmethod
+    def set_network_backend(transport: Union[httpx.HTTPTransport, httpx.AsyncHTTPTransport], backend: Any) -> bool:
+        """ Swaps the httpcore pool's network backend, which httpx does not expose, if this httpcore version has one """
+        pool = getattr(transport, '_pool', None)
+        if not hasattr(pool, '_network_backend'):
+            logger.warning('Unable to set the DNS cache on the connection pool of this httpx / httpcore version')
+            return False
+        pool._network_backend = backend
+        return True
+
+    def _create_transport(self, limits: httpx.Limits, **kwargs) -> httpx.HTTPTransport:
+        transport = httpx.HTTPTransport(limits = limits, **kwargs)
+        if self.dns_cache and not kwargs.get('uds'): self.set_network_backend(transport, CachingBackend(self.dns_cache))
+        return transport
+
+    def _create_async_transport(self, limits: httpx.Limits, **kwargs) -> httpx.AsyncHTTPTransport:
+        transport = httpx.AsyncHTTPTransport(limits = limits, **kwargs)
+        if self.dns_cache and not kwargs.get('uds'): self.set_network_backend(transport, AsyncCachingBackend(self.dns_cache))
+        return transport
+
+    def get_async_transport(self, origin: str, limits: httpx.Limits, **kwargs) -> AsyncSharedTransport:
+        kwargs['http2'] = get_http2(kwargs.get('http2'))
+        key = self.get_key(origin, limits, **kwargs)
+        with self._lock:
+            if key not in self._async_pools: self._async_pools[key] = LoopLocal(lambda: self._create_async_transport(limits, **kwargs), lambda t: t.aclose())
+            pools = self._async_pools[key]
+        return AsyncSharedTransport(pools.get())
+
+    @property
+    def stats(self) -> DictAny:
+        return {
+            'sync': [{'origin': key[0], **get_pool_stats(t._pool)} for key, t in list(self._pools.items())],
+            'async': [{'origin': key[0], **get_pool_stats(t._pool)} for key, pools in list(self._async_pools.items()) for t in pools.values()],
+            'dns': self.dns_cache.stats if self.dns_cache else None,
+        }
+
+    def close(self):
+        with self._lock: pools, self._pools = list(self._pools.values()), {}
+        for transport in pools: transport.close()
+
+    async def aclose(self):
+        """ Closes the async pools of the running loop """
+        for pools in list(self._async_pools.values()):
+            if len(pools): await pools.get().aclose()
+
+
+pool_registry = PoolRegistry()
+
+
+def get_warmup_targets(urls: List[str], connections: int = None, path: str = None) -> List[str]:
+    connections = WarmupCfg.connections if connections is None else connections
+    path = WarmupCfg.path if path is None else path
+    return [build_url(url, path) for url in urls if url for _ in range(connections)]
+
+
+def resolve_hosts(urls: List[str]) -> List[Exception]:
+    """ Pre-resolves the hosts of the urls into the registry DNS cache """
+    errors = []
+    if not pool_registry.dns_cache: return errors
+    for url in {httpx.URL(url) for url in urls if url}:
+        if not url.host: continue
+        try: pool_registry.dns_cache.resolve(url.host, url.port or (443 if url.scheme == 'https' else 80))
+        except Exception as e: errors.append(e)
+    return errors
+
+
+async def async_resolve_hosts(urls: List[str]) -> List[Exception]:
+    """ Pre-resolves the hosts of the urls into the registry DNS cache """
+    errors = []
+    if not pool_registry.dns_cache: return errors
+    for url in {httpx.URL(url) for url in urls if url}:
+        if not url.host: continue
+        try: await pool_registry.dns_cache.async_resolve(url.host, url.port or (443 if url.scheme == 'https' else 80))
+        except Exception as e: errors.append(e)
+    return errors
+
+
+def get_connection_key(url: str, resp: httpx.Response) -> Tuple:
+    """ Identifies the connection a response came over. HTTP/2 and custom transports do not expose it, so one per origin is assumed. """
+    stream = resp.extensions.get('network_stream')
+    if stream is not None: return (id(stream),)
+    return (get_origin(url), resp.extensions.get('http_version'))
+
+
+def get_warmup_result(targets: List[str], results: List[Union[Tuple, Exception]], errors: List[Exception], started: float) -> DictAny:
+    """ `connected` counts the distinct connections the warm-up requests were held open on """
+    errors = errors + [r for r in results if isinstance(r, Exception)]
+    for e in errors: logger.debug(f'Warmup error: {e}')
+    return {'requests': len(targets), 'connected': len({r for r in results if isinstance(r, tuple)}), 'errors': errors, 'elapsed': time.perf_counter() - started}
+
+
+def warmup_client(client: httpx.Client, urls: List[str], connections: int = None, method: str = None, path: str = None) -> DictAny:
+    """
+    Resolves the hosts of the urls and opens `connections` keep-alive connections to each, by holding that many
+    concurrent `method` requests to `path` open until all of them are connected. The connections stay idle in the
+    pool (up to its keep-alive limit) for the requests that follow.
+    """
+    started = time.perf_counter()
+    targets = get_warmup_targets(urls, connections, path)
+    errors = resolve_hosts(urls)
+    if not targets: return get_warmup_result(targets, [], errors, started)
+    lock, ready, arrived = threading.Lock(), threading.Event(), [0]
+    def arrive():
+        with lock:
+            arrived[0] += 1
+            if arrived[0] == len(targets): ready.set()
+    def connect(url: str) -> Union[Tuple, Exception]:
+        done = False
+        try:
+            with client.stream(method or WarmupCfg.method, url) as resp:
+                key = get_connection_key(url, resp)
+                arrive()
+                done = True
+                # reading the body to the end hands the connection back to the pool, so only read once all are open
+                ready.wait(client.timeout.connect)
+                resp.read()
+            return key
+        except Exception as e:
+            if not done: arrive()
+            return e
+    with ThreadPoolExecutor(max_workers = len(targets)) as pool: results = list(pool.map(connect, targets))
+    return get_warmup_result(targets, results, errors, started)
+
+
+async def async_warmup_client(client: httpx.AsyncClient, urls: List[str], connections: int = None, method: str = None, path: str = None) -> DictAny:
+    """ Async version of warmup_client, warming the pool of the running event loop """
+    started = time.perf_counter()
+    targets = get_warmup_targets(urls, connections, path)
+    errors = await async_resolve_hosts(urls)
+    if not targets: return get_warmup_result(targets, [], errors, started)
+    ready, arrived = asyncio.Event(), [0]
+    def arrive():
+        arrived[0] += 1
+        if arrived[0] == len(targets): ready.set()
+    async def connect(url: str) -> Union[Tuple, Exception]:
+        done = False
+        try:
+            async with client.stream(method or WarmupCfg.method, url) as resp:
+                key = get_connection_key(url, resp)
+                arrive()
+                done = True
+                # reading the body to the end hands the connection back to the pool, so only read once all are open
+                with contextlib.suppress(asyncio.TimeoutError): await asyncio.wait_for(ready.wait(), client.timeout.connect)
+                await resp.aread()
+            return key
+        except Exception as e:
+            if not done: arrive()
+            return e
+    results = await asyncio.gather(*[connect(url) for url in targets])
+    return get_warmup_result(targets, results, errors, started)
+
+
+__all__ = [
+    'get_origin',
+    'has_env_proxies',
+    'get_pool_stats',
+    'SharedTransport',
+    'AsyncSharedTransport',
+    'PoolRegistry',
+    'pool_registry',
+    'warmup_client',
+    'async_warmup_client',
+    'TransportKwargs',
+    'UnsharedKwargs',
+]
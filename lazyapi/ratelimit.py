@@ -0,0 +1,154 @@
+import time
+import httpx
+import asyncio
+import fnmatch
+import threading
+from lazycls.types import *
+from .config import RateLimitCfg
+from .shared import SharedBackend
+
+RateLimit = Union[float, Tuple[float, int]]
+
+
+class TokenBucket:
+    """
+    Token bucket of `rate` tokens/sec holding up to `burst` tokens.
+    A request reserves a token up front and gets back how long to wait for it, so waiters
+    are served in order without polling and the sync and async paths share the same bucket.
+    """
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = float(rate)
+        self.burst = burst or max(1, int(rate))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """ Takes a token and returns the secs to wait before using it """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    @property
+    def wait_time(self) -> float:
+        """ Secs the next request would currently wait """
+        with self._lock:
+            self._refill(time.monotonic())
+            return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+class SharedTokenBucket:
+    """ TokenBucket kept in a SharedBackend so the limit holds across every process using the backend """
+    def __init__(self, backend: SharedBackend, key: str, rate: float, burst: int = None):
+        self.backend = backend
+        self.key = f'ratelimit:{key}'
+        self.rate = float(rate)
+        self.burst = burst or max(1, int(rate))
+
+    def reserve(self) -> float: return self.backend.take_token(self.key, self.rate, self.burst)
+
+    @property
+    def wait_time(self) -> float: return self.backend.take_token(self.key, self.rate, self.burst, take=False)
+
+
+class RateLimiter:
+    """
+    Client side rate limiter applied before a request acquires a connection.
+    `rate` (requests/sec) and `burst` are the default limit, applied per host or for the whole client (`per` = host | client).
+    `hosts` / `routes` map patterns (fnmatch, matched against the host / url path) to a rate or (rate, burst),
+    each pattern sharing one bucket. A rate of 0 disables limiting for the match.
+    With a SharedBackend the buckets are shared by every process using it.
+    """
+    def __init__(self, rate: float = None, burst: int = None, per: str = None, hosts: Dict[str, RateLimit] = None, routes: Dict[str, RateLimit] = None, backend: SharedBackend = None):
+        self.rate = RateLimitCfg.rate if rate is None else rate
+        self.burst = burst or RateLimitCfg.burst or None
+        self.per = (per or RateLimitCfg.per).lower()
+        self.hosts = hosts or {}
+        self.routes = routes or {}
+        self.backend = backend
+        self._buckets: Dict[str, Union[TokenBucket, SharedTokenBucket]] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.wait_time = 0.0
+
+    @staticmethod
+    def get_limit(limit: RateLimit) -> Tuple[float, Optional[int]]:
+        if isinstance(limit, (tuple, list)): return float(limit[0]), limit[1]
+        return float(limit), None
+
+    def create_bucket(self, key: str, rate: float, burst: Optional[int]) -> Union[TokenBucket, SharedTokenBucket]:
+        if self.backend: return SharedTokenBucket(self.backend, key, rate, burst)
+        return TokenBucket(rate, burst)
+
+    def get_bucket(self, url: str) -> Optional[Union[TokenBucket, SharedTokenBucket]]:
+        url = httpx.URL(url)
+        key, (rate, burst) = None, (self.rate, self.burst)
+        for pattern, limit in self.routes.items():
+            if fnmatch.fnmatchcase(url.path, pattern):
+                key, (rate, burst) = f'route:{pattern}', self.get_limit(limit)
+                break
+        if key is None:
+            for pattern, limit in self.hosts.items():
+                if fnmatch.fnmatchcase(url.host, pattern):
+                    key, (rate, burst) = f'host:{pattern}', self.get_limit(limit)
+                    break
+        if not rate: return None
+        if key is None: key = 'client' if self.per == 'client' else f'host:{url.host}'
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock: bucket = self._buckets.setdefault(key, self.create_bucket(key, rate, burst))
+        return bucket
+
+    def reserve(self, url: str) -> float:
+        bucket = self.get_bucket(url)
+        delay = bucket.reserve() if bucket else 0.0
+        with self._lock:
+            self.requests += 1
+            if delay > 0:
+                self.throttled += 1
+                self.wait_time += delay
+        return delay
+
+    def acquire(self, url: str) -> float:
+        """ Blocks until the request to url may be sent. Returns the secs waited. """
+        delay = self.reserve(url)
+        if delay > 0: time.sleep(delay)
+        return delay
+
+    async def async_acquire(self, url: str) -> float:
+        """ Waits without blocking the event loop until the request to url may be sent. Returns the secs waited. """
+        delay = await self.backend.run(self.reserve, url) if self.backend else self.reserve(url)
+        if delay > 0: await asyncio.sleep(delay)
+        return delay
+
+    def __bool__(self): return True
+
+    @property
+    def stats(self) -> DictAny:
+        return {'requests': self.requests, 'throttled': self.throttled, 'wait_time': self.wait_time, 'waits': {key: bucket.wait_time for key, bucket in list(self._buckets.items())}}
+
+
+def get_rate_limiter(rate_limit: Union[bool, float, DictAny, RateLimiter] = None, backend: SharedBackend = None) -> Optional[RateLimiter]:
+    """
+    Returns a RateLimiter for the ApiClient.
+    True uses the RateLimitCfg defaults, a number is the requests/sec rate and a dict is passed as kwargs to RateLimiter.
+    """
+    if not rate_limit: return None
+    if rate_limit is True: return RateLimiter(backend = backend)
+    if isinstance(rate_limit, (int, float)): return RateLimiter(rate = rate_limit, backend = backend)
+    if isinstance(rate_limit, dict): return RateLimiter(**{'backend': backend, **rate_limit})
+    return rate_limit
+
+
+__all__ = [
+    'TokenBucket',
+    'SharedTokenBucket',
+    'RateLimiter',
+    'get_rate_limiter',
+]
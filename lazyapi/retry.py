@@ -5,6 +5,12 @@ import traceback
 import random
 import asyncio
 import functools
+import threading
+import httpx
+from email.utils import parsedate_to_datetime
+from lazycls.types import *
+from .config import RetryCfg
+from .breaker import CircuitOpenError
 
 
 # Borrowed from https://github.com/rholder/retrying
@@ -41,27 +47,32 @@ def retryable(*dargs, **dkw):
 
 
 def async_retryable(*dargs, **dkw):
-    if len(dargs) == 1 and callable(dargs[0]):
-        def wrap_simple(f):
+    """
+    Decorator function that instantiates the AsyncRetrying object
+    Coroutine functions are awaited directly and back off with asyncio.sleep.
+    Sync functions are run with Retrying in an executor.
+    @param *dargs: positional arguments passed to AsyncRetrying object
+    @param **dkw: keyword arguments passed to the AsyncRetrying object
+    """
+    def wrap_with(f, *rargs, **rkw):
+        if asyncio.iscoroutinefunction(f):
             @six.wraps(f)
-            async def aio_wrapped_f(*args, loop=None, executor=None, **kw):
-                if loop is None:
-                    loop = asyncio.get_event_loop()
-                pfunc = functools.partial(Retrying().call, *args, **kw)
-                return await loop.run_in_executor(executor, pfunc)
+            async def aio_wrapped_f(*args, **kw):
+                return await AsyncRetrying(*rargs, **rkw).call(f, *args, **kw)
             return aio_wrapped_f
-        return wrap_simple(dargs[0])
 
-    else:
-        def wrap(f):
-            @six.wraps(f)
-            async def aio_wrapped_f(*args, loop=None, executor=None, **kw):
-                if loop is None:
-                    loop = asyncio.get_event_loop()
-                pfunc = functools.partial(Retrying(*dargs, **dkw).call, *args, **kw)
-                return await loop.run_in_executor(executor, pfunc)
-            return aio_wrapped_f
-        return wrap
+        @six.wraps(f)
+        async def aio_wrapped_f(*args, loop=None, executor=None, **kw):
+            if loop is None:
+                loop = asyncio.get_event_loop()
+            pfunc = functools.partial(Retrying(*rargs, **rkw).call, f, *args, **kw)
+            return await loop.run_in_executor(executor, pfunc)
+        return aio_wrapped_f
+
+    # support both @async_retryable and @async_retryable() as valid syntax
+    if len(dargs) == 1 and callable(dargs[0]): return wrap_with(dargs[0])
+    def wrap(f): return wrap_with(f, *dargs, **dkw)
+    return wrap
 
 
 class Retrying(object):
@@ -182,10 +193,26 @@ class Retrying(object):
 
     def should_reject(self, attempt):
         reject = False
+        # an open circuit fails fast, retrying would only wait for it to fail again
+        if attempt.has_exception and isinstance(attempt.value[1], CircuitOpenError): return False
         if attempt.has_exception: reject |= self._retry_on_exception(attempt.value[1])
         else: reject |= self._retry_on_result(attempt.value)
         return reject
 
+    def next_sleep(self, attempt, attempt_number, delay_since_first_attempt_ms):
+        """Returns the number of ms to sleep before the next attempt."""
+        sleep = self.wait(attempt_number, delay_since_first_attempt_ms)
+        if self._wait_jitter_max:
+            jitter = random.random() * self._wait_jitter_max
+            sleep = sleep + max(0, jitter)
+        return sleep
+
+    def give_up(self, attempt):
+        if not self._wrap_exception and attempt.has_exception:
+            # get() on an attempt with an exception should cause it to be raised, but raise just in case
+            raise attempt.get()
+        raise RetryError(attempt)
+
     def call(self, fn, *args, **kwargs):
         start_time = int(round(time.time() * 1000))
         attempt_number = 1
@@ -200,22 +227,37 @@ class Retrying(object):
             if self._after_attempts: self._after_attempts(attempt_number)
 
             delay_since_first_attempt_ms = int(round(time.time() * 1000)) - start_time
-            if self.stop(attempt_number, delay_since_first_attempt_ms):
-                if not self._wrap_exception and attempt.has_exception:
-                    # get() on an attempt with an exception should cause it to be raised, but raise just in case
-                    raise attempt.get()
-                else:
-                    raise RetryError(attempt)
-            else:
-                sleep = self.wait(attempt_number, delay_since_first_attempt_ms)
-                if self._wait_jitter_max:
-                    jitter = random.random() * self._wait_jitter_max
-                    sleep = sleep + max(0, jitter)
-                time.sleep(sleep / 1000.0)
+            if self.stop(attempt_number, delay_since_first_attempt_ms): return self.give_up(attempt)
+            time.sleep(self.next_sleep(attempt, attempt_number, delay_since_first_attempt_ms) / 1000.0)
+            attempt_number += 1
+
+    async def async_call(self, fn, *args, **kwargs):
+        """Same as call, but awaits the coroutine function and backs off with asyncio.sleep."""
+        start_time = int(round(time.time() * 1000))
+        attempt_number = 1
+        while True:
+            if self._before_attempts: self._before_attempts(attempt_number)
+            try: attempt = Attempt(await fn(*args, **kwargs), attempt_number, False)
+            except asyncio.CancelledError: raise
+            except:
+                tb = sys.exc_info()
+                attempt = Attempt(tb, attempt_number, True)
+
+            if not self.should_reject(attempt): return attempt.get(self._wrap_exception)
+            if self._after_attempts: self._after_attempts(attempt_number)
 
+            delay_since_first_attempt_ms = int(round(time.time() * 1000)) - start_time
+            if self.stop(attempt_number, delay_since_first_attempt_ms): return self.give_up(attempt)
+            await asyncio.sleep(self.next_sleep(attempt, attempt_number, delay_since_first_attempt_ms) / 1000.0)
             attempt_number += 1
 
 
+class AsyncRetrying(Retrying):
+    """Retrying whose call awaits a coroutine function and backs off with asyncio.sleep."""
+    async def call(self, fn, *args, **kwargs):
+        return await self.async_call(fn, *args, **kwargs)
+
+
 class Attempt(object):
     """
     An Attempt encapsulates a call to a target function that may end as a
@@ -250,4 +292,134 @@ class RetryError(Exception):
         self.last_attempt = last_attempt
 
     def __str__(self):
-        return "RetryError[{0}]".format(self.last_attempt)
\ No newline at end of file
+        return "RetryError[{0}]".format(self.last_attempt)
+
+
+IdempotentMethods = ['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'TRACE']
+
+
+def parse_retry_after(value: str) -> Optional[float]:
+    """Parses a Retry-After header (delay-seconds or HTTP-date) into secs."""
+    if not value: return None
+    try: return max(float(value), 0.0)
+    except ValueError: pass
+    try: return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except Exception: return None
+
+
+class RetryBudget(object):
+    """
+    Token bucket that bounds retries to a fraction of recent traffic.
+    Every request deposits `ratio` tokens, every retry withdraws one token,
+    and `min_per_sec` tokens are refilled per second so low traffic can still retry.
+    """
+    def __init__(self, ratio=None, min_per_sec=None, max_tokens=None):
+        self.ratio = RetryCfg.budget_ratio if ratio is None else ratio
+        self.min_per_sec = RetryCfg.budget_min_per_sec if min_per_sec is None else min_per_sec
+        self.max_tokens = max_tokens or max(self.min_per_sec * 10, 1.0)
+        self.tokens = self.max_tokens
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self._last) * self.min_per_sec)
+        self._last = now
+
+    def deposit(self):
+        with self._lock: self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            self._refill()
+            if self.tokens < 1: return False
+            self.tokens -= 1
+            return True
+
+
+class HttpRetrying(Retrying):
+    """
+    HTTP-aware Retrying used by ApiClient.
+    - retries transport errors and `retry_statuses` responses
+    - only retries idempotent `methods` unless told otherwise
+    - sleeps for the Retry-After header when it is longer than the backoff (capped at `max_retry_after` ms)
+    - every retry draws from a RetryBudget, when it is exhausted the last response / error is returned
+    - when retries stop on a response, the last response is returned instead of raising RetryError
+    """
+    def __init__(self, retry_statuses=None, methods=None, budget=None, respect_retry_after=True, max_retry_after=None, retry_on_exception=None, **kwargs):
+        defaults = RetryCfg.get_retry_kwargs()
+        default_exceptions = defaults.pop('retry_on_exception')
+        retry_on_exception = retry_on_exception or default_exceptions
+        for k, v in defaults.items(): kwargs.setdefault(k, v)
+        self.retry_statuses = set(retry_statuses or RetryCfg.retry_statuses)
+        self.methods = {m.upper() for m in (methods or IdempotentMethods)}
+        self.budget = RetryBudget() if budget is None else budget
+        self.respect_retry_after = respect_retry_after
+        self.max_retry_after = RetryCfg.max_retry_after if max_retry_after is None else max_retry_after
+        super(HttpRetrying, self).__init__(retry_on_exception = retry_on_exception, retry_on_result = self.is_retryable_response, **kwargs)
+        stop = self.stop
+        self.stop = lambda attempts, delay: stop(attempts, delay) or not self.withdraw()
+        self.attempts = 0
+        self.retries = 0
+        self.give_ups = 0
+        self.budget_exhausted = 0
+        self.sleep_time = 0.0
+
+    def is_retryable_response(self, resp):
+        return getattr(resp, 'status_code', None) in self.retry_statuses
+
+    def is_retryable_method(self, method):
+        return bool(method) and method.upper() in self.methods
+
+    def withdraw(self):
+        if self.budget and not self.budget.withdraw():
+            self.budget_exhausted += 1
+            return False
+        return True
+
+    def should_reject(self, attempt):
+        self.attempts += 1
+        return super(HttpRetrying, self).should_reject(attempt)
+
+    def next_sleep(self, attempt, attempt_number, delay_since_first_attempt_ms):
+        sleep = super(HttpRetrying, self).next_sleep(attempt, attempt_number, delay_since_first_attempt_ms)
+        if self.respect_retry_after and not attempt.has_exception:
+            retry_after = parse_retry_after(attempt.value.headers.get('retry-after'))
+            if retry_after is not None: sleep = max(sleep, min(retry_after * 1000.0, self.max_retry_after))
+        self.retries += 1
+        self.sleep_time += sleep / 1000.0
+        return sleep
+
+    def give_up(self, attempt):
+        self.give_ups += 1
+        if not attempt.has_exception: return attempt.value
+        return super(HttpRetrying, self).give_up(attempt)
+
+    def call(self, fn, *args, **kwargs):
+        if self.budget: self.budget.deposit()
+        if not self.is_retryable_method(kwargs.get('method')):
+            self.attempts += 1
+            return fn(*args, **kwargs)
+        return super(HttpRetrying, self).call(fn, *args, **kwargs)
+
+    async def async_call(self, fn, *args, **kwargs):
+        if self.budget: self.budget.deposit()
+        if not self.is_retryable_method(kwargs.get('method')):
+            self.attempts += 1
+            return await fn(*args, **kwargs)
+        return await super(HttpRetrying, self).async_call(fn, *args, **kwargs)
+
+    @property
+    def stats(self):
+        return {'attempts': self.attempts, 'retries': self.retries, 'give_ups': self.give_ups, 'budget_exhausted': self.budget_exhausted, 'sleep_time': self.sleep_time}
+
+
+def get_retrying(retry: Union[bool, Dict[str, Any], Retrying] = None) -> Optional[Retrying]:
+    """
+    Returns a Retrying object for the ApiClient.
+    True uses HttpRetrying with the RetryCfg defaults, a dict is passed as kwargs to HttpRetrying.
+    """
+    if not retry: return None
+    if retry is True: return HttpRetrying()
+    if isinstance(retry, dict): return HttpRetrying(**retry)
+    return retry
@@ -0,0 +1,281 @@
+import time
+import uuid
+import pickle
+import asyncio
+import functools
+import threading
+import diskcache
+from pathlib import Path
+from lazycls.types import *
+from .config import SharedCfg, logger
+from .services import RedisCfg, RedisClient
+
+
+class SharedBackend:
+    """
+    Key / value store shared by every process on the node, used for rate limit buckets,
+    response caches and single-flight locks. Values are any picklable object.
+    """
+    name = 'base'
+
+    def __init__(self, prefix: str = None):
+        self.prefix = prefix or SharedCfg.prefix
+
+    def get_key(self, key: str) -> str: return f'{self.prefix}:{key}'
+
+    def get(self, key: str, default: Any = None) -> Any: raise NotImplementedError
+
+    def set(self, key: str, value: Any, expire: float = None) -> bool: raise NotImplementedError
+
+    def delete(self, key: str) -> bool: raise NotImplementedError
+
+    def clear(self, prefix: str = '') -> int:
+        """ Deletes every key starting with prefix. Returns the number of keys deleted. """
+        raise NotImplementedError
+
+    def volume(self) -> int: raise NotImplementedError
+
+    def close(self): pass
+
+    def take_token(self, key: str, rate: float, burst: int, take: bool = True) -> float:
+        """
+        Atomically reserves a token from the bucket at key (`rate` tokens/sec, up to `burst` tokens).
+        Returns the secs to wait before using it. `take = False` only returns the current wait.
+        """
+        raise NotImplementedError
+
+    def acquire_lock(self, key: str, ttl: float) -> Optional[str]:
+        """ Takes the lock at key for up to ttl secs. Returns the lock token, or None if it is held. """
+        raise NotImplementedError
+
+    def release_lock(self, key: str, token: str) -> bool: raise NotImplementedError
+
+    def is_locked(self, key: str) -> bool: raise NotImplementedError
+
+    def namespace(self, name: str) -> 'SharedNamespace': return SharedNamespace(self, name)
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """ Runs a blocking backend call (redis round-trip, sqlite transaction) in the loop's executor """
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args, **kwargs))
+
+    @staticmethod
+    def get_bucket(state: Optional[Tuple[float, float]], rate: float, burst: int, now: float, take: bool) -> Tuple[Tuple[float, float], float]:
+        tokens, updated = state or (float(burst), now)
+        tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+        if not take: return (tokens, now), (0.0 if tokens >= 1 else (1 - tokens) / rate)
+        tokens -= 1
+        return (tokens, now), (0.0 if tokens >= 0 else -tokens / rate)
+
+    @staticmethod
+    def get_bucket_ttl(tokens: float, rate: float, burst: int) -> float:
+        """ Secs until the bucket refills to burst, including the token debt of pending reservations, plus a margin """
+        return (burst - tokens) / rate + 1.0
+
+    def __bool__(self): return True
+
+    def __repr__(self): return f'{self.__class__.__name__}(prefix={self.prefix!r})'
+
+
+class SharedNamespace:
+    """ Prefixed view over a SharedBackend with the subset of the diskcache.Cache API used by the caches """
+    def __init__(self, backend: SharedBackend, name: str):
+        self.backend = backend
+        self.name = name
+
+    def get(self, key: str, default: Any = None) -> Any: return self.backend.get(f'{self.name}:{key}', default)
+
+    def set(self, key: str, value: Any, expire: float = None) -> bool: return self.backend.set(f'{self.name}:{key}', value, expire)
+
+    def delete(self, key: str) -> bool: return self.backend.delete(f'{self.name}:{key}')
+
+    def clear(self) -> int: return self.backend.clear(f'{self.name}:')
+
+    def volume(self) -> int: return self.backend.volume()
+
+    def close(self): pass
+
+
+class DiskBackend(SharedBackend):
+    """
+    SharedBackend on a local diskcache directory. SQLite transactions make the
+    token buckets and locks atomic across processes.
+    """
+    name = 'disk'
+
+    def __init__(self, directory: str = None, prefix: str = None, **kwargs):
+        super().__init__(prefix)
+        self.directory = directory or SharedCfg.directory or Path.home().joinpath('.cache', 'lazyapi', 'shared').as_posix()
+        self._kwargs = kwargs
+        self._cache = None
+
+    @property
+    def cache(self) -> diskcache.Cache:
+        if self._cache is None: self._cache = diskcache.Cache(self.directory, **self._kwargs)
+        return self._cache
+
+    def get(self, key: str, default: Any = None) -> Any: return self.cache.get(self.get_key(key), default)
+
+    def set(self, key: str, value: Any, expire: float = None) -> bool: return self.cache.set(self.get_key(key), value, expire=expire)
+
+    def delete(self, key: str) -> bool: return self.cache.delete(self.get_key(key))
+
+    def clear(self, prefix: str = '') -> int:
+        prefix, count = self.get_key(prefix), 0
+        for key in list(self.cache.iterkeys()):
+            if isinstance(key, str) and key.startswith(prefix): count += int(self.cache.delete(key))
+        return count
+
+    def volume(self) -> int: return self.cache.volume()
+
+    def close(self):
+        if self._cache is not None: self._cache.close()
+
+    def take_token(self, key: str, rate: float, burst: int, take: bool = True) -> float:
+        key = self.get_key(key)
+        with self.cache.transact():
+            state, wait = self.get_bucket(self.cache.get(key), rate, burst, time.time(), take)
+            if take: self.cache.set(key, state, expire=self.get_bucket_ttl(state[0], rate, burst))
+        return wait
+
+    def acquire_lock(self, key: str, ttl: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        return token if self.cache.add(self.get_key(key), token, expire=ttl) else None
+
+    def release_lock(self, key: str, token: str) -> bool:
+        key = self.get_key(key)
+        with self.cache.transact():
+            if self.cache.get(key) != token: return False
+            return self.cache.delete(key)
+
+    def is_locked(self, key: str) -> bool: return self.get_key(key) in self.cache
+
+
+TokenScript = """
+local rate, burst, now, take = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens, updated = tonumber(state[1]) or burst, tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+if take == 0 then
+    if tokens >= 1 then return '0' end
+    return tostring((1 - tokens) / rate)
+end
+tokens = tokens - 1
+redis.call('HMSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+-- keep the key until the token debt of pending reservations is repaid and the bucket is full again
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+if tokens >= 0 then return '0' end
+return tostring(-tokens / rate)
+"""
+
+ReleaseScript = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+
+class RedisBackend(SharedBackend):
+    """
+    SharedBackend on redis, connecting with the RedisCfg settings by default.
+    Token buckets and lock releases run as Lua scripts so they are atomic.
+    """
+    name = 'redis'
+
+    def __init__(self, client: 'RedisClient' = None, prefix: str = None, **kwargs):
+        super().__init__(prefix)
+        self._kwargs = kwargs
+        self._client = client
+        self._token_script = None
+        self._release_script = None
+
+    @property
+    def client(self) -> 'RedisClient':
+        if self._client is None:
+            self._client = RedisClient(**{'host': RedisCfg.host, 'port': RedisCfg.port, 'db': RedisCfg.database, 'password': RedisCfg.password, **self._kwargs})
+        return self._client
+
+    @property
+    def token_script(self):
+        if self._token_script is None: self._token_script = self.client.register_script(TokenScript)
+        return self._token_script
+
+    @property
+    def release_script(self):
+        if self._release_script is None: self._release_script = self.client.register_script(ReleaseScript)
+        return self._release_script
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.client.get(self.get_key(key))
+        return default if value is None else pickle.loads(value)
+
+    def set(self, key: str, value: Any, expire: float = None) -> bool:
+        return bool(self.client.set(self.get_key(key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), px=int(expire * 1000) if expire else None))
+
+    def delete(self, key: str) -> bool: return bool(self.client.delete(self.get_key(key)))
+
+    def clear(self, prefix: str = '') -> int:
+        keys = list(self.client.scan_iter(match=self.get_key(prefix) + '*', count=1000))
+        return self.client.delete(*keys) if keys else 0
+
+    def volume(self) -> int: return int(self.client.info('memory').get('used_memory', 0))
+
+    def close(self):
+        if self._client is not None: self._client.close()
+
+    def take_token(self, key: str, rate: float, burst: int, take: bool = True) -> float:
+        return float(self.token_script(keys=[self.get_key(key)], args=[rate, burst, time.time(), int(take)]))
+
+    def acquire_lock(self, key: str, ttl: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        return token if self.client.set(self.get_key(key), token, nx=True, px=max(1, int(ttl * 1000))) else None
+
+    def release_lock(self, key: str, token: str) -> bool: return bool(self.release_script(keys=[self.get_key(key)], args=[token]))
+
+    def is_locked(self, key: str) -> bool: return bool(self.client.exists(self.get_key(key)))
+
+    @classmethod
+    def is_available(cls) -> bool:
+        if RedisClient is None: return False
+        return RedisCfg.check_redis_connection()
+
+
+_backend: Optional[SharedBackend] = None
+_lock = threading.Lock()
+
+def create_shared_backend(backend: str = None) -> SharedBackend:
+    """
+    Creates the shared backend: `redis`, `disk` or `auto` (redis if it is reachable, otherwise diskcache).
+    `redis` starts a local redis-server through RedisCfg.ensure_redis if it cannot connect.
+    """
+    backend = (backend or SharedCfg.backend).lower()
+    if backend == 'disk': return DiskBackend()
+    if backend == 'redis':
+        if not RedisBackend.is_available(): RedisCfg.ensure_redis()
+        return RedisBackend()
+    if RedisBackend.is_available(): return RedisBackend()
+    logger.info('Redis is not reachable. Using the diskcache shared backend')
+    return DiskBackend()
+
+
+def get_shared_backend(backend: Union[bool, str, SharedBackend] = None) -> Optional[SharedBackend]:
+    """
+    Returns a SharedBackend for the ApiClient.
+    True returns the process-wide backend selected by SharedCfg, a str creates that backend type.
+    """
+    global _backend
+    if not backend: return None
+    if isinstance(backend, str): return create_shared_backend(backend)
+    if backend is not True: return backend
+    if _backend is None:
+        with _lock:
+            if _backend is None: _backend = create_shared_backend()
+    return _backend
+
+
+__all__ = [
+    'SharedBackend',
+    'SharedNamespace',
+    'DiskBackend',
+    'RedisBackend',
+    'create_shared_backend',
+    'get_shared_backend',
+]
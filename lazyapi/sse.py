@@ -0,0 +1,74 @@
+from lazycls.types import *
+from .jsonz import loads
+from .classes import NotDecoded
+
+
+class ServerSentEvent:
+    """
+    A single `text/event-stream` event.
+    `.text` is the raw data and `.data` lazily decodes it as JSON (once).
+    """
+    __slots__ = ('event', 'text', 'id', 'retry', '_decoded')
+
+    def __init__(self, event: str = 'message', text: str = '', id: str = None, retry: int = None):
+        self.event = event
+        self.text = text
+        self.id = id
+        self.retry = retry
+        self._decoded = NotDecoded
+
+    @property
+    def data(self) -> Any:
+        if self._decoded is NotDecoded: self._decoded = loads(self.text)
+        return self._decoded
+
+    @property
+    def content(self) -> bytes: return self.text.encode('utf-8')
+
+    def __repr__(self):
+        return f'ServerSentEvent(event={self.event!r}, id={self.id!r}, retry={self.retry!r}, text={self.text!r})'
+
+
+class SSEDecoder:
+    """
+    Incremental `text/event-stream` parser, fed one line at a time.
+    Keeps the last event id and the server requested retry delay for reconnects.
+    """
+    def __init__(self, last_event_id: str = None):
+        self.last_event_id = last_event_id
+        self.retry = None
+        self._event = ''
+        self._data = []
+        self._retry = None
+
+    def reset(self):
+        """ Discards a partly received event, e.g. when the connection ended mid-event. Keeps the last event id and retry. """
+        self._event, self._data, self._retry = '', [], None
+
+    def decode(self, line: str) -> Optional[ServerSentEvent]:
+        """ Feeds a line, returning the event once a blank line dispatches it """
+        line = line.rstrip('\r\n')
+        if not line:
+            # per the WHATWG spec a block without data resets the buffers and dispatches nothing
+            if not self._data:
+                self._event, self._retry = '', None
+                return None
+            event = ServerSentEvent(event = self._event or 'message', text = '\n'.join(self._data), id = self.last_event_id, retry = self._retry)
+            self._event, self._data, self._retry = '', [], None
+            return event
+        if line.startswith(':'): return None
+        field, _, value = line.partition(':')
+        if value.startswith(' '): value = value[1:]
+        if field == 'data': self._data.append(value)
+        elif field == 'event': self._event = value
+        elif field == 'id':
+            if '\0' not in value: self.last_event_id = value
+        elif field == 'retry':
+            if value.isdigit(): self.retry = self._retry = int(value)
+        return None
+
+
+__all__ = [
+    'ServerSentEvent',
+    'SSEDecoder',
+]
@@ -0,0 +1,121 @@
+import os
+import mmap
+import asyncio
+import contextlib
+from pathlib import Path
+from typing import IO, Iterator, AsyncIterator
+from lazycls.types import *
+from .jsonz import loads
+
+StreamSource = Union[str, Path, IO[bytes], mmap.mmap, bytes, bytearray, memoryview]
+StreamSink = Union[str, Path, IO[bytes]]
+ProgressCallback = Callable[[int, Optional[int]], Any]
+
+
+def get_source_size(src: StreamSource) -> Optional[int]:
+    """ Returns the number of bytes left to read from the source if it can be known """
+    if isinstance(src, (str, Path)): return os.path.getsize(src)
+    if isinstance(src, (mmap.mmap, bytes, bytearray, memoryview)): return len(src)
+    try: return os.fstat(src.fileno()).st_size - src.tell()
+    except Exception: return None
+
+
+def iter_source(src: StreamSource, chunk_size: int, progress: ProgressCallback = None, total: int = None) -> Iterator[bytes]:
+    """
+    Yields the source in chunks of at most chunk_size bytes.
+    Paths are opened and read chunk by chunk, buffers / mmaps are sliced so the source is never copied whole.
+    """
+    if isinstance(src, (str, Path)):
+        with open(src, 'rb') as f:
+            yield from iter_source(f, chunk_size, progress, total)
+        return
+    done = 0
+    if isinstance(src, (mmap.mmap, bytes, bytearray, memoryview)):
+        view = memoryview(src)
+        chunks = (bytes(view[i:i + chunk_size]) for i in range(0, len(view), chunk_size))
+    else: chunks = iter(lambda: src.read(chunk_size), b'')
+    for chunk in chunks:
+        done += len(chunk)
+        yield chunk
+        if progress: progress(done, total)
+
+
+async def aiter_source(src: StreamSource, chunk_size: int, progress: ProgressCallback = None, total: int = None) -> AsyncIterator[bytes]:
+    """
+    Async version of iter_source for the async client, which requires an async iterable body.
+    Files are opened and read in the default executor so disk reads do not block the event loop.
+    """
+    if isinstance(src, (mmap.mmap, bytes, bytearray, memoryview)):
+        for chunk in iter_source(src, chunk_size, progress, total): yield chunk
+        return
+    loop = asyncio.get_running_loop()
+    f = await loop.run_in_executor(None, open, src, 'rb') if isinstance(src, (str, Path)) else src
+    done = 0
+    try:
+        while True:
+            chunk = await loop.run_in_executor(None, f.read, chunk_size)
+            if not chunk: break
+            done += len(chunk)
+            yield chunk
+            if progress: progress(done, total)
+    finally:
+        if f is not src: f.close()
+
+
+@contextlib.contextmanager
+def open_sink(dest: StreamSink) -> Iterator[IO[bytes]]:
+    """ Opens a path for writing, or passes through an already writable buffer """
+    if isinstance(dest, (str, Path)):
+        Path(dest).parent.mkdir(parents=True, exist_ok=True)
+        with open(dest, 'wb') as f: yield f
+    else: yield dest
+
+
+def get_content_length(resp: Any) -> Optional[int]:
+    try: return int(resp.headers['content-length'])
+    except (KeyError, ValueError): return None
+
+
+class LineDecoder:
+    """
+    Incrementally splits a byte stream into lines. Only the trailing partial line is buffered.
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def decode(self, chunk: bytes) -> List[bytes]:
+        self.buffer.extend(chunk)
+        lines, start = [], 0
+        while True:
+            end = self.buffer.find(b'\n', start)
+            if end < 0: break
+            lines.append(bytes(self.buffer[start:end]))
+            start = end + 1
+        if start: del self.buffer[:start]
+        return lines
+
+    def flush(self) -> List[bytes]:
+        lines = [bytes(self.buffer)] if self.buffer else []
+        self.buffer.clear()
+        return lines
+
+
+def decode_json_lines(lines: List[bytes]) -> Iterator[Any]:
+    """ Decodes each non-empty line as JSON, skipping blank keep-alive lines """
+    for line in lines:
+        line = line.strip()
+        if line: yield loads(line)
+
+
+__all__ = [
+    'StreamSource',
+    'StreamSink',
+    'ProgressCallback',
+    'get_source_size',
+    'iter_source',
+    'aiter_source',
+    'open_sink',
+    'get_content_length',
+    'LineDecoder',
+    'decode_json_lines',
+]
@@ -1,10 +1,71 @@
-from lazycls import BaseCls, create_lazycls
+import threading
+from collections import OrderedDict
+from pydantic import create_model
+from lazycls import BaseCls
+from lazycls.models import BaseLazy
 from lazycls.types import *
+from .config import LazyClsCfg
 
-def convert_to_cls(resp: DictAny, module_name: str = 'lazy', base_key: str = 'api') -> List[Type[BaseCls]]:
-    for key, vals in resp.items():
-        mod_key = f'{base_key}{key}'
-        if isinstance(vals, list): vals = [create_lazycls(mod_key, v, modulename=module_name) for v in vals]
-        else: vals = create_lazycls(mod_key, vals, modulename=module_name)
-        resp[key] = vals
-    return resp
+
+class ModelClsCache:
+    """
+    Caches the generated LazyCls model classes by (module, name, schema) where the schema
+    is the key set and value types of the data. A list of homogeneous items reuses one class
+    and only instantiates it per item.
+    """
+    def __init__(self, maxsize: int = None):
+        self.maxsize = maxsize or LazyClsCfg.cache_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def get_schema(data: DictAny) -> Tuple[Tuple[str, str], ...]:
+        return tuple((k, type(v).__name__) for k, v in data.items())
+
+    def get(self, clsname: str, data: DictAny, modulename: str) -> Type[BaseLazy]:
+        key = (modulename, clsname, self.get_schema(data))
+        with self._lock:
+            cls = self._data.get(key)
+            if cls is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return cls
+        cls = create_model(clsname, __base__ = BaseLazy, __module__ = modulename, **{k: (Any, None) for k in data})
+        with self._lock:
+            self.misses += 1
+            self._data[key] = cls
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return cls
+
+    def clear(self):
+        with self._lock: self._data.clear()
+
+    @property
+    def stats(self) -> DictAny:
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self._data)}
+
+
+model_cache = ModelClsCache()
+
+
+def create_cls(clsname: str, data: Any, modulename: str = 'lazy') -> Any:
+    """
+    Recursively turns dicts into LazyCls models (lists of dicts into lists of models) using the cached classes.
+    The input data is not modified.
+    """
+    if isinstance(data, list): return [create_cls(clsname, v, modulename) for v in data]
+    if not isinstance(data, dict): return data
+    if clsname.endswith('s'): clsname = clsname[:-1]
+    values = {k: create_cls(f'{clsname}_{k}', v, modulename) if isinstance(v, (dict, list)) else v for k, v in data.items()}
+    return model_cache.get(clsname, data, modulename).construct(**values)
+
+
+def convert_to_cls(resp: Union[DictAny, List[Any]], module_name: str = 'lazy', base_key: str = 'api') -> Union[DictAny, List[Type[BaseCls]]]:
+    """ Converts the values of the dict to LazyCls. `resp` is not modified since the response data is reused. """
+    if isinstance(resp, list): return create_cls(base_key, resp, module_name)
+    return {key: create_cls(f'{base_key}{key}', vals, module_name) for key, vals in resp.items()}
@@ -13,6 +13,7 @@ root = Path(__file__).parent
 
 requirements = [
     'httpx',
+    'httpcore>=0.14,<0.17',
     'lazycls',
     'pytz',
     'dateparser',
@@ -0,0 +1,51 @@
+import time
+import socket
+import shutil
+import subprocess
+import pytest
+from lazyapi.shared import DiskBackend, RedisBackend
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'redis: needs a locally spawned redis-server')
+
+
+def get_free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope='session')
+def redis_port():
+    """ Spawns a throwaway redis-server, skipping the redis tests when it is not installed """
+    pytest.importorskip('redis')
+    if not shutil.which('redis-server'): pytest.skip('redis-server is not installed')
+    port = get_free_port()
+    proc = subprocess.Popen(['redis-server', '--port', str(port), '--save', '', '--appendonly', 'no'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        backend = create_backend(('redis', port, 'lazyapi-test'))
+        for _ in range(50):
+            try:
+                backend.client.ping()
+                break
+            except Exception: time.sleep(0.1)
+        else: pytest.skip('redis-server did not start')
+        yield port
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def create_backend(spec: tuple):
+    """ Builds the backend from a picklable spec, so child processes can open the same one """
+    kind, arg, prefix = spec
+    if kind == 'disk': return DiskBackend(directory=arg, prefix=prefix)
+    return RedisBackend(host='127.0.0.1', port=arg, db=0, prefix=prefix)
+
+
+@pytest.fixture(params=['disk', pytest.param('redis', marks=pytest.mark.redis)])
+def backend_spec(request, tmp_path):
+    prefix = f'lazyapi-test-{time.time_ns()}'
+    if request.param == 'disk': return ('disk', tmp_path.joinpath('shared').as_posix(), prefix)
+    return ('redis', request.getfixturevalue('redis_port'), prefix)
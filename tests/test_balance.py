@@ -0,0 +1,35 @@
+import asyncio
+import httpx
+from lazyapi import BalancedApiClient
+
+
+def down_a(request: httpx.Request) -> httpx.Response:
+    if request.url.host == 'a': raise httpx.ConnectError('down', request=request)
+    return httpx.Response(200, json={'host': request.url.host})
+
+
+def test_open_circuit_ejects_endpoint():
+    breaker = {'min_requests': 2, 'error_rate': 0.5, 'open_timeout': 60}
+    client = BalancedApiClient(['http://a', 'http://b', 'http://c'], strategy='round_robin', transport=httpx.MockTransport(down_a), breaker=breaker)
+    client.balancer.eject_failures = 100
+    failures = 0
+    for _ in range(60):
+        try: client.get('/')
+        except httpx.ConnectError: failures += 1
+    # only the requests that opened the circuit reach a
+    assert failures == 2
+    assert client.balancer.stats['http://a']['ejected']
+    assert client.breaker.states['a'] == 'open'
+
+
+def test_open_circuit_fails_over_async():
+    client = BalancedApiClient(['http://a', 'http://b'], strategy='round_robin', transport=httpx.MockTransport(down_a), breaker={'min_requests': 1, 'error_rate': 0.5, 'open_timeout': 60})
+    async def main():
+        hosts = []
+        for _ in range(20):
+            try: hosts.append((await client.async_get('/')).data['host'])
+            except httpx.ConnectError: hosts.append(None)
+        return hosts
+    hosts = asyncio.run(main())
+    assert hosts.count(None) == 1
+    assert hosts.count('b') == 19
@@ -0,0 +1,22 @@
+import time
+import httpx
+import pytest
+from lazyapi import ApiClient
+
+
+class InterruptedLimiter:
+    """ Rate limiter whose wait is interrupted """
+    def acquire(self, url: str): raise KeyboardInterrupt
+
+
+def test_probe_slot_released_when_rate_limit_wait_raises():
+    client = ApiClient(base_url='http://test', transport=httpx.MockTransport(lambda r: httpx.Response(200, json={})), breaker={'min_requests': 1, 'open_timeout': 0.05, 'probes': 1})
+    circuit = client.breaker.get_circuit('http://test')
+    circuit.state, circuit.opened_at = 'open', time.monotonic()
+    time.sleep(0.06)
+    client.rate_limiter = InterruptedLimiter()
+    with pytest.raises(KeyboardInterrupt): client.get('/')
+    client.rate_limiter = None
+    # the probe slot is free again, so the half open circuit lets the next request through and closes
+    client.get('/')
+    assert client.breaker.states['test'] == 'closed'
@@ -0,0 +1,51 @@
+import gzip
+import asyncio
+import httpx
+from lazyapi import ApiClient, DiskCache, MemoryCache
+from lazyapi.flight import dump_response
+
+
+def echo_auth(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={'auth': request.headers.get('authorization')}, headers={'cache-control': 'max-age=60'})
+
+
+def test_cache_key_includes_client_headers(tmp_path):
+    directory = tmp_path.joinpath('cache').as_posix()
+    # two clients sharing a cache directory, as with cache = True
+    a = ApiClient(base_url='http://test', headers={'Authorization': 'token-A'}, transport=httpx.MockTransport(echo_auth), cache=DiskCache(directory=directory))
+    b = ApiClient(base_url='http://test', headers={'Authorization': 'token-B'}, transport=httpx.MockTransport(echo_auth), cache=DiskCache(directory=directory))
+    assert a.get('/me').data == {'auth': 'token-A'}
+    assert b.get('/me').data == {'auth': 'token-B'}
+    assert asyncio.run(b.async_get('/me')).data == {'auth': 'token-B'}
+    assert b.cache.stats['hits'] == 1
+    # request headers still override the client headers
+    assert b.get('/me', headers={'Authorization': 'token-A'}).data == {'auth': 'token-A'}
+    assert b.cache.stats['hits'] == 2
+
+
+def test_memory_cache_key_includes_client_headers():
+    memory_cache = MemoryCache(ttl=60)
+    a = ApiClient(base_url='http://test', headers={'Authorization': 'token-A'}, transport=httpx.MockTransport(echo_auth), memory_cache=memory_cache)
+    b = ApiClient(base_url='http://test', headers={'Authorization': 'token-B'}, transport=httpx.MockTransport(echo_auth), memory_cache=memory_cache)
+    assert a.get('/me').data == {'auth': 'token-A'}
+    assert b.get('/me').data == {'auth': 'token-B'}
+
+
+def gzipped(request: httpx.Request) -> httpx.Response:
+    headers = {'content-encoding': 'gzip', 'etag': '"v1"', 'cache-control': 'max-age=0'}
+    if request.headers.get('if-none-match') == '"v1"': return httpx.Response(304, headers=headers)
+    return httpx.Response(200, content=gzip.compress(b'{"ok": true}'), headers=headers)
+
+
+def test_cache_serves_encoded_responses(tmp_path):
+    client = ApiClient(base_url='http://test', transport=httpx.MockTransport(gzipped), cache=DiskCache(directory=tmp_path.as_posix()))
+    assert client.get('/gz').data == {'ok': True}
+    # stale, so the next calls revalidate and turn the 304 into the stored response
+    assert client.get('/gz').data == {'ok': True}
+    assert asyncio.run(client.async_get('/gz')).data == {'ok': True}
+    assert client.cache.stats['revalidated'] == 2
+    entry = client.cache.lookup(client.cache.get_key('GET', 'http://test/gz', {}, client.client.headers))
+    assert 'content-encoding' not in dict(entry['headers'])
+    with httpx.Client(transport=httpx.MockTransport(gzipped)) as c: resp = c.get('http://test/gz')
+    # responses shared by single-flight go through the same path
+    assert DiskCache.to_response(dump_response(resp)).json() == {'ok': True}
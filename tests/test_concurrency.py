@@ -0,0 +1,51 @@
+import time
+import asyncio
+import threading
+import httpx
+from lazyapi.concurrency import AIMDLimit
+
+
+def test_adaptive_limit_wakes_waiters_of_other_loops():
+    limit = AIMDLimit('test', initial=1, min_limit=1, max_limit=1)
+    woken = []
+    def other_loop():
+        async def wait():
+            started = await limit.acquire()
+            woken.append('other')
+            limit.release(started, resp=httpx.Response(200))
+        asyncio.run(asyncio.wait_for(wait(), 5))
+    async def main():
+        started = await limit.acquire()
+        thread = threading.Thread(target=other_loop)
+        thread.start()
+        await asyncio.sleep(0.1)
+        # the slot is handed to a waiter of the other thread's loop
+        released = time.monotonic()
+        limit.release(started, resp=httpx.Response(200))
+        await asyncio.get_running_loop().run_in_executor(None, thread.join)
+        return time.monotonic() - released
+    # the other loop is woken right away, not on its next unrelated wakeup
+    assert asyncio.run(main()) < 1
+    assert woken == ['other']
+    assert limit.inflight == 0
+
+
+def test_adaptive_limit_passes_on_slot_of_cancelled_waiter():
+    limit = AIMDLimit('test', initial=1, min_limit=1, max_limit=1)
+    other = asyncio.new_event_loop()
+    async def main():
+        started = await limit.acquire()
+        waiter = asyncio.run_coroutine_threadsafe(limit.acquire(), other)
+        await asyncio.sleep(0.1)
+        # cancel the waiter before its loop runs the handoff
+        other.call_soon_threadsafe(waiter.cancel)
+        limit.release(started, resp=httpx.Response(200))
+        await asyncio.sleep(0.1)
+    thread = threading.Thread(target=other.run_forever)
+    thread.start()
+    try: asyncio.run(main())
+    finally:
+        other.call_soon_threadsafe(other.stop)
+        thread.join()
+        other.close()
+    assert limit.inflight == 0
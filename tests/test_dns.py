@@ -0,0 +1,42 @@
+import time
+import asyncio
+import httpcore
+import pytest
+from lazyapi.dns import DNSCache, CachingBackend, AsyncCachingBackend
+
+
+class TimeoutBackend:
+    """ Network backend whose connects all time out """
+    def __init__(self): self.timeouts = []
+
+    def connect_tcp(self, host, port, timeout=None, local_address=None):
+        self.timeouts.append(timeout)
+        time.sleep(timeout)
+        raise httpcore.ConnectTimeout(host)
+
+
+class AsyncTimeoutBackend(TimeoutBackend):
+    async def connect_tcp(self, host, port, timeout=None, local_address=None):
+        self.timeouts.append(timeout)
+        await asyncio.sleep(timeout)
+        raise httpcore.ConnectTimeout(host)
+
+
+def get_cache() -> DNSCache:
+    cache = DNSCache()
+    cache.set('api', 80, ['10.0.0.1', '10.0.0.2', '10.0.0.3'])
+    return cache
+
+
+def test_connect_timeout_is_split_across_addresses():
+    backend, started = TimeoutBackend(), time.monotonic()
+    with pytest.raises(httpcore.ConnectTimeout): CachingBackend(get_cache(), backend).connect_tcp('api', 80, timeout=0.3)
+    assert len(backend.timeouts) == 3 and all(t <= 0.1 for t in backend.timeouts)
+    assert time.monotonic() - started < 0.5
+
+
+def test_async_connect_timeout_is_split_across_addresses():
+    backend, started = AsyncTimeoutBackend(), time.monotonic()
+    with pytest.raises(httpcore.ConnectTimeout): asyncio.run(AsyncCachingBackend(get_cache(), backend).connect_tcp('api', 80, timeout=0.3))
+    assert len(backend.timeouts) == 3 and all(t <= 0.1 for t in backend.timeouts)
+    assert time.monotonic() - started < 0.5
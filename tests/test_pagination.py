@@ -0,0 +1,22 @@
+import asyncio
+import httpx
+from lazyapi import ApiClient
+
+
+async def pages(request: httpx.Request) -> httpx.Response:
+    start = int(request.url.params.get('continue') or 0)
+    return httpx.Response(200, json={'items': list(range(start, start + 10)), 'metadata': {'continue': str(start + 10)}})
+
+
+def test_async_paginate_stops_prefetch_on_early_exit():
+    client = ApiClient(base_url='http://test', transport=httpx.MockTransport(pages))
+    async def main():
+        items = []
+        async for item in client.async_paginate('/items', prefetch=2):
+            items.append(item)
+            if len(items) == 15: break
+        await asyncio.sleep(0.05)
+        return items, [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+    items, pending = asyncio.run(main())
+    assert items == list(range(15))
+    assert pending == []
@@ -0,0 +1,20 @@
+import httpx
+from lazyapi import ApiClient
+from lazyapi.retry import HttpRetrying
+
+
+def test_retry_on_exception_overrides_the_default():
+    retrying = HttpRetrying(retry_on_exception=(httpx.ConnectError,), wait_exponential_multiplier=1, wait_exponential_max=1)
+    assert retrying._retry_on_exception(httpx.ConnectError('down'))
+    assert not retrying._retry_on_exception(httpx.ReadTimeout('slow'))
+
+
+def test_client_retries_custom_exceptions():
+    calls = []
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if len(calls) < 3: raise httpx.ConnectError('down', request=request)
+        return httpx.Response(200, json={'ok': True})
+    client = ApiClient(base_url='http://test', transport=httpx.MockTransport(handler), retry={'retry_on_exception': (httpx.ConnectError,), 'wait_exponential_multiplier': 1, 'wait_exponential_max': 1})
+    assert client.get('/flaky').data == {'ok': True}
+    assert len(calls) == 3
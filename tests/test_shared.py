@@ -0,0 +1,86 @@
+import os
+import time
+import asyncio
+import multiprocessing as mp
+import httpx
+from lazyapi import ApiClient, DiskCache
+from lazyapi.ratelimit import SharedTokenBucket
+from conftest import create_backend
+
+
+def test_shared_token_bucket(backend_spec):
+    backend = create_backend(backend_spec)
+    # two buckets on the same key stand in for two processes
+    a, b = SharedTokenBucket(backend, 'api', rate=10, burst=2), SharedTokenBucket(backend, 'api', rate=10, burst=2)
+    waits = [a.reserve(), b.reserve(), a.reserve(), b.reserve(), a.reserve()]
+    assert waits[:2] == [0.0, 0.0]
+    assert 0.05 < waits[2] < waits[3] < waits[4] <= 0.31
+
+
+def test_shared_token_bucket_keeps_debt(backend_spec):
+    backend = create_backend(backend_spec)
+    bucket = SharedTokenBucket(backend, 'debt', rate=10, burst=1)
+    for _ in range(20): bucket.reserve()
+    # the debt (~1.9s) outlives burst / rate + 1s, so the key must still hold it
+    time.sleep(1.3)
+    assert bucket.wait_time > 0.3
+
+
+def reserve_tokens(spec: tuple, count: int) -> list:
+    bucket = SharedTokenBucket(create_backend(spec), 'procs', rate=20, burst=1)
+    return [bucket.reserve() for _ in range(count)]
+
+
+def test_shared_token_bucket_across_processes(backend_spec):
+    with mp.get_context('spawn').Pool(3) as pool: results = pool.starmap(reserve_tokens, [(backend_spec, 5)] * 3)
+    waits = sorted(w for r in results for w in r)
+    assert waits[0] == 0.0 and waits[1] > 0.0
+    # every reservation got its own slot, one per 1 / rate secs
+    assert waits[-1] >= 13 / 20
+
+
+def coalesced_get(spec: tuple, counter: str, barrier: mp.Barrier, queue: mp.Queue):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        with open(counter, 'a') as f: f.write(f'{os.getpid()}\n')
+        await asyncio.sleep(0.5)
+        return httpx.Response(200, json={'pid': os.getpid()})
+    client = ApiClient(base_url='http://test', transport=httpx.MockTransport(handler), shared=create_backend(spec), coalesce=True)
+    barrier.wait()
+    resp = asyncio.run(client.async_get('/flight'))
+    queue.put(resp.data['pid'])
+
+
+def test_single_flight_across_processes(backend_spec, tmp_path):
+    ctx = mp.get_context('spawn')
+    counter, barrier, queue = tmp_path.joinpath('calls').as_posix(), ctx.Barrier(3), ctx.Queue()
+    procs = [ctx.Process(target=coalesced_get, args=(backend_spec, counter, barrier, queue)) for _ in range(3)]
+    for p in procs: p.start()
+    for p in procs: p.join(30)
+    pids = [queue.get(timeout=5) for _ in procs]
+    with open(counter) as f: calls = f.read().split()
+    assert len(calls) == 1
+    assert set(pids) == {int(calls[0])}
+
+
+def test_shared_cache(backend_spec):
+    calls = []
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(200, json={'n': len(calls)}, headers={'cache-control': 'max-age=60'})
+    backend = create_backend(backend_spec)
+    # separate clients and caches, as in two processes, over one backend
+    first = ApiClient(base_url='http://test', transport=httpx.MockTransport(handler), cache=DiskCache(backend=backend))
+    second = ApiClient(base_url='http://test', transport=httpx.MockTransport(handler), cache=DiskCache(backend=create_backend(backend_spec)))
+    assert first.get('/cached').data == {'n': 1}
+    assert second.get('/cached').data == {'n': 1}
+    assert asyncio.run(second.async_get('/cached')).data == {'n': 1}
+    assert len(calls) == 1
+    assert second.cache.stats['hits'] == 2
+
+
+def test_shared_cache_entries_expire(backend_spec):
+    cache = DiskCache(backend=create_backend(backend_spec), revalidate_ttl=10, max_ttl=30)
+    entry = {'expires': time.time() + 60}
+    assert cache.get_expire(entry) == 30
+    entry = {'expires': time.time() + 5}
+    assert 14 < cache.get_expire(entry) <= 15
@@ -0,0 +1,35 @@
+import asyncio
+import httpx
+from lazyapi import ApiClient
+from lazyapi.sse import SSEDecoder
+
+
+def reconnecting():
+    calls = []
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.headers.get('last-event-id'))
+        # the first connection closes in the middle of the second event
+        if len(calls) == 1: return httpx.Response(200, content=b'retry: 0\nid: 1\ndata: {"a": 1}\n\ndata: {"trunc', headers={'content-type': 'text/event-stream'})
+        if len(calls) == 2: return httpx.Response(200, content=b'id: 2\ndata: {"b": 2}\n\n', headers={'content-type': 'text/event-stream'})
+        return httpx.Response(204)
+    return calls, ApiClient(base_url='http://test', transport=httpx.MockTransport(handler))
+
+
+def test_sse_discards_event_cut_off_by_reconnect():
+    calls, client = reconnecting()
+    assert [e.data for e in client.sse('/events')] == [{'a': 1}, {'b': 2}]
+    assert calls == [None, '1', '2']
+
+
+def test_async_sse_discards_event_cut_off_by_reconnect():
+    calls, client = reconnecting()
+    async def main(): return [e.data async for e in client.async_sse('/events')]
+    assert asyncio.run(main()) == [{'a': 1}, {'b': 2}]
+    assert calls == [None, '1', '2']
+
+
+def test_decoder_ignores_blocks_without_data():
+    decoder = SSEDecoder()
+    events = [decoder.decode(line) for line in ['event: ping', '', 'retry: 10', '', 'data: x', '']]
+    assert [(e.event, e.text, e.retry) for e in events if e] == [('message', 'x', None)]
+    assert decoder.retry == 10
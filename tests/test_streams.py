@@ -0,0 +1,39 @@
+import io
+import asyncio
+import threading
+from lazyapi.streams import aiter_source
+
+
+class ThreadRecordingFile(io.BytesIO):
+    """ Records the threads that read from it """
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.threads = set()
+
+    def read(self, size: int = -1) -> bytes:
+        self.threads.add(threading.get_ident())
+        return super().read(size)
+
+
+def test_aiter_source_reads_files_off_the_loop():
+    src = ThreadRecordingFile(b'a' * 100)
+    async def main(): return threading.get_ident(), [c async for c in aiter_source(src, 30)]
+    loop_thread, chunks = asyncio.run(main())
+    assert [len(c) for c in chunks] == [30, 30, 30, 10]
+    assert loop_thread not in src.threads
+
+
+def test_aiter_source_reads_paths(tmp_path):
+    path = tmp_path.joinpath('src.bin')
+    path.write_bytes(b'a' * 100)
+    progress = []
+    async def main():
+        loop_thread = threading.get_ident()
+        chunks = [c async for c in aiter_source(path, 30, lambda done, total: progress.append((done, total, threading.get_ident() == loop_thread)), 100)]
+        return chunks, b''.join([c async for c in aiter_source(io.BytesIO(b'b' * 70), 30)]), [c async for c in aiter_source(b'c' * 70, 30)]
+    chunks, buffered, sliced = asyncio.run(main())
+    assert [len(c) for c in chunks] == [30, 30, 30, 10]
+    # progress is reported on the loop, not the executor thread
+    assert progress[-1] == (100, 100, True)
+    assert buffered == b'b' * 70
+    assert [len(c) for c in sliced] == [30, 30, 10]
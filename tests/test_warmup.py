@@ -0,0 +1,47 @@
+import asyncio
+import threading
+import pytest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from lazyapi import ApiClient
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    def log_message(self, *args): pass
+
+    def do_GET(self):
+        self.server.peers.add(self.client_address)
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    do_HEAD = do_GET
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.peers = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_warmup_opens_distinct_connections(server):
+    api = ApiClient(base_url=f'http://127.0.0.1:{server.server_port}')
+    result = api.warmup(connections=16, method='GET')
+    assert result['connected'] == len(server.peers) == 16
+    for _ in range(16): api.get('/')
+    assert len(server.peers) == 16
+
+
+def test_async_warmup_opens_distinct_connections(server):
+    api = ApiClient(base_url=f'http://127.0.0.1:{server.server_port}')
+    async def main():
+        result = await api.async_warmup(connections=32, method='GET')
+        assert result['connected'] == len(server.peers) == 32
+        await asyncio.gather(*[api.async_get('/') for _ in range(32)])
+        assert len(server.peers) == 32
+    asyncio.run(main())